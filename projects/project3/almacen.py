@@ -0,0 +1,768 @@
+"""
+═════════════════════════════════════════════════════════════════════════════
+    ALMACÉN COLUMNAR - CACHÉ ARROW DEL DATASET LIMPIO
+
+    El CSV original se parsea y limpia UNA sola vez. El resultado se guarda
+    en un archivo Arrow IPC tipado (sin compresión) que en los arranques
+    siguientes se abre con memory-map, evitando repetir:
+    • pd.read_csv (y el segundo intento con latin1)
+    • pd.to_datetime con formato de texto
+    • la creación de columnas derivadas
+
+    El caché se invalida automáticamente cuando cambia el CSV de origen
+    (mtime + tamaño como comprobación rápida, SHA-256 como confirmación).
+
+    El CSV se procesa por bloques de tamaño fijo: la memoria usada al
+    parsear depende del tamaño del bloque, no del tamaño del archivo.
+    Con varios núcleos, el archivo se reparte en rangos de bytes que se
+    parsean y limpian en paralelo (un proceso por rango).
+
+    Varios procesos pueden arrancar a la vez sobre la misma caché: cada
+    escritor usa sus propios temporales y su propia carpeta de partes, y la
+    reconstrucción se hace con un bloqueo de archivo (solo un proceso parsea
+    el CSV; los demás esperan y leen su resultado).
+═════════════════════════════════════════════════════════════════════════════
+"""
+
+import codecs
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import shutil
+import uuid
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin bloqueo entre procesos
+    fcntl = None
+
+import pandas as pd
+import pyarrow as pa
+
+from fechas import codigo_dia, codigo_mes, dia_semana
+
+# Directorio donde se guardan los archivos cacheados (ignorado por git)
+DIRECTORIO_CACHE = '.cache'
+
+# Incrementar cuando cambie la limpieza o el esquema: invalida cachés viejos
+VERSION_ESQUEMA = 5
+
+FORMATO_FECHA = '%m/%d/%Y %H:%M'
+
+# Filas por bloque al leer el CSV en modo streaming
+TAMANO_BLOQUE = 250_000
+
+# Bytes por rango en la lectura en paralelo. Acota la memoria de cada
+# proceso y deja más rangos que núcleos para repartir mejor la carga.
+TAMANO_RANGO = 32 << 20
+
+# Los códigos se leen siempre como texto: así todos los archivos (y todos
+# los bloques de un mismo archivo) producen los mismos tipos
+TIPOS_CSV = {
+    'InvoiceNo': str,
+    'StockCode': str,
+    'Description': str,
+    'Country': str,
+}
+
+# Esquema compacto del DataFrame de transacciones.
+# TotalPrice se mantiene en float64: se calcula antes de reducir UnitPrice
+# y es la columna que se suma en todos los KPIs monetarios.
+ESQUEMA = {
+    'InvoiceNo': 'int32',        # Códigos numéricos (category si hay letras)
+    'StockCode': 'category',
+    'Description': 'category',
+    'Quantity': 'int32',
+    'UnitPrice': 'float32',
+    'CustomerID': 'int32',       # Ya sin NaN tras la limpieza
+    'Country': 'category',
+    'DayCode': 'int32',          # Días desde 1970-01-01
+    'MonthCode': 'int16',        # Meses desde 1970-01
+    'DayOfWeek': 'int8',         # 0 = lunes ... 6 = domingo
+}
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+# 1. LECTURA Y LIMPIEZA DEL CSV
+# ═════════════════════════════════════════════════════════════════════════════
+
+def detectar_encoding(filepath, bloque=1 << 20):
+    """
+    Devuelve 'utf-8' si el archivo es UTF-8 válido y 'latin1' si no.
+
+    Solo decodifica bytes (sin parsear), así que es mucho más barato que
+    intentar un read_csv completo y repetirlo al fallar.
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    try:
+        with open(filepath, 'rb') as f:
+            for parte in iter(lambda: f.read(bloque), b''):
+                decoder.decode(parte)
+        decoder.decode(b'', final=True)
+    except UnicodeDecodeError:
+        return 'latin1'
+    return 'utf-8'
+
+
+def leer_csv(filepath):
+    """Lee el CSV completo con el encoding detectado (UTF-8 o latin1)."""
+    return pd.read_csv(filepath, encoding=detectar_encoding(filepath), dtype=TIPOS_CSV)
+
+
+def leer_por_bloques(filepath, tamano_bloque=TAMANO_BLOQUE, progreso=None):
+    """
+    Lee y limpia el CSV bloque a bloque.
+
+    Parámetros:
+    -----------
+    filepath : str
+        Ruta al CSV
+    tamano_bloque : int
+        Filas por bloque
+    progreso : callable, opcional
+        Se llama como progreso(bytes_leidos, bytes_totales) tras cada bloque
+
+    Retorna:
+    --------
+    generator
+        DataFrames limpios (esquema compacto), uno por bloque
+    """
+    encoding = detectar_encoding(filepath)
+    with open(filepath, 'rb') as f:
+        total = os.fstat(f.fileno()).st_size
+        lector = pd.read_csv(f, encoding=encoding, dtype=TIPOS_CSV, chunksize=tamano_bloque)
+        for bloque in lector:
+            yield limpiar_datos(bloque)
+            if progreso is not None:
+                progreso(f.tell(), total)
+
+
+def limpiar_datos(df):
+    """
+    Aplica las reglas de limpieza del dashboard.
+
+    Parámetros:
+    -----------
+    df : pd.DataFrame
+        Datos crudos tal como vienen del CSV
+
+    Retorna:
+    --------
+    pd.DataFrame
+        DataFrame limpio y con columnas derivadas
+    """
+    # 1. Convertir InvoiceDate a datetime
+    df['InvoiceDate'] = pd.to_datetime(df['InvoiceDate'], format=FORMATO_FECHA)
+
+    # 2. Eliminar filas con valores críticos faltantes
+    df = df.dropna(subset=['CustomerID', 'InvoiceNo', 'Country'])
+
+    # 3. Filtrar valores positivos (rechaza transacciones anormales)
+    df = df[(df['Quantity'] > 0) & (df['UnitPrice'] > 0)]
+
+    # 4. Ordenar por fecha: los filtros por rango usan búsqueda binaria
+    df = df.sort_values('InvoiceDate', kind='stable')
+
+    # 5. Crear columnas derivadas útiles (códigos enteros, ver fechas.py)
+    fechas = df['InvoiceDate'].to_numpy()
+    df['TotalPrice'] = df['Quantity'] * df['UnitPrice']  # Ingreso por transacción
+    df['DayCode'] = codigo_dia(fechas)  # Día (para agregados diarios)
+    df['MonthCode'] = codigo_mes(fechas)  # Mes (para series de tiempo)
+    df['DayOfWeek'] = dia_semana(df['DayCode'])  # Día de la semana (0 = lunes)
+
+    return aplicar_esquema(df.reset_index(drop=True))
+
+
+def aplicar_esquema(df):
+    """
+    Convierte las columnas a los tipos compactos definidos en ESQUEMA.
+
+    Los códigos de factura que no sean puramente numéricos (por ejemplo
+    'C536379') hacen que InvoiceNo se guarde como categoría en lugar de int32.
+    """
+    tipos = {col: tipo for col, tipo in ESQUEMA.items() if col in df.columns}
+
+    if tipos.get('InvoiceNo') == 'int32':
+        codigos = pd.to_numeric(df['InvoiceNo'], errors='coerce')
+        if codigos.isna().any():
+            tipos['InvoiceNo'] = 'category'
+        else:
+            df['InvoiceNo'] = codigos
+
+    return df.astype(tipos)
+
+
+def concatenar(partes):
+    """
+    Une varios DataFrames limpios manteniendo el esquema compacto.
+
+    pd.concat convierte a object las categorías que no coinciden entre
+    partes; aquí se unifican antes para conservar el tipo category. El
+    resultado queda ordenado por InvoiceDate. Si todas las partes están
+    vacías se devuelve la primera (vacía, pero con el esquema correcto).
+    """
+    partes = list(partes)
+    if not partes:
+        return None
+    con_filas = [p for p in partes if len(p)]
+    if len(con_filas) <= 1:
+        return con_filas[0] if con_filas else partes[0]
+    partes = con_filas
+
+    comunes = _categorias_comunes(lambda: iter(partes))
+    df = pd.concat([_aplicar_categorias(p, comunes) for p in partes], ignore_index=True)
+    if not df['InvoiceDate'].is_monotonic_increasing:
+        df = df.sort_values('InvoiceDate', kind='stable', ignore_index=True)
+    return df
+
+
+def _categorias_comunes(abrir):
+    """
+    Categorías comunes de cada columna categórica de varias partes.
+
+    Parámetros:
+    -----------
+    abrir : callable
+        abrir() -> iterador sobre las partes (con filas). Se recorre dos
+        veces: primero los tipos, después las categorías
+
+    Retorna:
+    --------
+    dict
+        {columna: (a_texto, categorias)}. Con a_texto la columna se pasa a
+        texto antes de unificarla: InvoiceNo puede ser int32 en una parte
+        y category en otra. Las categorías siguen el orden de
+        union_categoricals (las de la primera parte y luego las nuevas)
+    """
+    tipos = {}
+    for df in abrir():
+        for col in df.columns:
+            dtype = df[col].dtype
+            tipos.setdefault(col, set()).add(
+                dtype.categories.dtype if isinstance(dtype, pd.CategoricalDtype) else None)
+    a_texto = {col: None in t or len(t) > 1 for col, t in tipos.items() if t != {None}}
+
+    categorias = {col: [] for col in a_texto}
+    for df in abrir():
+        for col, texto in a_texto.items():
+            columna = df[col].astype(str).astype('category') if texto else df[col]
+            categorias[col].append(columna.cat.categories)
+    return {col: (a_texto[col], cats[0].append(cats[1:]).unique())
+            for col, cats in categorias.items()}
+
+
+def _aplicar_categorias(df, comunes):
+    """Copia superficial de df con las categorías de _categorias_comunes."""
+    df = df.copy(deep=False)
+    for col, (a_texto, categorias) in comunes.items():
+        columna = df[col].astype(str).astype('category') if a_texto else df[col]
+        df[col] = columna.cat.set_categories(categorias)
+    return df
+
+
+def reporte_memoria(df):
+    """
+    Memoria ocupada por cada columna del DataFrame.
+
+    Retorna:
+    --------
+    pd.DataFrame
+        Una fila por columna con su tipo y bytes ocupados, más una fila TOTAL
+    """
+    bytes_columna = df.memory_usage(deep=True, index=False)
+    reporte = pd.DataFrame({
+        'tipo': df.dtypes.astype(str),
+        'bytes': bytes_columna,
+    })
+    reporte.loc['TOTAL'] = ['', bytes_columna.sum()]
+    reporte['MB'] = (reporte['bytes'] / 1_000_000).round(2)
+    return reporte
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+# 2. HUELLA DEL ARCHIVO DE ORIGEN
+# ═════════════════════════════════════════════════════════════════════════════
+
+def huella_archivo(filepath):
+    """Huella barata del archivo: mtime en nanosegundos y tamaño en bytes."""
+    stat = os.stat(filepath)
+    return {'mtime_ns': stat.st_mtime_ns, 'tamano': stat.st_size}
+
+
+def version_datos(filepath):
+    """
+    Versión del archivo de origen para usar como clave de caché.
+
+    Retorna:
+    --------
+    tuple or None
+        (mtime_ns, tamaño) o None si el archivo no existe
+    """
+    try:
+        huella = huella_archivo(filepath)
+    except FileNotFoundError:
+        return None
+    return huella['mtime_ns'], huella['tamano']
+
+
+def hash_archivo(filepath, bloque=1 << 20):
+    """SHA-256 del archivo, leído por bloques para no cargarlo entero."""
+    sha = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for parte in iter(lambda: f.read(bloque), b''):
+            sha.update(parte)
+    return sha.hexdigest()
+
+
+def rutas_cache(filepath, directorio=DIRECTORIO_CACHE):
+    """Devuelve (ruta_arrow, ruta_manifiesto) para un CSV de origen."""
+    base = Path(directorio) / Path(filepath).stem
+    return base.with_suffix('.arrow'), base.with_suffix('.json')
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+# 3. ESCRITURA Y LECTURA ARROW
+# ═════════════════════════════════════════════════════════════════════════════
+
+def _sufijo_escritor():
+    """Sufijo único por proceso y llamada para temporales y carpetas de partes."""
+    return f'{os.getpid()}-{uuid.uuid4().hex[:8]}'
+
+
+def _escribir_atomico(ruta, escribir):
+    """
+    Escribe en un temporal y lo renombra, para no dejar archivos a medias.
+
+    El temporal es propio de cada escritor: dos procesos que escriben la
+    misma ruta no se pisan el archivo a medio escribir, y el último
+    os.replace gana con un archivo completo.
+    """
+    ruta = Path(ruta)
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    temporal = ruta.with_name(f'{ruta.name}.{_sufijo_escritor()}.tmp')
+    try:
+        escribir(temporal)
+        os.replace(temporal, ruta)
+    finally:
+        temporal.unlink(missing_ok=True)
+
+
+@contextmanager
+def bloqueo(ruta):
+    """
+    Bloqueo exclusivo entre procesos asociado a una ruta (archivo .lock).
+
+    Usa flock: el sistema lo libera aunque el proceso muera, así que no
+    quedan bloqueos huérfanos. En sistemas sin fcntl no bloquea.
+    """
+    ruta = Path(ruta)
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    with open(ruta.with_name(ruta.name + '.lock'), 'a') as archivo:
+        if fcntl is not None:
+            fcntl.flock(archivo.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(archivo.fileno(), fcntl.LOCK_UN)
+
+
+def _limpiar_restos(ruta_arrow):
+    """
+    Borra la carpeta de partes y el temporal del Arrow de escritores que
+    murieron a medias.
+
+    Solo se llama con el bloqueo de `ruta_arrow` tomado: ningún otro
+    proceso está escribiendo esos restos en ese momento.
+    """
+    for carpeta in ruta_arrow.parent.glob(f'{ruta_arrow.stem}.*.partes'):
+        shutil.rmtree(carpeta, ignore_errors=True)
+    for temporal in ruta_arrow.parent.glob(f'{ruta_arrow.name}.*.tmp'):
+        temporal.unlink(missing_ok=True)
+
+
+def escribir_arrow(df, ruta):
+    """Guarda el DataFrame como archivo Arrow IPC sin compresión."""
+    tabla = pa.Table.from_pandas(df, preserve_index=False)
+
+    def escribir(destino):
+        with pa.OSFile(str(destino), 'wb') as sink:
+            with pa.ipc.new_file(sink, tabla.schema) as writer:
+                writer.write_table(tabla)
+
+    _escribir_atomico(ruta, escribir)
+
+
+def consolidar_partes(rutas, destino, tamano_bloque=TAMANO_BLOQUE):
+    """
+    Une las partes Arrow en un único archivo sin cargarlas todas a la vez.
+
+    Es concatenar() en streaming: las partes se leen con memory-map y se
+    escriben una a una en el mismo archivo IPC, con las categorías ya
+    unificadas (el formato de archivo exige un único diccionario por
+    columna). En memoria vive una parte, no el dataset entero. Si las
+    partes no quedan ordenadas por InvoiceDate, el archivo se reescribe en
+    orden tomando bloques de tamano_bloque filas.
+
+    Retorna:
+    --------
+    int
+        Filas escritas (0 si todas las partes están vacías; entonces no se
+        escribe nada)
+    """
+    destino = Path(destino)
+
+    def abrir():
+        return (df for df in map(leer_arrow, rutas) if len(df))
+
+    comunes = _categorias_comunes(abrir)
+    filas, ordenado, ultima = 0, True, None
+    for df in abrir():
+        fechas = df['InvoiceDate']
+        ordenado = ordenado and fechas.is_monotonic_increasing and (ultima is None or fechas.iloc[0] >= ultima)
+        ultima = fechas.iloc[-1]
+        filas += len(df)
+    if not filas:
+        return 0
+
+    def escribir(salida):
+        writer = esquema = None
+        with pa.OSFile(str(salida), 'wb') as sink:
+            try:
+                for df in abrir():
+                    tabla = pa.Table.from_pandas(_aplicar_categorias(df, comunes),
+                                                 schema=esquema, preserve_index=False)
+                    if writer is None:
+                        esquema = tabla.schema
+                        writer = pa.ipc.new_file(sink, esquema)
+                    writer.write_table(tabla)
+            finally:
+                if writer is not None:
+                    writer.close()
+
+    if ordenado:
+        _escribir_atomico(destino, escribir)
+        return filas
+
+    # Orden estable por fecha, como sort_values en concatenar(): solo el
+    # índice de orden (8 bytes por fila) y un bloque viven en memoria
+    intermedio = destino.with_name(f'{destino.name}.{_sufijo_escritor()}.tmp')
+    try:
+        escribir(intermedio)
+        tabla = pa.ipc.open_file(pa.memory_map(str(intermedio), 'r')).read_all()
+        orden = tabla['InvoiceDate'].to_numpy().argsort(kind='stable')
+
+        def escribir_ordenado(salida):
+            with pa.OSFile(str(salida), 'wb') as sink:
+                with pa.ipc.new_file(sink, tabla.schema) as writer:
+                    for inicio in range(0, filas, tamano_bloque):
+                        writer.write_table(tabla.take(orden[inicio:inicio + tamano_bloque]))
+
+        _escribir_atomico(destino, escribir_ordenado)
+    finally:
+        intermedio.unlink(missing_ok=True)
+    return filas
+
+
+def escribir_por_bloques(filepath, directorio, tamano_bloque=TAMANO_BLOQUE, progreso=None):
+    """
+    Escribe cada bloque limpio del CSV como una parte Arrow en disco.
+
+    Retorna:
+    --------
+    list
+        Rutas de las partes escritas, en orden
+    """
+    directorio = Path(directorio)
+    shutil.rmtree(directorio, ignore_errors=True)
+    rutas = []
+    for i, bloque in enumerate(leer_por_bloques(filepath, tamano_bloque, progreso)):
+        ruta = directorio / f'parte-{i:05d}.arrow'
+        escribir_arrow(bloque, ruta)
+        rutas.append(ruta)
+    return rutas
+
+
+def leer_arrow(ruta):
+    """
+    Abre el archivo Arrow con memory-map y lo convierte a DataFrame.
+
+    Con split_blocks=True las columnas (incluidos los códigos de las
+    categorías) apuntan directamente a las páginas del archivo: no se copian
+    y quedan de solo lectura. Varios procesos que abren el mismo archivo
+    comparten esa memoria a través de la caché de páginas del sistema.
+    """
+    fuente = pa.memory_map(str(ruta), 'r')
+    tabla = pa.ipc.open_file(fuente).read_all()
+    return tabla.to_pandas(split_blocks=True)
+
+
+def leer_manifiesto(ruta):
+    try:
+        with open(ruta, 'r') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def escribir_manifiesto(ruta, manifiesto):
+    def escribir(destino):
+        with open(destino, 'w') as f:
+            json.dump(manifiesto, f, indent=2)
+
+    _escribir_atomico(ruta, escribir)
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+# 4. PARSEO EN PARALELO POR RANGOS DE BYTES
+# ═════════════════════════════════════════════════════════════════════════════
+
+def rangos_de_bytes(filepath, n_rangos):
+    """
+    Divide el cuerpo del CSV en rangos que empiezan y terminan en un salto
+    de línea.
+
+    Cada corte tentativo (tamaño / n_rangos) se avanza hasta el final de la
+    línea en curso. Supone que ningún campo contiene saltos de línea
+    entrecomillados, lo que se cumple en el dataset Online Retail.
+
+    Retorna:
+    --------
+    tuple(bytes, list)
+        Línea de encabezado y lista de (inicio, fin) en bytes
+    """
+    with open(filepath, 'rb') as f:
+        encabezado = f.readline()
+        inicio_cuerpo = f.tell()
+        total = os.fstat(f.fileno()).st_size
+
+        cortes = [inicio_cuerpo]
+        paso = max((total - inicio_cuerpo) // max(n_rangos, 1), 1)
+        for i in range(1, n_rangos):
+            objetivo = inicio_cuerpo + i * paso
+            if objetivo <= cortes[-1]:
+                continue
+            f.seek(objetivo - 1)
+            f.readline()
+            corte = f.tell()
+            if corte >= total:
+                break
+            cortes.append(corte)
+        cortes.append(total)
+
+    rangos = [(a, b) for a, b in zip(cortes[:-1], cortes[1:]) if b > a]
+    return encabezado, rangos
+
+
+def _procesar_rango(filepath, inicio, fin, encabezado, encoding, ruta):
+    """Parsea y limpia un rango de bytes y lo guarda como parte Arrow."""
+    with open(filepath, 'rb') as f:
+        f.seek(inicio)
+        datos = f.read(fin - inicio)
+    df = pd.read_csv(io.BytesIO(encabezado + datos), encoding=encoding, dtype=TIPOS_CSV)
+    escribir_arrow(limpiar_datos(df), ruta)
+    return ruta
+
+
+def escribir_en_paralelo(filepath, directorio, procesos=None, progreso=None,
+                         tamano_rango=TAMANO_RANGO):
+    """
+    Escribe el CSV limpio como partes Arrow, procesando rangos en paralelo.
+
+    Cada proceso lee su rango directamente del archivo y escribe su propia
+    parte, así que entre procesos solo viajan rutas, no DataFrames. Si solo
+    hay un núcleo o el archivo cabe en un rango, se usa la lectura por
+    bloques en el proceso actual.
+
+    Parámetros:
+    -----------
+    filepath : str
+        Ruta al CSV
+    directorio : str
+        Carpeta donde se escriben las partes
+    procesos : int, opcional
+        Número de procesos (por defecto, los núcleos disponibles)
+    progreso : callable, opcional
+        progreso(bytes_procesados, bytes_totales) al terminar cada rango
+    tamano_rango : int
+        Tamaño máximo aproximado de cada rango en bytes
+
+    Retorna:
+    --------
+    list
+        Rutas de las partes escritas, en el orden del archivo
+    """
+    procesos = procesos or os.cpu_count() or 1
+    total = os.path.getsize(filepath)
+    n_rangos = max(procesos, -(-total // tamano_rango))
+    if procesos <= 1 or total <= tamano_rango:
+        return escribir_por_bloques(filepath, directorio, progreso=progreso)
+
+    encabezado, rangos = rangos_de_bytes(filepath, n_rangos)
+    encoding = detectar_encoding(filepath)
+    directorio = Path(directorio)
+    shutil.rmtree(directorio, ignore_errors=True)
+    rutas = [directorio / f'parte-{i:05d}.arrow' for i in range(len(rangos))]
+
+    # 'spawn' en lugar de fork: el servidor de Streamlit tiene varios hilos
+    # y hacer fork de un proceso con hilos no es seguro
+    contexto = multiprocessing.get_context('spawn')
+    procesados = 0
+    with ProcessPoolExecutor(max_workers=min(procesos, len(rangos)),
+                             mp_context=contexto) as pool:
+        tareas = {
+            pool.submit(_procesar_rango, str(filepath), inicio, fin,
+                        encabezado, encoding, ruta): fin - inicio
+            for (inicio, fin), ruta in zip(rangos, rutas)
+        }
+        for tarea in as_completed(tareas):
+            tarea.result()
+            procesados += tareas[tarea]
+            if progreso is not None:
+                progreso(procesados, total)
+    return rutas
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+# 5. PUNTO DE ENTRADA
+# ═════════════════════════════════════════════════════════════════════════════
+
+def cargar_dataset(filepath, directorio=DIRECTORIO_CACHE, progreso=None, procesos=None):
+    """
+    Carga el dataset limpio, usando el caché Arrow si sigue siendo válido.
+
+    Parámetros:
+    -----------
+    filepath : str
+        Ruta al CSV de origen
+    directorio : str
+        Carpeta donde se guarda el caché
+    progreso : callable, opcional
+        progreso(bytes_leidos, bytes_totales) mientras se procesa el CSV
+    procesos : int, opcional
+        Procesos para parsear el CSV (por defecto, los núcleos disponibles)
+
+    Retorna:
+    --------
+    pd.DataFrame
+        DataFrame limpio y procesado
+
+    Lanza FileNotFoundError si el CSV no existe.
+    """
+    huella = huella_archivo(filepath)
+    ruta_arrow, ruta_manifiesto = rutas_cache(filepath, directorio)
+    if _cache_valido(filepath, huella, ruta_arrow, ruta_manifiesto):
+        return leer_arrow(ruta_arrow)
+
+    # Sin caché válido: un solo proceso lo reconstruye. Los que esperan el
+    # bloqueo vuelven a comprobar el manifiesto y leen lo que escribió
+    with bloqueo(ruta_arrow):
+        if _cache_valido(filepath, huella, ruta_arrow, ruta_manifiesto):
+            return leer_arrow(ruta_arrow)
+        _limpiar_restos(ruta_arrow)
+
+        # Parsear y limpiar por rangos (en paralelo) o por bloques. Cada
+        # trozo va a una parte en disco, así que en memoria solo viven los
+        # trozos en curso; después las partes se consolidan en un único
+        # archivo de una en una (consolidar_partes)
+        ruta_partes = ruta_arrow.with_name(f'{ruta_arrow.stem}.{_sufijo_escritor()}.partes')
+        try:
+            partes = escribir_en_paralelo(filepath, ruta_partes, procesos, progreso)
+            filas = consolidar_partes(partes, ruta_arrow)
+            if not filas:
+                raise ValueError(f"'{filepath}' no contiene transacciones válidas")
+        finally:
+            shutil.rmtree(ruta_partes, ignore_errors=True)
+
+        escribir_manifiesto(ruta_manifiesto, {
+            'version': VERSION_ESQUEMA,
+            'origen': str(filepath),
+            'huella': huella,
+            'sha256': hash_archivo(filepath),
+            'filas': filas,
+        })
+    # Se relee del archivo para devolver la misma copia compartida y de solo
+    # lectura que en los arranques siguientes
+    return leer_arrow(ruta_arrow)
+
+
+def _cache_valido(filepath, huella, ruta_arrow, ruta_manifiesto):
+    """¿El Arrow en caché corresponde al CSV actual? (actualiza la huella si hace falta)"""
+    manifiesto = leer_manifiesto(ruta_manifiesto)
+    if (manifiesto is None
+            or manifiesto.get('version') != VERSION_ESQUEMA
+            or not ruta_arrow.exists()):
+        return False
+
+    # Caso rápido: el archivo no se ha tocado
+    if manifiesto['huella'] == huella:
+        return True
+
+    # El mtime cambió (copia, touch...) pero el contenido puede ser igual
+    if manifiesto['sha256'] == hash_archivo(filepath):
+        manifiesto['huella'] = huella
+        escribir_manifiesto(ruta_manifiesto, manifiesto)
+        return True
+    return False
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+# 6. ESTRUCTURAS DERIVADAS DEL CACHÉ
+# ═════════════════════════════════════════════════════════════════════════════
+# Cubo, índice, top-k y features RFM se guardan junto al caché Arrow y se
+# invalidan con el mismo SHA-256: los arranques siguientes los abren en lugar
+# de recalcularlos a partir de las transacciones
+
+def cargar_derivado(filepath, nombre, calcular, guardar, abrir,
+                    directorio=DIRECTORIO_CACHE, extension='', firma_extra=None):
+    """
+    Estructura derivada del CSV, reutilizando la guardada si sigue vigente.
+
+    Se guarda en <nombre del CSV>.<nombre><extension> (un archivo o una
+    carpeta) con una firma <nombre del CSV>.<nombre>.json que se escribe al
+    final: si el proceso muere a medias, el siguiente la recalcula.
+
+    Parámetros:
+    -----------
+    filepath : str
+        Ruta al CSV de origen (su caché Arrow debe existir; si falta su
+        manifiesto, la estructura se recalcula sin guardarla)
+    nombre : str
+        Nombre de la estructura ('cubo', 'rfm'...)
+    calcular : callable
+        calcular() → estructura, si no hay una guardada vigente
+    guardar : callable
+        guardar(estructura, ruta)
+    abrir : callable
+        abrir(ruta) → estructura guardada
+    directorio : str
+        Carpeta del caché
+    extension : str
+        '.arrow' si la estructura es un solo archivo, '' si es una carpeta
+    firma_extra : dict, opcional
+        Parámetros que también invalidan lo guardado (precisión...)
+    """
+    ruta_arrow, ruta_manifiesto = rutas_cache(filepath, directorio)
+    ruta = ruta_arrow.with_name(f'{ruta_arrow.stem}.{nombre}{extension}')
+    ruta_firma = ruta_arrow.with_name(f'{ruta_arrow.stem}.{nombre}.json')
+    manifiesto = leer_manifiesto(ruta_manifiesto)
+    if manifiesto is None:
+        # Sin manifiesto (borrado o corrupto) no hay SHA-256 con el que
+        # firmar: se recalcula y no se guarda
+        return calcular()
+    firma = {'version': VERSION_ESQUEMA, 'sha256': manifiesto['sha256'], **(firma_extra or {})}
+    if leer_manifiesto(ruta_firma) == firma and ruta.exists():
+        return abrir(ruta)
+
+    with bloqueo(ruta):
+        if leer_manifiesto(ruta_firma) == firma and ruta.exists():
+            return abrir(ruta)
+        estructura = calcular()
+        guardar(estructura, ruta)
+        escribir_manifiesto(ruta_firma, firma)
+    return estructura
@@ -0,0 +1,48 @@
+"""
+═════════════════════════════════════════════════════════════════════════════
+    MOTOR DE ANÁLISIS - EL CAMINO DE LOS DATOS DEL DASHBOARD SIN STREAMLIT
+
+    El dashboard es una vista sobre este paquete; los mismos pasos se pueden
+    ejecutar en procesos por lotes, perfilar sin navegador o usar para
+    precalentar cachés:
+    • cargador: FuenteDatos en memoria, SQLite o incremental
+    • filtros: Filtros de la barra lateral → Consulta
+    • kpis: métricas clave y segmentos RFM
+    • graficos: agregaciones de cada gráfico, listas para Plotly
+
+    Uso (desde projects/project3):
+
+        from analitica import Filtros, aplicar_filtros, calcular_kpis, cargar_memoria
+
+        fuente = cargar_memoria('data.csv')
+        info = fuente.info()
+        consulta = aplicar_filtros(fuente, Filtros(info['fecha_inicio'], info['fecha_fin']))
+        calcular_kpis(consulta)
+═════════════════════════════════════════════════════════════════════════════
+"""
+
+from .cargador import FuenteDatos, cargar_memoria, cargar_sqlite, fuente_incremental
+from .filtros import Consulta, Filtros, aplicar_filtros
+from .graficos import (
+    GRANULARIDADES,
+    evolucion,
+    ingresos_por_pais,
+    proyeccion,
+    proyeccion_evolucion,
+    ranking_clientes,
+    ranking_productos,
+    resumen_rfm,
+    serie_pronostico,
+    series_pronostico,
+    ventas_por_dia_semana,
+)
+from .kpis import calcular_kpis, conteos_exactos, segmentar_clientes
+
+__all__ = [
+    'FuenteDatos', 'cargar_memoria', 'cargar_sqlite', 'fuente_incremental',
+    'Consulta', 'Filtros', 'aplicar_filtros',
+    'calcular_kpis', 'conteos_exactos', 'segmentar_clientes',
+    'GRANULARIDADES', 'evolucion', 'proyeccion', 'proyeccion_evolucion',
+    'ranking_productos', 'ranking_clientes', 'ingresos_por_pais', 'ventas_por_dia_semana',
+    'resumen_rfm', 'series_pronostico', 'serie_pronostico',
+]
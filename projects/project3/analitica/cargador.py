@@ -0,0 +1,174 @@
+"""
+═════════════════════════════════════════════════════════════════════════════
+    CARGADOR - FUENTES DE DATOS DEL MOTOR DE ANÁLISIS
+
+    Una FuenteDatos reúne todo lo que el dashboard lee de los datos cargados,
+    sea cual sea el backend:
+    • Memoria: DataFrame (caché Arrow), cubo, índice, top-k y RFM
+      (ingesta.construir_estado), guardados junto al caché Arrow
+    • SQLite: una basedatos.BaseVentas; las transacciones no se cargan
+    • Incremental: el estado de un ingesta.AlmacenIncremental
+═════════════════════════════════════════════════════════════════════════════
+"""
+
+from __future__ import annotations
+
+from typing import Callable, Hashable, Optional
+
+from almacen import DIRECTORIO_CACHE, cargar_dataset, reporte_memoria, version_datos
+from basedatos import BaseVentas, cargar_base
+from cubo import cargar_cubo
+from indice import cargar_indice
+from ingesta import AlmacenIncremental, construir_estado
+from rfm import FeaturesRFM, cargar_rfm
+from topk import cargar_topk
+
+
+class FuenteDatos:
+    """
+    Datos cargados en memoria (estado) o en una base SQLite (base).
+
+    Es de solo lectura: la misma fuente se comparte entre sesiones del
+    dashboard y entre hilos.
+
+    Parámetros:
+    -----------
+    version : hashable
+        Versión de los datos (almacen.version_datos o la del almacén
+        incremental); forma parte de la clave de los resultados cacheados
+    estado : dict, opcional
+        {'df', 'cubo', 'indice', 'top_productos', 'top_clientes', 'rfm'}
+        (ver ingesta.construir_estado)
+    base : basedatos.BaseVentas, opcional
+        Base SQLite (modo DASHBOARD_BACKEND=sqlite)
+    """
+
+    def __init__(self, version: Hashable, estado: Optional[dict] = None,
+                 base: Optional[BaseVentas] = None):
+        if (estado is None) == (base is None):
+            raise ValueError("Una FuenteDatos necesita un estado en memoria o una base SQLite (solo uno)")
+        self.version = version
+        self.estado = estado
+        self.base = base
+        self._info = None
+
+    @property
+    def es_sqlite(self) -> bool:
+        return self.base is not None
+
+    def _componente(self, nombre):
+        return None if self.estado is None else self.estado[nombre]
+
+    @property
+    def df(self):
+        """Transacciones en memoria (None en modo SQLite)."""
+        return self._componente('df')
+
+    @property
+    def cubo(self):
+        return self._componente('cubo')
+
+    @property
+    def indice(self):
+        return self._componente('indice')
+
+    @property
+    def top_productos(self):
+        return self._componente('top_productos')
+
+    @property
+    def top_clientes(self):
+        return self._componente('top_clientes')
+
+    @property
+    def rfm(self) -> FeaturesRFM:
+        """Features RFM de todo el histórico."""
+        return self.base.rfm() if self.es_sqlite else self.estado['rfm']
+
+    def info(self) -> dict:
+        """
+        Resumen de los datos para la barra lateral (se calcula una vez).
+
+        Retorna:
+        --------
+        dict
+            {'filas', 'columnas', 'fecha_inicio', 'fecha_fin', 'paises'} y
+            'memoria' (almacen.reporte_memoria) en memoria o 'mb' (tamaño
+            de la base) en SQLite
+        """
+        if self._info is None:
+            if self.es_sqlite:
+                self._info = self.base.info()
+            else:
+                df = self.df
+                self._info = {
+                    'filas': len(df),
+                    'columnas': len(df.columns),
+                    'fecha_inicio': df['InvoiceDate'].min(),
+                    'fecha_fin': df['InvoiceDate'].max(),
+                    'paises': sorted(df['Country'].unique().tolist()),
+                    'memoria': reporte_memoria(df),
+                }
+        return self._info
+
+
+def cargar_memoria(filepath: str, version: Optional[Hashable] = None,
+                   directorio: str = DIRECTORIO_CACHE,
+                   progreso: Optional[Callable[[int, int], None]] = None) -> FuenteDatos:
+    """
+    Fuente en memoria del CSV: caché Arrow, features RFM y estructuras de consulta.
+
+    Parámetros:
+    -----------
+    filepath : str
+        Ruta al CSV de origen
+    version : hashable, opcional
+        Versión de los datos (por defecto, almacen.version_datos(filepath))
+    directorio : str
+        Carpeta del caché
+    progreso : callable, opcional
+        progreso(bytes_leidos, bytes_totales) mientras se procesa el CSV
+
+    Retorna:
+    --------
+    FuenteDatos
+
+    Lanza FileNotFoundError si el CSV no existe.
+    """
+    if version is None:
+        version = version_datos(filepath)
+    df = cargar_dataset(filepath, directorio, progreso=progreso)
+    # Todas las estructuras se guardan junto al caché Arrow: en los arranques
+    # siguientes se abren con memory-map (project4 reutiliza las features RFM)
+    return FuenteDatos(version, estado=construir_estado(
+        df,
+        cubo=cargar_cubo(filepath, directorio, df=df),
+        indice=cargar_indice(filepath, directorio, df=df),
+        top_productos=cargar_topk(filepath, 'Description', directorio, df=df),
+        top_clientes=cargar_topk(filepath, 'CustomerID', directorio, df=df),
+        rfm=cargar_rfm(filepath, directorio, df=df),
+    ))
+
+
+def cargar_sqlite(filepath: str, version: Optional[Hashable] = None,
+                  directorio: str = DIRECTORIO_CACHE) -> FuenteDatos:
+    """
+    Fuente SQLite del CSV (basedatos.cargar_base), creando la base si hace falta.
+
+    Lanza FileNotFoundError si el CSV no existe.
+    """
+    if version is None:
+        version = version_datos(filepath)
+    return FuenteDatos(version, base=cargar_base(filepath, directorio))
+
+
+def fuente_incremental(almacen: AlmacenIncremental) -> Optional[FuenteDatos]:
+    """
+    Fuente con el estado actual de un almacén incremental ya sincronizado.
+
+    Retorna None si la carpeta todavía no tiene transacciones.
+    """
+    estado = almacen.estado()
+    if estado is None:
+        return None
+    return FuenteDatos(('incremental', almacen.version), estado=estado)
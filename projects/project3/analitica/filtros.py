@@ -0,0 +1,136 @@
+"""
+═════════════════════════════════════════════════════════════════════════════
+    MOTOR DE FILTROS - PAÍS, RANGO DE FECHAS Y CANTIDAD MÍNIMA
+
+    Aplica los filtros de la barra lateral a una FuenteDatos:
+    • Memoria: búsqueda binaria en el índice (transacciones) y selección de
+      celdas del cubo (KPIs y agregados)
+    • SQLite: los filtros se traducen a SQL; las transacciones solo se leen
+      al exportar o previsualizar
+    La tupla Filtros.clave identifica la selección en todas las cachés.
+═════════════════════════════════════════════════════════════════════════════
+"""
+
+from __future__ import annotations
+
+import contextlib
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Callable, ContextManager, Hashable, Optional
+
+import pandas as pd
+
+from exportar import formato_descarga
+
+from .cargador import FuenteDatos
+
+
+@dataclass(frozen=True)
+class Filtros:
+    """
+    Filtros de la barra lateral.
+
+    Atributos:
+    ----------
+    inicio, fin : pd.Timestamp
+        Rango de fechas [inicio, fin): `fin` es exclusivo
+    pais : str or None
+        None para todos los países
+    cantidad_min : int
+        Cantidad mínima por transacción
+    """
+
+    inicio: pd.Timestamp
+    fin: pd.Timestamp
+    pais: Optional[str] = None
+    cantidad_min: int = 1
+
+    @classmethod
+    def de_fechas(cls, fecha_inicio: date, fecha_fin: date, pais: Optional[str] = None,
+                  cantidad_min: int = 1) -> Filtros:
+        """Filtros a partir de las fechas del calendario, con `fecha_fin` incluida."""
+        return cls(pd.to_datetime(fecha_inicio), pd.to_datetime(fecha_fin) + timedelta(days=1),
+                   pais, cantidad_min)
+
+    def clave(self, version: Hashable) -> tuple:
+        """(país, inicio, fin, cantidad mínima, versión de los datos)."""
+        return (self.pais, self.inicio, self.fin, self.cantidad_min, version)
+
+
+class Consulta:
+    """
+    Resultado de aplicar unos Filtros a una FuenteDatos.
+
+    Atributos:
+    ----------
+    fuente : FuenteDatos
+    filtros : Filtros
+    transacciones : pd.DataFrame or None
+        Transacciones filtradas (None en modo SQLite)
+    seleccion : cubo.SeleccionCubo or basedatos.SeleccionSQL
+        KPIs y agregados de la selección (por_mes, por_dia, por_pais...)
+    """
+
+    def __init__(self, fuente: FuenteDatos, filtros: Filtros, transacciones: Optional[pd.DataFrame],
+                 seleccion):
+        self.fuente = fuente
+        self.filtros = filtros
+        self.transacciones = transacciones
+        self.seleccion = seleccion
+
+    @property
+    def filas(self) -> int:
+        """Transacciones que cumplen los filtros."""
+        return self.seleccion.filas
+
+    @property
+    def clave(self) -> tuple:
+        """Clave de la selección (ver Filtros.clave)."""
+        return self.filtros.clave(self.fuente.version)
+
+    def transacciones_exportables(self, limite: Optional[int] = None) -> pd.DataFrame:
+        """Transacciones filtradas (las primeras `limite`), leídas de la base en SQLite."""
+        if self.transacciones is None:
+            return self.seleccion.transacciones(limite=limite)
+        return self.transacciones if limite is None else self.transacciones.head(limite)
+
+    def vista_previa(self, filas: int = 100) -> pd.DataFrame:
+        """Primeras filas con las columnas de la descarga (exportar.formato_descarga)."""
+        return formato_descarga(self.transacciones_exportables(limite=filas))
+
+
+def _sin_medir(nombre):
+    return contextlib.nullcontext()
+
+
+def aplicar_filtros(fuente: FuenteDatos, filtros: Filtros,
+                    paso: Callable[[str], ContextManager] = _sin_medir) -> Consulta:
+    """
+    Aplica los filtros al índice y al cubo (memoria) o a la base (SQLite).
+
+    Parámetros:
+    -----------
+    fuente : FuenteDatos
+    filtros : Filtros
+    paso : callable, opcional
+        paso(nombre) -> context manager que envuelve cada filtro (por
+        ejemplo instrumentacion.Ejecucion.paso, para medirlos)
+
+    Retorna:
+    --------
+    Consulta
+    """
+    argumentos = (filtros.pais, filtros.inicio, filtros.fin, filtros.cantidad_min)
+    if fuente.es_sqlite:
+        return Consulta(fuente, filtros, None, fuente.base.seleccionar(*argumentos))
+
+    # Búsqueda binaria sobre el índice: el costo depende del tamaño del resultado
+    with paso("Filtro del índice"):
+        transacciones = fuente.indice.filtrar(fuente.df, *argumentos)
+    if 'TotalPrice' not in transacciones.columns:
+        transacciones = transacciones.assign(TotalPrice=transacciones['Quantity'] * transacciones['UnitPrice'])
+
+    # Los mismos filtros sobre el cubo (KPIs y gráficos agregados)
+    with paso("Filtro del cubo"):
+        seleccion = fuente.cubo.seleccionar(*argumentos)
+    return Consulta(fuente, filtros, transacciones, seleccion)
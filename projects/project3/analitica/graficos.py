@@ -0,0 +1,215 @@
+"""
+═════════════════════════════════════════════════════════════════════════════
+    AGREGACIONES DE LOS GRÁFICOS - DATOS LISTOS PARA PLOTLY
+
+    Cada función recibe una Consulta (o una tabla ya calculada) y devuelve
+    el DataFrame o la serie que dibuja un gráfico del dashboard, con los
+    límites de render.py aplicados (LTTB en series largas, "Otros" en las
+    categorías). No dependen de Streamlit ni de Plotly.
+═════════════════════════════════════════════════════════════════════════════
+"""
+
+from __future__ import annotations
+
+from typing import List, Optional, Tuple
+
+import pandas as pd
+
+from fechas import etiquetas_mes, fechas_de_dia, mes_de_dia
+from pronosticos import HORIZONTE
+from proyeccion import proyectar
+from render import agrupar_otros, reducir_serie
+from rfm import resumen_segmentos
+from topk import K_DEFECTO
+
+from .filtros import Consulta
+
+GRANULARIDADES = ('Mensual', 'Diaria')
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+# 1. EVOLUCIÓN DE INGRESOS Y PROYECCIÓN
+# ═════════════════════════════════════════════════════════════════════════════
+
+def evolucion(consulta: Consulta, granularidad: str = 'Mensual') -> pd.DataFrame:
+    """
+    Ingresos y transacciones por mes o por día.
+
+    Parámetros:
+    -----------
+    consulta : Consulta
+    granularidad : str
+        'Mensual' o 'Diaria'. La serie diaria se reduce con LTTB si supera
+        el presupuesto de puntos (render.PUNTOS_MAX)
+
+    Retorna:
+    --------
+    pd.DataFrame
+        Month ('AAAA-MM' o fecha del día), TotalPrice y Transacciones
+    """
+    if granularidad not in GRANULARIDADES:
+        raise ValueError(f"Granularidad no soportada: {granularidad}")
+    if granularidad == 'Mensual':
+        serie = consulta.seleccion.por_mes()
+        serie.columns = ['Month', 'TotalPrice', 'Transacciones']
+        # Las etiquetas 'AAAA-MM' se crean solo para los meses del resultado
+        serie['Month'] = etiquetas_mes(serie['Month'])
+    else:
+        serie = reducir_serie(consulta.seleccion.por_dia(), 'Dia', 'Ingresos').copy()
+        serie.columns = ['Month', 'TotalPrice', 'Transacciones']
+        serie['Month'] = fechas_de_dia(serie['Month'])
+    return serie
+
+
+def proyeccion(consulta: Consulta, horizonte: int = HORIZONTE) -> Optional[pd.DataFrame]:
+    """
+    Proyección de los ingresos diarios de la selección (proyeccion.proyectar).
+
+    Retorna None si la selección tiene menos de proyeccion.MIN_DIAS días.
+    """
+    return proyectar(consulta.seleccion.por_dia(), horizonte)
+
+
+def proyeccion_evolucion(proyectado: pd.DataFrame, serie: pd.DataFrame,
+                         granularidad: str = 'Mensual') -> pd.DataFrame:
+    """
+    Proyección en el mismo eje que evolucion().
+
+    Parámetros:
+    -----------
+    proyectado : pd.DataFrame
+        Resultado de proyeccion()
+    serie : pd.DataFrame
+        Resultado de evolucion() con la misma granularidad
+    granularidad : str
+        'Mensual' o 'Diaria'
+
+    Retorna:
+    --------
+    pd.DataFrame
+        Month y yhat; en la diaria también yhat_lower e yhat_upper. En la
+        mensual los días se suman por mes y el último mes con datos se
+        completa con lo real
+    """
+    if granularidad == 'Diaria':
+        return pd.DataFrame({
+            'Month': fechas_de_dia(proyectado['Dia']),
+            'yhat': proyectado['yhat'].to_numpy(),
+            'yhat_lower': proyectado['yhat_lower'].to_numpy(),
+            'yhat_upper': proyectado['yhat_upper'].to_numpy(),
+        })
+    por_mes = proyectado.groupby(mes_de_dia(proyectado['Dia']))['yhat'].sum()
+    meses = etiquetas_mes(por_mes.index)
+    yhat = por_mes.to_numpy()
+    if len(serie) and meses[0] == serie['Month'].iloc[-1]:
+        yhat[0] += serie['TotalPrice'].iloc[-1]
+    return pd.DataFrame({'Month': meses, 'yhat': yhat})
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+# 2. RANKINGS (TOP-K PRODUCTOS Y CLIENTES)
+# ═════════════════════════════════════════════════════════════════════════════
+# Top-K exacto sobre sumas parciales por mes y país (topk.py); los días
+# sueltos de los extremos salen de las transacciones filtradas. El filtro de
+# cantidad mínima no tiene sumas parciales: se agrega directo sobre las
+# transacciones filtradas. En SQLite se agrega sobre los índices de la base
+
+def ranking_productos(consulta: Consulta, k: int = K_DEFECTO) -> pd.DataFrame:
+    """Los k productos más vendidos: Description, Quantity y TotalPrice."""
+    f = consulta.filtros
+    if consulta.fuente.es_sqlite:
+        ranking = consulta.seleccion.top('Description', 'Cantidad', k)
+    elif f.cantidad_min <= 1:
+        ranking = consulta.fuente.top_productos.consultar(f.pais, f.inicio, f.fin, 'Cantidad', k,
+                                                          consulta.transacciones)
+    else:
+        return consulta.transacciones.groupby('Description', observed=True).agg({
+            'Quantity': 'sum',
+            'TotalPrice': 'sum'
+        }).nlargest(k, 'Quantity').reset_index()
+    return ranking.rename(columns={'Cantidad': 'Quantity', 'Ingresos': 'TotalPrice'})
+
+
+def ranking_clientes(consulta: Consulta, k: int = K_DEFECTO) -> pd.DataFrame:
+    """
+    Los k clientes con más ingresos: CustomerID (texto), TotalPrice e
+    InvoiceNo (número de transacciones).
+    """
+    f = consulta.filtros
+    if consulta.fuente.es_sqlite:
+        ranking = consulta.seleccion.top('CustomerID', 'Ingresos', k)
+    elif f.cantidad_min <= 1:
+        ranking = consulta.fuente.top_clientes.consultar(f.pais, f.inicio, f.fin, 'Ingresos', k,
+                                                         consulta.transacciones)
+    else:
+        ranking = consulta.transacciones.groupby('CustomerID').agg({
+            'TotalPrice': 'sum',
+            'InvoiceNo': 'count'
+        }).nlargest(k, 'TotalPrice').reset_index()
+    ranking = ranking.rename(columns={'Ingresos': 'TotalPrice', 'Filas': 'InvoiceNo'})
+    ranking['CustomerID'] = ranking['CustomerID'].astype(str)
+    return ranking
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+# 3. DISTRIBUCIONES (PAÍS Y DÍA DE LA SEMANA)
+# ═════════════════════════════════════════════════════════════════════════════
+
+def ingresos_por_pais(consulta: Consulta) -> pd.DataFrame:
+    """Country y TotalPrice: 9 países principales y el resto en "Otros"."""
+    ingresos = agrupar_otros(consulta.seleccion.por_pais()).reset_index()
+    ingresos.columns = ['Country', 'TotalPrice']
+    return ingresos
+
+
+def ventas_por_dia_semana(consulta: Consulta) -> pd.Series:
+    """Ingresos por día de la semana (0 = lunes ... 6 = domingo, ver fechas.NOMBRES_DIA)."""
+    return consulta.seleccion.por_dia_semana()
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+# 4. SEGMENTOS RFM Y PRONÓSTICOS PRECALCULADOS
+# ═════════════════════════════════════════════════════════════════════════════
+# Vistas de todo el histórico: las fechas y la cantidad mínima no se aplican
+
+def resumen_rfm(clientes: pd.DataFrame, pais: Optional[str] = None) -> Optional[pd.DataFrame]:
+    """
+    Clientes, medias RFM e ingresos por segmento (rfm.resumen_segmentos).
+
+    Parámetros:
+    -----------
+    clientes : pd.DataFrame
+        Resultado de kpis.segmentar_clientes
+    pais : str, opcional
+        País de la última compra de cada cliente
+
+    Retorna:
+    --------
+    pd.DataFrame or None
+        None si no hay clientes con historial RFM para el país
+    """
+    if pais is not None:
+        clientes = clientes[clientes['Country'] == pais]
+    if clientes.empty:
+        return None
+    return resumen_segmentos(clientes).reset_index()
+
+
+def series_pronostico(pronosticos: pd.DataFrame) -> List[str]:
+    """Nombres 'Tipo: Grupo' de las series de la tabla de pronósticos."""
+    series = pronosticos[['Tipo', 'Grupo']].drop_duplicates()
+    return (series['Tipo'] + ': ' + series['Grupo']).tolist()
+
+
+def serie_pronostico(pronosticos: pd.DataFrame, serie: str) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Historia y pronóstico de una serie 'Tipo: Grupo'.
+
+    Retorna:
+    --------
+    (pd.DataFrame, pd.DataFrame)
+        Todas las filas de la serie y solo las futuras (sin valor real)
+    """
+    tipo, grupo = serie.split(': ', 1)
+    pronostico = pronosticos[(pronosticos['Tipo'] == tipo) & (pronosticos['Grupo'] == grupo)]
+    return pronostico, pronostico[pronostico['y'].isna()]
@@ -0,0 +1,66 @@
+"""
+═════════════════════════════════════════════════════════════════════════════
+    MOTOR DE KPIs - MÉTRICAS CLAVE Y SEGMENTOS RFM
+
+    • Los conteos distintos (pedidos, clientes, productos) se estiman con
+      los sketches HyperLogLog del cubo o, a pedido (auditoría), se cuentan
+      con nunique() sobre las transacciones filtradas
+    • En SQLite la selección ya devuelve conteos exactos
+    • Los segmentos RFM se calculan sobre el almacén de features (una fila
+      por factura), no sobre las transacciones
+═════════════════════════════════════════════════════════════════════════════
+"""
+
+from __future__ import annotations
+
+from typing import Dict, Tuple
+
+import pandas as pd
+
+from rfm import segmentar
+
+from .cargador import FuenteDatos
+from .filtros import Consulta
+
+
+def conteos_exactos(transacciones: pd.DataFrame) -> Tuple[int, int, int]:
+    """Pedidos, clientes y productos distintos contados con nunique()."""
+    return (transacciones['InvoiceNo'].nunique(), transacciones['CustomerID'].nunique(),
+            transacciones['Description'].nunique())
+
+
+def calcular_kpis(consulta: Consulta, exactos: bool = False) -> Dict[str, float]:
+    """
+    KPIs principales de la selección.
+
+    Parámetros:
+    -----------
+    consulta : Consulta
+        Resultado de filtros.aplicar_filtros
+    exactos : bool
+        Contar pedidos, clientes y productos sobre las transacciones
+        filtradas en lugar de estimarlos con HyperLogLog (solo memoria;
+        recorre toda la selección)
+
+    Retorna:
+    --------
+    dict
+        {'ingresos_totales', 'pedidos_totales', 'clientes_unicos',
+        'cantidad_productos', 'ticket_promedio', 'ingresos_promedio_cliente',
+        'cantidad_promedio'}
+    """
+    metricas = consulta.seleccion.metricas()
+    if exactos and consulta.transacciones is not None:
+        pedidos, clientes, productos = conteos_exactos(consulta.transacciones)
+        ingresos = metricas['ingresos_totales']
+        metricas['pedidos_totales'] = pedidos
+        metricas['clientes_unicos'] = clientes
+        metricas['cantidad_productos'] = productos
+        metricas['ticket_promedio'] = ingresos / pedidos if pedidos else 0.0
+        metricas['ingresos_promedio_cliente'] = ingresos / clientes if clientes else 0.0
+    return metricas
+
+
+def segmentar_clientes(fuente: FuenteDatos) -> pd.DataFrame:
+    """Tabla RFM por cliente con su segmento (rfm.segmentar), de todo el histórico."""
+    return segmentar(fuente.rfm.clientes())
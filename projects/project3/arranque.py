@@ -0,0 +1,298 @@
+"""
+═════════════════════════════════════════════════════════════════════════════
+    ARRANQUE DEL SERVIDOR - PRECALENTAMIENTO Y SEÑAL DE LISTO
+
+    `streamlit run dashboard.py` no hace nada hasta la primera visita: esa
+    sesión paga las importaciones pesadas y load_data completo. Este
+    lanzador arranca Streamlit en el mismo proceso y, en un hilo en segundo
+    plano:
+    • Importa los módulos pesados (pandas, pyarrow, plotly...) y el motor
+      de análisis (analitica/)
+    • Carga la fuente de datos del backend configurado (memoria, SQLite o
+      carpeta incremental), que load_data/load_base/load_incremental
+      recogen en lugar de cargarla otra vez
+    • Calcula los KPIs, la proyección y los segmentos de la vista por
+      defecto (sin filtros) y los siembra en la caché de KPIs
+    • Responde en /listo (HTTP, --puerto-listo) con 200 cuando todo está
+      caliente y 503 mientras tanto, para que una réplica nueva solo
+      reciba tráfico cuando ya está lista
+
+    Este módulo solo importa la biblioteca estándar: dashboard.py lo
+    importa en cada ejecución sin pagar nada por él.
+
+    Uso:
+        python arranque.py                                  # como streamlit run dashboard.py
+        python arranque.py --puerto-listo 8502 --server.port 8501
+═════════════════════════════════════════════════════════════════════════════
+"""
+
+import argparse
+import importlib
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+logger = logging.getLogger('dashboard.arranque')
+
+# Con DASHBOARD_BACKEND=sqlite los filtros y agrupaciones se resuelven en
+# SQLite (basedatos.py) en lugar de sobre el DataFrame en memoria
+BACKEND_SQLITE = os.environ.get('DASHBOARD_BACKEND', 'memoria') == 'sqlite'
+
+ARCHIVO_DATOS = 'data.csv'
+
+DASHBOARD = Path(__file__).with_name('dashboard.py')
+
+# Módulos que el dashboard necesita para dibujar la primera página
+MODULOS_PESADOS = ('pandas', 'numpy', 'pyarrow', 'pyarrow.parquet',
+                   'plotly.graph_objects', 'plotly.express', 'analitica')
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+# 1. CLAVES DE LA CACHÉ DE KPIs
+# ═════════════════════════════════════════════════════════════════════════════
+# Las usan dashboard.py y el precalentamiento: una entrada sembrada solo
+# sirve si su clave es la misma que pide el dashboard
+
+def clave_metricas(consulta, exactos):
+    return consulta.clave + (exactos,)
+
+
+def clave_ranking(consulta, entidad, k):
+    return consulta.clave + ('top', entidad, k)
+
+
+def clave_proyeccion(consulta, horizonte):
+    return consulta.clave + ('proyeccion', horizonte)
+
+
+def clave_segmentos(fuente):
+    return ('segmentos', fuente.version)
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+# 2. PRECALENTAMIENTO EN SEGUNDO PLANO
+# ═════════════════════════════════════════════════════════════════════════════
+
+class Precalentador:
+    """
+    Carga los datos y la vista por defecto en un hilo, una vez por proceso.
+
+    Los recursos se entregan una sola vez (tomar): a partir de ahí viven en
+    st.cache_resource como si el dashboard los hubiera cargado. Mientras no
+    se llame a iniciar(), tomar() y sembrar() no hacen nada.
+
+    Atributos:
+    ----------
+    estado : str
+        'frio' (sin iniciar), 'calentando', 'listo' o 'error'
+    pasos : list of (str, float)
+        Segundos de cada paso del precalentamiento
+    """
+
+    def __init__(self):
+        self.estado = 'frio'
+        self.pasos = []
+        self.error = None
+        self.inicio = None
+        self.fin = None
+        self._recursos = {}
+        self._entradas = {}
+        self._lock = threading.Lock()
+        self._terminado = threading.Event()
+
+    @property
+    def listo(self):
+        return self.estado == 'listo'
+
+    def iniciar(self, filepath=ARCHIVO_DATOS, sqlite=BACKEND_SQLITE):
+        """Arranca el hilo de precalentamiento (solo la primera vez)."""
+        with self._lock:
+            if self.estado != 'frio':
+                return
+            self.estado = 'calentando'
+            self.inicio = time.time()
+        threading.Thread(target=self._calentar, args=(filepath, sqlite),
+                         name='precalentamiento', daemon=True).start()
+
+    @contextmanager
+    def _paso(self, nombre):
+        inicio = time.perf_counter()
+        yield
+        self.pasos.append((nombre, time.perf_counter() - inicio))
+        logger.info("Precalentamiento: %s (%.2f s)", nombre, self.pasos[-1][1])
+
+    def _calentar(self, filepath, sqlite):
+        try:
+            with self._paso("Importaciones"):
+                for modulo in MODULOS_PESADOS:
+                    importlib.import_module(modulo)
+            self._cargar(filepath, sqlite)
+            self.estado = 'listo'
+        except Exception as e:
+            # El dashboard cargará por su cuenta (y mostrará el error)
+            logger.exception("Precalentamiento fallido")
+            self.error = f"{type(e).__name__}: {e}"
+            self.estado = 'error'
+        finally:
+            self.fin = time.time()
+            self._terminado.set()
+
+    def _cargar(self, filepath, sqlite):
+        from almacen import version_datos
+        from analitica import (Filtros, aplicar_filtros, calcular_kpis, cargar_memoria, cargar_sqlite,
+                               fuente_incremental, proyeccion, ranking_clientes, ranking_productos,
+                               segmentar_clientes)
+        from ingesta import DIRECTORIO_ENTRADA, AlmacenIncremental
+        from pronosticos import HORIZONTE
+        from topk import K_DEFECTO
+
+        # El mismo backend y las mismas claves que la sección 3 del dashboard
+        with self._paso("Carga de datos"):
+            if sqlite:
+                version = version_datos(filepath)
+                fuente = cargar_sqlite(filepath, version)
+                self._recursos['load_base'] = ((filepath, version), fuente)
+            elif os.path.isdir(DIRECTORIO_ENTRADA):
+                almacen = AlmacenIncremental(DIRECTORIO_ENTRADA)
+                almacen.sincronizar()
+                fuente = fuente_incremental(almacen)
+                self._recursos['load_incremental'] = ((DIRECTORIO_ENTRADA,), almacen)
+            else:
+                version = version_datos(filepath)
+                fuente = cargar_memoria(filepath, version)
+                self._recursos['load_data'] = ((filepath, version), fuente)
+        if fuente is None:
+            return
+
+        # Vista por defecto: todo el período, todos los países y cantidad
+        # mínima 1. Los conteos son los que pide el dashboard sin tocar la
+        # casilla: HyperLogLog en memoria, exactos en SQLite
+        with self._paso("Vista por defecto"):
+            info = fuente.info()
+            consulta = aplicar_filtros(fuente, Filtros.de_fechas(info['fecha_inicio'].date(),
+                                                                 info['fecha_fin'].date()))
+            exactos = fuente.es_sqlite
+            self._entradas[clave_metricas(consulta, exactos)] = calcular_kpis(consulta, exactos)
+            self._entradas[clave_proyeccion(consulta, HORIZONTE)] = proyeccion(consulta)
+            self._entradas[clave_segmentos(fuente)] = segmentar_clientes(fuente)
+            if fuente.es_sqlite:
+                for entidad, ranking in (('Description', ranking_productos), ('CustomerID', ranking_clientes)):
+                    self._entradas[clave_ranking(consulta, entidad, K_DEFECTO)] = ranking(consulta, K_DEFECTO)
+
+    def tomar(self, nombre, clave):
+        """
+        Recurso precalentado para una función de st.cache_resource.
+
+        Si el precalentamiento está en curso, espera a que termine (cargar
+        otra copia en paralelo solo duplicaría la memoria).
+
+        Parámetros:
+        -----------
+        nombre : str
+            'load_data', 'load_base' o 'load_incremental'
+        clave : tuple
+            Argumentos con los que el dashboard llama a la función
+
+        Retorna:
+        --------
+        object or None
+            None si no se precalentó, o si los datos cambiaron desde entonces
+        """
+        if self.estado == 'frio':
+            return None
+        self._terminado.wait()
+        with self._lock:
+            recurso = self._recursos.pop(nombre, None)
+        if recurso is None or recurso[0] != clave:
+            return None
+        return recurso[1]
+
+    def sembrar(self, cache):
+        """Guarda en la caché de KPIs los resultados de la vista por defecto."""
+        if self.estado == 'frio':
+            return
+        self._terminado.wait()
+        with self._lock:
+            entradas, self._entradas = self._entradas, {}
+        for clave, valor in entradas.items():
+            cache.guardar(clave, valor)
+
+    def resumen(self):
+        """Estado, duración y pasos (lo que devuelve /listo)."""
+        fin = self.fin if self.fin is not None else time.time()
+        return {
+            'estado': self.estado,
+            'segundos': None if self.inicio is None else round(fin - self.inicio, 3),
+            'pasos': {nombre: round(segundos, 3) for nombre, segundos in self.pasos},
+            'error': self.error,
+        }
+
+
+# Uno por proceso: lo comparten el lanzador y todas las ejecuciones del script
+PRECALENTADOR = Precalentador()
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+# 3. SEÑAL DE LISTO (HTTP)
+# ═════════════════════════════════════════════════════════════════════════════
+
+class _Listo(BaseHTTPRequestHandler):
+    """GET /listo: 200 si el precalentamiento terminó bien, 503 si no."""
+
+    def do_GET(self):
+        if self.path.split('?')[0] != '/listo':
+            self.send_error(404)
+            return
+        cuerpo = json.dumps(PRECALENTADOR.resumen(), ensure_ascii=False).encode('utf-8')
+        self.send_response(200 if PRECALENTADOR.listo else 503)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def log_message(self, formato, *args):
+        logger.debug(formato, *args)
+
+
+def servir_listo(puerto, direccion=''):
+    """Atiende /listo en un hilo en segundo plano; devuelve el servidor."""
+    servidor = ThreadingHTTPServer((direccion, puerto), _Listo)
+    threading.Thread(target=servidor.serve_forever, name='listo', daemon=True).start()
+    return servidor
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+# PUNTO DE ENTRADA
+# ═════════════════════════════════════════════════════════════════════════════
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Arranca el dashboard precalentando datos y cachés en segundo plano. "
+                    "Las opciones desconocidas se pasan a `streamlit run` (por ejemplo --server.port).")
+    parser.add_argument('--puerto-listo', type=int, default=os.environ.get('DASHBOARD_PUERTO_LISTO'),
+                        help="Puerto de la señal de listo (GET /listo)")
+    args, opciones_streamlit = parser.parse_known_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(name)s %(levelname)s %(message)s')
+    if args.puerto_listo:
+        servir_listo(int(args.puerto_listo))
+    PRECALENTADOR.iniciar()
+
+    # Streamlit se importa después de lanzar el hilo: el servidor arranca
+    # mientras los datos se cargan
+    from streamlit.web import cli
+    sys.argv = ['streamlit', 'run', str(DASHBOARD), *opciones_streamlit]
+    return cli.main()
+
+
+if __name__ == '__main__':
+    # Como script este archivo es __main__; dashboard.py importa `arranque`.
+    # Se usa ese módulo para que ambos compartan el mismo PRECALENTADOR
+    import arranque
+    sys.exit(arranque.main())
@@ -0,0 +1,530 @@
+"""
+═════════════════════════════════════════════════════════════════════════════
+    BASE SQLITE - TRANSACCIONES INDEXADAS Y AGREGACIÓN EN SQL
+
+    Alternativa al DataFrame en memoria: las transacciones limpias se
+    guardan en una base SQLite y los filtros y agrupaciones del dashboard
+    se resuelven con consultas SQL, así que solo viajan a pandas los
+    resultados agregados.
+    • Carga masiva: una sola transacción con executemany, PRAGMAs de carga
+      (WAL, synchronous, page_size) y los índices creados al final
+    • Índices cubrientes por fecha y por país + fecha: las consultas de
+      KPIs y rankings no tocan la tabla
+    • Tablas resumen: resumen_dia (día × país × bucket de cantidad, como el
+      cubo) y facturas (una fila por factura, base de las features RFM)
+    • Conexiones de solo lectura reutilizadas desde un pool
+═════════════════════════════════════════════════════════════════════════════
+"""
+
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from almacen import DIRECTORIO_CACHE, VERSION_ESQUEMA, aplicar_esquema, cargar_dataset, leer_manifiesto, rutas_cache
+from cubo import CANTIDAD_MAX_BUCKET
+from fechas import limite_dia
+from rfm import FeaturesRFM
+from topk import MEDIDAS
+
+# Filas por lote de executemany durante la carga
+TAMANO_BLOQUE_CARGA = 50_000
+
+# Conexiones de lectura abiertas como máximo por base
+TAMANO_POOL = 4
+
+# Segundos de espera por una conexión libre antes de fallar
+ESPERA_POOL = 30
+
+# Columnas de la tabla transacciones (InvoiceDate en segundos desde 1970)
+COLUMNAS = [
+    'InvoiceNo', 'StockCode', 'Description', 'Quantity', 'InvoiceDate', 'UnitPrice',
+    'CustomerID', 'Country', 'TotalPrice', 'DayCode', 'MonthCode', 'DayOfWeek',
+]
+
+# page_size debe fijarse antes de crear las tablas. Durante la carga la base
+# es un archivo temporal que solo se renombra al terminar, así que no hace
+# falta sincronizar cada escritura con el disco
+PRAGMAS_CARGA = [
+    'page_size = 8192',
+    'journal_mode = WAL',
+    'synchronous = OFF',
+    'temp_store = MEMORY',
+    'cache_size = -131072',  # KiB (128 MB)
+]
+
+PRAGMAS_LECTURA = [
+    'query_only = ON',
+    'temp_store = MEMORY',
+    'cache_size = -32768',  # KiB (32 MB por conexión)
+    'mmap_size = 268435456',  # Lectura con memory-map (256 MB)
+]
+
+ESQUEMA_SQL = """
+CREATE TABLE transacciones (
+    InvoiceNo,
+    StockCode TEXT,
+    Description TEXT,
+    Quantity INTEGER,
+    InvoiceDate INTEGER,
+    UnitPrice REAL,
+    CustomerID INTEGER,
+    Country TEXT,
+    TotalPrice REAL,
+    DayCode INTEGER,
+    MonthCode INTEGER,
+    DayOfWeek INTEGER
+);
+
+CREATE TABLE resumen_dia (
+    Country TEXT,
+    DayCode INTEGER,
+    Bucket INTEGER,
+    MonthCode INTEGER,
+    DayOfWeek INTEGER,
+    Ingresos REAL,
+    Filas INTEGER,
+    Cantidad INTEGER,
+    PRIMARY KEY (Country, DayCode, Bucket)
+) WITHOUT ROWID;
+
+CREATE TABLE facturas (
+    CustomerID INTEGER,
+    InvoiceNo,
+    Country TEXT,
+    Fecha INTEGER,
+    Total REAL,
+    PRIMARY KEY (CustomerID, InvoiceNo)
+) WITHOUT ROWID;
+"""
+
+# Las tablas resumen se agregan dentro de SQLite, sin pasar por pandas.
+# En facturas, Country sale de la fila con la fecha máxima (columna "bare"
+# junto a MAX en SQLite)
+RESUMENES_SQL = f"""
+INSERT INTO resumen_dia
+SELECT Country, DayCode, MIN(Quantity, {CANTIDAD_MAX_BUCKET}) AS Bucket, MonthCode, DayOfWeek,
+       SUM(TotalPrice), COUNT(*), SUM(Quantity)
+FROM transacciones
+GROUP BY Country, DayCode, Bucket;
+
+INSERT INTO facturas
+SELECT CustomerID, InvoiceNo, Country, MAX(InvoiceDate), SUM(TotalPrice)
+FROM transacciones
+GROUP BY CustomerID, InvoiceNo;
+"""
+
+# Índices cubrientes: los filtros del dashboard (fecha, país, cantidad) y
+# las columnas que se cuentan o suman están todas en el índice
+INDICES_SQL = """
+CREATE INDEX idx_transacciones_fecha
+    ON transacciones (InvoiceDate, Quantity, CustomerID, InvoiceNo, TotalPrice, Description);
+CREATE INDEX idx_transacciones_pais
+    ON transacciones (Country, InvoiceDate, Quantity, CustomerID, InvoiceNo, TotalPrice, Description);
+CREATE INDEX idx_transacciones_cliente ON transacciones (CustomerID);
+CREATE INDEX idx_resumen_dia_dia ON resumen_dia (DayCode);
+"""
+
+
+def _segundos(fechas):
+    """Segundos desde 1970-01-01 de cada fecha (int64)."""
+    return np.asarray(fechas, dtype='datetime64[ns]').astype('datetime64[s]').astype(np.int64)
+
+
+def _filas(bloque):
+    """Tuplas de un trozo de transacciones listas para executemany."""
+    columnas = []
+    for nombre in COLUMNAS:
+        serie = bloque[nombre]
+        if nombre == 'InvoiceDate':
+            valores = _segundos(serie)
+        elif isinstance(serie.dtype, pd.CategoricalDtype):
+            valores = serie.astype(object).to_numpy()
+        elif serie.dtype == 'float32':
+            # float32 (UnitPrice) se guardaría como 0.5899999737...: se usa
+            # su representación decimal más corta
+            valores = serie.astype(str).astype('float64').to_numpy()
+        else:
+            valores = serie.to_numpy()
+        columnas.append(valores.tolist())
+    return zip(*columnas)
+
+
+def crear_base(df, ruta, tamano_bloque=TAMANO_BLOQUE_CARGA):
+    """
+    Crea la base SQLite con las transacciones, las tablas resumen y los índices.
+
+    Se escribe en un temporal que se renombra al final, así que nunca queda
+    una base a medias en la ruta definitiva.
+
+    Parámetros:
+    -----------
+    df : pd.DataFrame
+        Transacciones limpias (almacen.cargar_dataset)
+    ruta : str or Path
+        Archivo .db de destino
+    tamano_bloque : int
+        Filas por lote de executemany
+    """
+    ruta = Path(ruta)
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    temporal = ruta.with_name(f'{ruta.name}.{os.getpid()}.tmp')
+    temporal.unlink(missing_ok=True)
+
+    insertar = f"INSERT INTO transacciones VALUES ({', '.join('?' * len(COLUMNAS))})"
+    con = sqlite3.connect(temporal, isolation_level=None)
+    try:
+        for pragma in PRAGMAS_CARGA:
+            con.execute(f'PRAGMA {pragma}')
+        con.execute('BEGIN')
+        for sentencia in ESQUEMA_SQL.split(';'):
+            if sentencia.strip():
+                con.execute(sentencia)
+        for inicio in range(0, len(df), tamano_bloque):
+            con.executemany(insertar, _filas(df.iloc[inicio:inicio + tamano_bloque]))
+        # Los índices se construyen una vez cargados los datos: es más
+        # rápido que mantenerlos fila a fila durante los INSERT
+        for sentencia in (RESUMENES_SQL + INDICES_SQL).split(';'):
+            if sentencia.strip():
+                con.execute(sentencia)
+        con.execute('COMMIT')
+        con.execute('ANALYZE')
+        con.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    finally:
+        con.close()
+    temporal.replace(ruta)
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+# POOL DE CONEXIONES DE SOLO LECTURA
+# ═════════════════════════════════════════════════════════════════════════════
+
+class PoolLectura:
+    """
+    Conexiones de solo lectura a una base SQLite, reutilizadas entre consultas.
+
+    Cada conexión la usa un único hilo a la vez (se toma y se devuelve con
+    conexion()), así que las sesiones de Streamlit, que corren en hilos
+    distintos, pueden compartir el pool. Se abren bajo demanda hasta
+    `tamano`; después se espera a que alguna quede libre.
+
+    Parámetros:
+    -----------
+    ruta : str or Path
+        Archivo .db
+    tamano : int
+        Conexiones abiertas como máximo
+    """
+
+    def __init__(self, ruta, tamano=TAMANO_POOL):
+        self.ruta = Path(ruta)
+        self.tamano = tamano
+        self._libres = queue.LifoQueue()
+        self._cupo = threading.BoundedSemaphore(tamano)
+
+    def _abrir(self):
+        con = sqlite3.connect(f'{self.ruta.resolve().as_uri()}?mode=ro', uri=True,
+                              check_same_thread=False)
+        for pragma in PRAGMAS_LECTURA:
+            con.execute(f'PRAGMA {pragma}')
+        return con
+
+    @contextmanager
+    def conexion(self):
+        """Presta una conexión del pool durante el bloque with."""
+        try:
+            con = self._libres.get_nowait()
+        except queue.Empty:
+            if self._cupo.acquire(blocking=False):
+                try:
+                    con = self._abrir()
+                except BaseException:
+                    # La conexión no llegó a existir: su cupo vuelve al pool
+                    self._cupo.release()
+                    raise
+            else:
+                try:
+                    con = self._libres.get(timeout=ESPERA_POOL)
+                except queue.Empty:
+                    raise TimeoutError(
+                        f"Las {self.tamano} conexiones de lectura a {self.ruta.name} siguen ocupadas "
+                        f"después de {ESPERA_POOL} s") from None
+        try:
+            yield con
+        finally:
+            self._libres.put(con)
+
+    def cerrar(self):
+        """Cierra las conexiones libres."""
+        while True:
+            try:
+                self._libres.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+# CONSULTAS
+# ═════════════════════════════════════════════════════════════════════════════
+
+class BaseVentas:
+    """
+    Base SQLite de transacciones con las consultas que usa el dashboard.
+
+    Parámetros:
+    -----------
+    ruta : str or Path
+        Archivo .db creado con crear_base
+    conexiones : int
+        Tamaño del pool de conexiones de lectura
+    """
+
+    def __init__(self, ruta, conexiones=TAMANO_POOL):
+        self.ruta = Path(ruta)
+        self.pool = PoolLectura(self.ruta, conexiones)
+        self._info = None
+        self._rfm = None
+
+    def consultar(self, sql, parametros=()):
+        """Resultado de una consulta como DataFrame."""
+        with self.pool.conexion() as con:
+            return pd.read_sql_query(sql, con, params=parametros)
+
+    def valores(self, sql, parametros=()):
+        """Primera fila de una consulta como tupla."""
+        with self.pool.conexion() as con:
+            return con.execute(sql, parametros).fetchone()
+
+    def info(self):
+        """
+        Resumen de la base para la barra lateral.
+
+        Retorna:
+        --------
+        dict
+            {'filas', 'columnas', 'fecha_inicio', 'fecha_fin', 'paises', 'mb'}
+        """
+        if self._info is None:
+            filas, = self.valores('SELECT SUM(Filas) FROM resumen_dia')
+            inicio, fin = self.valores('SELECT MIN(InvoiceDate), MAX(InvoiceDate) FROM transacciones')
+            paises = self.consultar('SELECT DISTINCT Country FROM resumen_dia ORDER BY Country')
+            self._info = {
+                'filas': int(filas or 0),
+                'columnas': len(COLUMNAS),
+                'fecha_inicio': pd.to_datetime(inicio, unit='s'),
+                'fecha_fin': pd.to_datetime(fin, unit='s'),
+                'paises': paises['Country'].tolist(),
+                'mb': self.ruta.stat().st_size / 1_000_000,
+            }
+        return self._info
+
+    def seleccionar(self, pais, inicio, fin, cantidad_min):
+        """Filtros del dashboard sobre la base (ver SeleccionSQL)."""
+        return SeleccionSQL(self, pais, inicio, fin, cantidad_min)
+
+    def rfm(self):
+        """Features RFM leídas (una vez) de la tabla resumen facturas."""
+        if self._rfm is None:
+            facturas = self.consultar('SELECT CustomerID, InvoiceNo, Country, Fecha, Total FROM facturas')
+            facturas['Country'] = facturas['Country'].astype('category')
+            facturas['Fecha'] = pd.to_datetime(facturas['Fecha'], unit='s')
+            self._rfm = FeaturesRFM(facturas)
+        return self._rfm
+
+
+class SeleccionSQL:
+    """
+    Filtros del dashboard resueltos en SQLite.
+
+    Tiene la misma interfaz que cubo.SeleccionCubo. Las sumas y
+    agrupaciones salen de resumen_dia (exactas, igual que el cubo); los
+    conteos distintos y los rankings se calculan sobre los índices
+    cubrientes de transacciones, así que los conteos son exactos.
+
+    Parámetros:
+    -----------
+    base : BaseVentas
+    pais : str or None
+        País a filtrar (None = todos)
+    inicio, fin : pd.Timestamp
+        Rango de fechas [inicio, fin)
+    cantidad_min : int
+        Cantidad mínima por transacción
+    """
+
+    def __init__(self, base, pais, inicio, fin, cantidad_min):
+        self.base = base
+        condiciones = ['InvoiceDate >= ?', 'InvoiceDate < ?']
+        parametros = [int(_segundos([inicio])[0]), int(_segundos([fin])[0])]
+        condiciones_resumen = ['DayCode >= ?', 'DayCode < ?']
+        parametros_resumen = [limite_dia(inicio), limite_dia(fin)]
+        if pais is not None:
+            condiciones.append('Country = ?')
+            parametros.append(pais)
+            condiciones_resumen.append('Country = ?')
+            parametros_resumen.append(pais)
+        if cantidad_min > 1:
+            condiciones.append('Quantity >= ?')
+            parametros.append(int(cantidad_min))
+            condiciones_resumen.append('Bucket >= ?')
+            parametros_resumen.append(min(int(cantidad_min), CANTIDAD_MAX_BUCKET))
+
+        self._donde = ' AND '.join(condiciones)
+        self._parametros = tuple(parametros)
+        self._donde_resumen = ' AND '.join(condiciones_resumen)
+        self._parametros_resumen = tuple(parametros_resumen)
+        self._filas = None
+
+    def _resumen(self, columna, alias):
+        """SUM(Ingresos) y SUM(Filas) de resumen_dia agrupados por columna."""
+        return self.base.consultar(
+            f'SELECT {columna} AS {alias}, SUM(Ingresos) AS Ingresos, SUM(Filas) AS Filas '
+            f'FROM resumen_dia WHERE {self._donde_resumen} GROUP BY {columna} ORDER BY {columna}',
+            self._parametros_resumen,
+        )
+
+    @property
+    def filas(self):
+        if self._filas is None:
+            filas, = self.base.valores(
+                f'SELECT SUM(Filas) FROM resumen_dia WHERE {self._donde_resumen}',
+                self._parametros_resumen,
+            )
+            self._filas = int(filas or 0)
+        return self._filas
+
+    def metricas(self):
+        """KPIs principales de la selección (conteos distintos exactos)."""
+        ingresos, filas, cantidad = self.base.valores(
+            f'SELECT SUM(Ingresos), SUM(Filas), SUM(Cantidad) FROM resumen_dia '
+            f'WHERE {self._donde_resumen}',
+            self._parametros_resumen,
+        )
+        pedidos, clientes, productos = self.base.valores(
+            f'SELECT COUNT(DISTINCT InvoiceNo), COUNT(DISTINCT CustomerID), '
+            f'COUNT(DISTINCT Description) FROM transacciones WHERE {self._donde}',
+            self._parametros,
+        )
+        ingresos, filas = ingresos or 0.0, filas or 0
+        return {
+            'ingresos_totales': ingresos,
+            'pedidos_totales': pedidos,
+            'clientes_unicos': clientes,
+            'cantidad_productos': productos,
+            'ticket_promedio': ingresos / pedidos if pedidos else 0.0,
+            'ingresos_promedio_cliente': ingresos / clientes if clientes else 0.0,
+            'cantidad_promedio': cantidad / filas if filas else 0.0,
+        }
+
+    def por_mes(self):
+        """Ingresos y número de transacciones por código de mes."""
+        return self._resumen('MonthCode', 'Mes')
+
+    def por_dia(self):
+        """Ingresos y número de transacciones por código de día."""
+        return self._resumen('DayCode', 'Dia')
+
+    def por_pais(self):
+        """Ingresos por país."""
+        return self._resumen('Country', 'Country').set_index('Country')['Ingresos']
+
+    def por_dia_semana(self):
+        """Ingresos por día de la semana (0 = lunes ... 6 = domingo)."""
+        return (self._resumen('DayOfWeek', 'DiaSemana').set_index('DiaSemana')['Ingresos']
+                .reindex(range(7), fill_value=0))
+
+    def top(self, entidad, medida, k):
+        """
+        Top-k de una entidad, con las mismas columnas que topk.TopK.consultar.
+
+        Parámetros:
+        -----------
+        entidad : str
+            'Description' o 'CustomerID'
+        medida : str
+            Una de topk.MEDIDAS: 'Cantidad', 'Ingresos' o 'Filas'
+        k : int
+            Número de filas
+        """
+        if entidad not in ('Description', 'CustomerID') or medida not in MEDIDAS:
+            raise ValueError(f"Ranking no soportado: {entidad} por {medida}")
+        return self.base.consultar(
+            f'SELECT {entidad}, SUM(Quantity) AS Cantidad, SUM(TotalPrice) AS Ingresos, '
+            f'COUNT(*) AS Filas FROM transacciones WHERE {self._donde} '
+            f'GROUP BY {entidad} ORDER BY {medida} DESC LIMIT ?',
+            self._parametros + (int(k),),
+        )
+
+    def transacciones(self, limite=None):
+        """
+        Transacciones de la selección ordenadas por fecha, con el esquema
+        compacto de almacen.ESQUEMA (para exportar o previsualizar).
+
+        Las de la misma fecha salen en el orden de carga (rowid), que es el
+        del DataFrame: la descarga es la misma que con el backend en memoria.
+        """
+        sql = (f'SELECT {", ".join(COLUMNAS)} FROM transacciones WHERE {self._donde} '
+               'ORDER BY InvoiceDate, rowid')
+        parametros = self._parametros
+        if limite is not None:
+            sql += ' LIMIT ?'
+            parametros += (int(limite),)
+        df = self.base.consultar(sql, parametros)
+        df['InvoiceDate'] = pd.to_datetime(df['InvoiceDate'], unit='s')
+        return aplicar_esquema(df)
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+# PUNTO DE ENTRADA
+# ═════════════════════════════════════════════════════════════════════════════
+
+def ruta_base(filepath, sha256, directorio=DIRECTORIO_CACHE):
+    """
+    Archivo .db para un CSV con ese contenido.
+
+    El SHA-256 y la versión del esquema van en el nombre: una base nueva
+    nunca reemplaza a otra que pueda seguir abierta por otro proceso.
+    """
+    ruta_arrow, _ = rutas_cache(filepath, directorio)
+    return ruta_arrow.with_name(f'{ruta_arrow.stem}.v{VERSION_ESQUEMA}.{sha256[:16]}.db')
+
+
+def cargar_base(filepath, directorio=DIRECTORIO_CACHE, conexiones=TAMANO_POOL):
+    """
+    Base SQLite del CSV, creándola si no existe para su contenido actual.
+
+    Las transacciones se leen con cargar_dataset (caché Arrow) solo para
+    validar el caché y, si hace falta, cargar la base; no se conservan en
+    memoria. Al crear una base nueva se borran las de versiones anteriores.
+
+    Parámetros:
+    -----------
+    filepath : str
+        Ruta al CSV de origen
+    directorio : str
+        Carpeta del caché
+    conexiones : int
+        Tamaño del pool de conexiones de lectura
+
+    Retorna:
+    --------
+    BaseVentas
+
+    Lanza FileNotFoundError si el CSV no existe.
+    """
+    df = cargar_dataset(filepath, directorio)
+    _, ruta_manifiesto = rutas_cache(filepath, directorio)
+    ruta = ruta_base(filepath, leer_manifiesto(ruta_manifiesto)['sha256'], directorio)
+
+    if not ruta.exists():
+        crear_base(df, ruta)
+        for anterior in ruta.parent.glob(f'{Path(filepath).stem}.v*.db*'):
+            if not anterior.name.startswith(ruta.name) and anterior.suffix != '.tmp':
+                anterior.unlink(missing_ok=True)
+    del df
+    return BaseVentas(ruta, conexiones)
@@ -0,0 +1,603 @@
+"""
+═════════════════════════════════════════════════════════════════════════════
+    BENCHMARK - TIEMPO Y MEMORIA DEL CAMINO DE DATOS DEL DASHBOARD
+
+    Mide cada etapa por la que pasan los datos en dashboard.py:
+    • Datos sintéticos con el esquema Online Retail (InvoiceNo, StockCode,
+      Description, Quantity, InvoiceDate, UnitPrice, CustomerID, Country)
+      de 100k, 1M o 10M filas, generados por lotes y guardados para
+      reutilizarlos entre ejecuciones
+    • Etapas de load_data (CSV → Arrow, Arrow con memory-map, RFM, cubo,
+      índice y Top-K), filtros de la sección 5, calcular_metricas y las
+      agregaciones de los gráficos, con varios escenarios de filtros
+    • Una ejecución completa del motor de análisis (analitica/) por
+      escenario: filtros, KPIs y los datos de todos los gráficos
+    • Pico de memoria (RSS) de cada etapa, no solo del proceso completo
+    • Cada tamaño se mide en un proceso nuevo, así la memoria de un
+      tamaño no contamina la del siguiente
+    • Resultados en JSON Lines (una línea por etapa y tamaño) con el
+      commit y las versiones de las librerías; --comparar marca las
+      etapas más lentas que en la ejecución anterior
+
+    Uso:
+        python benchmark.py                          # 100k y 1M filas
+        python benchmark.py --filas 10000000         # 10M filas
+        python benchmark.py --sqlite --comparar      # + backend SQLite
+═════════════════════════════════════════════════════════════════════════════
+"""
+
+import argparse
+import gc
+import json
+import multiprocessing
+import os
+import platform
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from almacen import DIRECTORIO_CACHE, cargar_dataset
+from analitica import (
+    GRANULARIDADES,
+    FuenteDatos,
+    Filtros,
+    aplicar_filtros,
+    calcular_kpis,
+    conteos_exactos,
+    evolucion,
+    ingresos_por_pais,
+    proyeccion,
+    ranking_clientes,
+    ranking_productos,
+    ventas_por_dia_semana,
+)
+from cubo import CuboVentas
+from indice import IndiceVentas
+from proyeccion import proyectar
+from rfm import cargar_rfm
+from topk import K_DEFECTO, TopK
+
+# Tamaños del benchmark (--filas) y los que se miden por defecto
+TAMANOS = [100_000, 1_000_000, 10_000_000]
+TAMANOS_DEFECTO = [100_000, 1_000_000]
+
+SEMILLA = 42
+
+# Subcarpeta del caché con los CSV sintéticos y los cachés de cada tamaño
+DIRECTORIO_BENCHMARK = 'benchmark'
+
+ARCHIVO_RESULTADOS = 'benchmark_resultados.jsonl'
+
+# Repeticiones de las etapas rápidas (se reporta la mínima y la mediana)
+REPETICIONES = 5
+
+# Una etapa es una regresión si tarda más de (1 + TOLERANCIA) veces lo
+# que tardó en la ejecución anterior y la diferencia supera MIN_SEGUNDOS
+TOLERANCIA = 0.25
+MIN_SEGUNDOS = 0.005
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+# 1. DATOS SINTÉTICOS (ESQUEMA ONLINE RETAIL)
+# ═════════════════════════════════════════════════════════════════════════════
+
+# Filas del CSV que se generan a la vez
+LOTE_GENERADOR = 1_000_000
+
+# Proporciones parecidas a las del dataset original (541.909 filas, ~20
+# líneas por factura, ~25% sin cliente, ~2% de cancelaciones, 90% Reino Unido)
+LINEAS_POR_FACTURA = 20
+FILAS_POR_CLIENTE = 125
+PROPORCION_SIN_CLIENTE = 0.25
+PROPORCION_CANCELADAS = 0.02
+PROPORCION_SIN_DESCRIPCION = 0.003
+N_PRODUCTOS = 4_000
+PRIMERA_FACTURA = 536365
+PRIMER_CLIENTE = 12346
+PERIODO = ('2010-12-01', '2011-12-09')
+
+PAISES = {
+    'United Kingdom': 0.890, 'Germany': 0.018, 'France': 0.016, 'EIRE': 0.015,
+    'Spain': 0.005, 'Netherlands': 0.005, 'Belgium': 0.004, 'Switzerland': 0.004,
+    'Portugal': 0.003, 'Australia': 0.003, 'Norway': 0.002, 'Italy': 0.002,
+    'Channel Islands': 0.002, 'Finland': 0.002, 'Cyprus': 0.001, 'Sweden': 0.001,
+    'Austria': 0.001, 'Denmark': 0.001, 'Japan': 0.001, 'Poland': 0.001,
+    'USA': 0.001, 'Israel': 0.001, 'Singapore': 0.001,
+}
+
+_ADJETIVOS = ['VINTAGE', 'REGENCY', 'RETROSPOT', 'HANGING', 'SET OF 3', 'JUMBO',
+              'PAPER', 'GLASS', 'WOODEN', 'SMALL']
+_COLORES = ['RED', 'WHITE', 'PINK', 'BLUE', 'GREEN', 'IVORY', 'BLACK', 'GOLD',
+            'SILVER', 'PASTEL', 'POLKADOT', 'FLORAL']
+_OBJETOS = ['HEART T-LIGHT HOLDER', 'LANTERN', 'BAG', 'CAKE CASES', 'TEACUP',
+            'MUG', 'ALARM CLOCK', 'BUNTING', 'DOORMAT', 'NAPKINS', 'PHOTO FRAME',
+            'CANDLE', 'LUNCH BOX', 'CUSHION COVER', 'GARLAND', 'PLATE', 'BOWL',
+            'WATER BOTTLE', 'JAR', 'SIGN', 'BOX', 'COASTER', 'TIN', 'NOTEBOOK',
+            'PEN', 'WRAP', 'TAPE', 'STICKERS', 'DECORATION', 'BASKET', 'TRAY',
+            'CLOCK', 'MIRROR', 'KEY RING', 'PURSE', 'UMBRELLA', 'APRON',
+            'OVEN GLOVE', 'TEA TOWEL', 'DOOR STOP']
+
+
+def catalogo(n_productos=N_PRODUCTOS, semilla=SEMILLA):
+    """
+    Productos sintéticos: código, descripción, precio y popularidad.
+
+    La popularidad sigue una ley de potencias (pocos productos concentran
+    la mayoría de las líneas, como en el dataset original).
+    """
+    rng = np.random.default_rng(semilla)
+    i = np.arange(n_productos)
+    codigos = (20000 + i).astype(str).astype(object)
+    con_letra = rng.random(n_productos) < 0.1
+    codigos[con_letra] = codigos[con_letra] + 'A'
+    # Combinación de adjetivo, color y objeto distinta para cada producto
+    descripciones = np.array([
+        f'{_ADJETIVOS[j % len(_ADJETIVOS)]} {_COLORES[j // len(_ADJETIVOS) % len(_COLORES)]} '
+        f'{_OBJETOS[j // (len(_ADJETIVOS) * len(_COLORES)) % len(_OBJETOS)]}'
+        for j in rng.permutation(n_productos)
+    ], dtype=object)
+    precios = np.maximum(np.round(rng.lognormal(1.0, 0.8, n_productos), 2), 0.1)
+    popularidad = 1.0 / (rng.permutation(n_productos) + 10.0) ** 1.1
+    return codigos, descripciones, precios, popularidad / popularidad.sum()
+
+
+def _fechas_texto(fechas):
+    """Fechas con el formato del CSV original (m/d/aaaa h:mm, sin ceros a la izquierda)."""
+    return np.array([f'{m}/{d}/{a} {h}:{mi:02d}' for m, d, a, h, mi in
+                     zip(fechas.month, fechas.day, fechas.year, fechas.hour, fechas.minute)],
+                    dtype=object)
+
+
+def generar_transacciones(filas, semilla=SEMILLA, lote=LOTE_GENERADOR):
+    """
+    Transacciones sintéticas con el esquema Online Retail, por lotes.
+
+    Cada factura tiene un cliente (o ninguno), un país y una fecha; las
+    facturas no se reparten entre lotes y sus números crecen con la fecha.
+
+    Parámetros:
+    -----------
+    filas : int
+        Filas totales
+    semilla : int
+        Con la misma semilla se generan exactamente los mismos datos
+    lote : int
+        Filas de cada DataFrame generado
+
+    Retorna:
+    --------
+    generator of pd.DataFrame
+        Lotes con las columnas del CSV original
+    """
+    rng = np.random.default_rng(semilla)
+    codigos, descripciones, precios, popularidad = catalogo(semilla=semilla)
+    nombres_paises = np.array(list(PAISES), dtype=object)
+    pesos_paises = np.array(list(PAISES.values()))
+    pesos_paises /= pesos_paises.sum()
+
+    n_clientes = max(100, filas // FILAS_POR_CLIENTE)
+    pais_cliente = rng.choice(len(PAISES), n_clientes, p=pesos_paises)
+    n_facturas = max(1, filas // LINEAS_POR_FACTURA)
+    inicio, fin = pd.Timestamp(PERIODO[0]), pd.Timestamp(PERIODO[1])
+    n_dias = (fin - inicio).days + 1
+
+    primera = 0
+    for desde in range(0, filas, lote):
+        n = min(lote, filas - desde)
+        ultima = n_facturas if desde + n >= filas else primera + max(1, n // LINEAS_POR_FACTURA)
+        facturas = np.arange(primera, ultima)
+
+        # Atributos de cada factura
+        cliente = rng.integers(0, n_clientes, len(facturas))
+        sin_cliente = rng.random(len(facturas)) < PROPORCION_SIN_CLIENTE
+        pais = np.where(sin_cliente, rng.choice(len(PAISES), len(facturas), p=pesos_paises),
+                        pais_cliente[cliente])
+        cancelada = rng.random(len(facturas)) < PROPORCION_CANCELADAS
+        numero = (PRIMERA_FACTURA + facturas).astype(str).astype(object)
+        numero[cancelada] = 'C' + numero[cancelada]
+        dia = facturas * n_dias // n_facturas
+        minuto = dia * 1440 + rng.integers(8 * 60, 20 * 60, len(facturas))
+        fecha = _fechas_texto(inicio + pd.to_timedelta(minuto, unit='m'))
+
+        # Líneas: cada fila pertenece a una factura del lote
+        factura = np.sort(rng.integers(0, len(facturas), n))
+        producto = rng.choice(len(codigos), n, p=popularidad)
+        cantidad = rng.geometric(0.2, n)
+        cantidad[rng.random(n) < 0.05] *= 12
+        cantidad[cancelada[factura]] *= -1
+        precio = precios[producto].copy()
+        descripcion = descripciones[producto]
+        sin_descripcion = rng.random(n) < PROPORCION_SIN_DESCRIPCION
+        precio[sin_descripcion] = 0.0
+        descripcion[sin_descripcion] = np.nan
+
+        yield pd.DataFrame({
+            'InvoiceNo': numero[factura],
+            'StockCode': codigos[producto],
+            'Description': descripcion,
+            'Quantity': cantidad,
+            'InvoiceDate': fecha[factura],
+            'UnitPrice': precio,
+            'CustomerID': np.where(sin_cliente, np.nan, PRIMER_CLIENTE + cliente)[factura],
+            'Country': nombres_paises[pais][factura],
+        })
+        primera = ultima
+
+
+def generar_csv(ruta, filas, semilla=SEMILLA):
+    """
+    Escribe el CSV sintético por lotes (la memoria no crece con `filas`).
+
+    Se escribe en un archivo temporal que se renombra al terminar: un CSV
+    a medio escribir nunca queda con el nombre definitivo.
+    """
+    ruta = Path(ruta)
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    temporal = ruta.with_suffix('.tmp')
+    with open(temporal, 'w', encoding='utf-8', newline='') as f:
+        for i, lote in enumerate(generar_transacciones(filas, semilla)):
+            lote.to_csv(f, index=False, header=i == 0)
+    os.replace(temporal, ruta)
+    return ruta
+
+
+def csv_sintetico(filas, semilla=SEMILLA, directorio=Path(DIRECTORIO_CACHE) / DIRECTORIO_BENCHMARK):
+    """Ruta del CSV sintético de `filas` filas, generándolo si no existe."""
+    ruta = Path(directorio) / f'online_retail_{filas}_s{semilla}.csv'
+    if not ruta.exists():
+        generar_csv(ruta, filas, semilla)
+    return ruta
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+# 2. MEDICIÓN DE TIEMPO Y MEMORIA
+# ═════════════════════════════════════════════════════════════════════════════
+
+def _estado_proceso(campo):
+    """Valor en MB de un campo de /proc/self/status (VmRSS, VmHWM), o None."""
+    try:
+        with open('/proc/self/status', encoding='ascii') as f:
+            coincidencia = re.search(rf'^{campo}:\s+(\d+) kB', f.read(), re.MULTILINE)
+    except OSError:
+        return None
+    return None if coincidencia is None else int(coincidencia.group(1)) / 1024
+
+
+def reiniciar_pico():
+    """
+    Reinicia el pico de RSS del proceso (Linux: escribir 5 en clear_refs).
+
+    Devuelve False si el sistema no lo permite: entonces el pico de cada
+    etapa es el del proceso desde su inicio.
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w', encoding='ascii') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def rss_pico():
+    """Pico de RSS del proceso en MB (desde el inicio o el último reinicio)."""
+    pico = _estado_proceso('VmHWM')
+    if pico is not None:
+        return pico
+    try:
+        import resource
+    except ImportError:   # Windows
+        return None
+    maximo = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maximo / (1 << 20) if sys.platform == 'darwin' else maximo / 1024
+
+
+class Medicion:
+    """
+    Tiempos y picos de memoria de las etapas medidas en un proceso.
+
+    Parámetros:
+    -----------
+    repeticiones : int
+        Veces que se ejecutan las etapas rápidas
+    """
+
+    def __init__(self, repeticiones=REPETICIONES):
+        self.repeticiones = repeticiones
+        self.registros = []
+
+    def etapa(self, nombre, funcion, repetir=True):
+        """
+        Ejecuta y mide una etapa.
+
+        El tiempo es el mínimo de las repeticiones (el menos afectado por
+        otros procesos) y se guarda también la mediana. La memoria es el
+        pico de RSS durante la etapa y cuánto supera al RSS del inicio.
+
+        Parámetros:
+        -----------
+        nombre : str
+        funcion : callable
+            Sin argumentos; su resultado se devuelve
+        repetir : bool
+            False para las etapas que solo tienen sentido una vez (por
+            ejemplo, la primera carga del CSV)
+        """
+        gc.collect()
+        inicial = _estado_proceso('VmRSS')
+        reiniciado = reiniciar_pico()
+        tiempos = []
+        for _ in range(self.repeticiones if repetir else 1):
+            inicio = time.perf_counter()
+            resultado = funcion()
+            tiempos.append(time.perf_counter() - inicio)
+        pico = rss_pico()
+        self.registros.append({
+            'etapa': nombre,
+            'segundos': min(tiempos),
+            'segundos_mediana': statistics.median(tiempos),
+            'repeticiones': len(tiempos),
+            'rss_pico_mb': None if pico is None else round(pico, 1),
+            'memoria_etapa_mb': (round(pico - inicial, 1)
+                                 if reiniciado and pico is not None and inicial is not None else None),
+        })
+        return resultado
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+# 3. ETAPAS DEL DASHBOARD
+# ═════════════════════════════════════════════════════════════════════════════
+
+def escenarios(df):
+    """
+    Filtros de la sección 5 que se miden: (país, inicio, fin, cantidad mínima).
+
+    Todo el período sin filtros, el país principal en el último trimestre y
+    un país pequeño con cantidad mínima.
+    """
+    paises = df['Country'].value_counts().index
+    inicio = df['InvoiceDate'].iloc[0].normalize()
+    fin = df['InvoiceDate'].iloc[-1].normalize() + pd.Timedelta(days=1)
+    return [
+        (None, inicio, fin, 1),
+        (paises[0], fin - pd.Timedelta(days=90), fin, 1),
+        (paises[min(1, len(paises) - 1)], inicio, fin, 10),
+    ]
+
+
+def ejecutar_motor(fuente, filtros, k=K_DEFECTO):
+    """
+    Lo que calcula una ejecución del dashboard para unos filtros, sin Streamlit.
+
+    Retorna:
+    --------
+    dict
+        Resultado de cada paso (KPIs, evolución, rankings, países, día de
+        la semana y proyección)
+    """
+    consulta = aplicar_filtros(fuente, filtros)
+    return {
+        'kpis': calcular_kpis(consulta),
+        'evolucion': [evolucion(consulta, g) for g in GRANULARIDADES],
+        'productos': ranking_productos(consulta, k),
+        'clientes': ranking_clientes(consulta, k),
+        'paises': ingresos_por_pais(consulta),
+        'dia_semana': ventas_por_dia_semana(consulta),
+        'proyeccion': proyeccion(consulta),
+    }
+
+
+def medir_tamano(filas, semilla=SEMILLA, repeticiones=REPETICIONES, sqlite=False, procesos=None):
+    """
+    Mide todas las etapas con el CSV sintético de `filas` filas.
+
+    El caché Arrow se borra antes de empezar: la primera carga parsea el
+    CSV y la segunda abre el Arrow con memory-map, como en el primer
+    arranque y en los siguientes del dashboard. Los procesos que parsean
+    el CSV en paralelo no cuentan en la memoria de este proceso.
+
+    Retorna:
+    --------
+    list of dict
+        Un registro por etapa (ver Medicion.etapa)
+    """
+    ruta = csv_sintetico(filas, semilla)
+    directorio = Path(DIRECTORIO_CACHE) / DIRECTORIO_BENCHMARK / f'cache_{filas}'
+    shutil.rmtree(directorio, ignore_errors=True)
+    medicion = Medicion(repeticiones)
+    etapa = medicion.etapa
+
+    # load_data: caché Arrow, features RFM y construir_estado
+    etapa('cargar_csv', lambda: cargar_dataset(ruta, directorio, procesos=procesos), repetir=False)
+    df = etapa('cargar_arrow', lambda: cargar_dataset(ruta, directorio))
+    rfm = etapa('rfm', lambda: cargar_rfm(ruta, directorio, df=df), repetir=False)
+    cubo = etapa('cubo', lambda: CuboVentas.desde_transacciones(df), repetir=False)
+    indice = etapa('indice', lambda: IndiceVentas(df), repetir=False)
+    top_productos, top_clientes = etapa('topk', lambda: (TopK.desde_transacciones(df, 'Description'),
+                                                         TopK.desde_transacciones(df, 'CustomerID')),
+                                        repetir=False)
+
+    # Sección 5: filtros sobre el índice (transacciones) y el cubo (agregados)
+    filtros = escenarios(df)
+    filtrados = etapa('filtro_indice', lambda: [indice.filtrar(df, *f) for f in filtros])
+    selecciones = etapa('filtro_cubo', lambda: [cubo.seleccionar(*f) for f in filtros])
+
+    # calcular_metricas (HyperLogLog y exacta)
+    etapa('metricas', lambda: [s.metricas() for s in selecciones])
+    etapa('metricas_exactas', lambda: [conteos_exactos(d) for d in filtrados])
+
+    # Agregaciones de los gráficos
+    etapa('por_mes', lambda: [s.por_mes() for s in selecciones])
+    etapa('por_dia', lambda: [s.por_dia() for s in selecciones])
+    etapa('por_pais', lambda: [s.por_pais() for s in selecciones])
+    etapa('por_dia_semana', lambda: [s.por_dia_semana() for s in selecciones])
+    # Los días sueltos del top-K salen de las transacciones sin filtro de cantidad
+    sin_cantidad = [d if f[3] <= 1 else indice.filtrar(df, *f[:3]) for f, d in zip(filtros, filtrados)]
+    etapa('top_k', lambda: [(top_productos.consultar(*f[:3], 'Cantidad', K_DEFECTO, d),
+                             top_clientes.consultar(*f[:3], 'Ingresos', K_DEFECTO, d))
+                            for f, d in zip(filtros, sin_cantidad)])
+    etapa('proyeccion', lambda: [proyectar(s.por_dia()) for s in selecciones])
+
+    # Una ejecución completa del motor de análisis por escenario
+    fuente = FuenteDatos(('benchmark', filas), estado={
+        'df': df, 'cubo': cubo, 'indice': indice, 'top_productos': top_productos,
+        'top_clientes': top_clientes, 'rfm': rfm,
+    })
+    etapa('motor', lambda: [ejecutar_motor(fuente, Filtros(inicio, fin, pais, cantidad_min))
+                            for pais, inicio, fin, cantidad_min in filtros])
+
+    if sqlite:
+        from basedatos import cargar_base
+        base = etapa('sqlite_crear', lambda: cargar_base(ruta, directorio), repetir=False)
+        selecciones_sql = etapa('sqlite_filtro', lambda: [base.seleccionar(*f) for f in filtros])
+        etapa('sqlite_metricas', lambda: [s.metricas() for s in selecciones_sql])
+        etapa('sqlite_graficos', lambda: [(s.por_mes(), s.por_dia(), s.por_pais(), s.por_dia_semana(),
+                                           s.top('Description', 'Cantidad', K_DEFECTO))
+                                          for s in selecciones_sql])
+        fuente_sql = FuenteDatos(('benchmark', filas), base=base)
+        etapa('sqlite_motor', lambda: [ejecutar_motor(fuente_sql, Filtros(inicio, fin, pais, cantidad_min))
+                                       for pais, inicio, fin, cantidad_min in filtros])
+
+    return [{'filas': filas, 'filas_limpias': len(df), **registro} for registro in medicion.registros]
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+# 4. RESULTADOS Y REGRESIONES
+# ═════════════════════════════════════════════════════════════════════════════
+
+def entorno():
+    """Commit, plataforma y versiones con los que se midió."""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                text=True, check=True, cwd=Path(__file__).parent).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    import pyarrow
+    return {
+        'ejecucion': datetime.now().isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'pyarrow': pyarrow.__version__,
+        'sistema': platform.platform(),
+        'nucleos': os.cpu_count(),
+    }
+
+
+def ejecutar(tamanos=TAMANOS_DEFECTO, semilla=SEMILLA, repeticiones=REPETICIONES, sqlite=False,
+             procesos=None, salida=ARCHIVO_RESULTADOS):
+    """
+    Mide cada tamaño en un proceso nuevo y agrega los resultados a `salida`.
+
+    Retorna:
+    --------
+    pd.DataFrame
+        Los registros de esta ejecución
+    """
+    comun = entorno()
+    registros = []
+    contexto = multiprocessing.get_context('spawn')
+    for filas in tamanos:
+        csv_sintetico(filas, semilla)   # se genera fuera de la medición
+        with ProcessPoolExecutor(max_workers=1, mp_context=contexto) as pool:
+            medidos = pool.submit(medir_tamano, filas, semilla, repeticiones, sqlite, procesos).result()
+        registros += [{**comun, **registro} for registro in medidos]
+
+    if salida is not None:
+        with open(salida, 'a', encoding='utf-8') as f:
+            for registro in registros:
+                f.write(json.dumps(registro, ensure_ascii=False) + '\n')
+    return pd.DataFrame(registros)
+
+
+def leer_resultados(ruta=ARCHIVO_RESULTADOS):
+    """Todas las mediciones guardadas (una fila por etapa, tamaño y ejecución)."""
+    return pd.read_json(ruta, lines=True, dtype={'commit': str})
+
+
+def comparar(resultados, tolerancia=TOLERANCIA, min_segundos=MIN_SEGUNDOS):
+    """
+    Compara la última ejecución de cada tamaño con la anterior.
+
+    Parámetros:
+    -----------
+    resultados : pd.DataFrame
+        Mediciones (leer_resultados)
+    tolerancia : float
+        Aumento relativo del tiempo que se acepta
+    min_segundos : float
+        Diferencias menores no cuentan (ruido de las etapas muy rápidas)
+
+    Retorna:
+    --------
+    pd.DataFrame
+        filas, etapa, segundos de la ejecución anterior y la actual,
+        relación actual / anterior, memoria de ambas y Regresion (bool)
+    """
+    partes = []
+    for filas, grupo in resultados.groupby('filas'):
+        ejecuciones = sorted(grupo['ejecucion'].unique())
+        if len(ejecuciones) < 2:
+            continue
+        anterior, actual = (grupo[grupo['ejecucion'] == e].set_index('etapa') for e in ejecuciones[-2:])
+        tabla = pd.DataFrame({
+            'filas': filas,
+            'segundos_anterior': anterior['segundos'],
+            'segundos': actual['segundos'],
+            'memoria_anterior_mb': anterior['rss_pico_mb'],
+            'memoria_mb': actual['rss_pico_mb'],
+        }).reindex(actual.index).dropna(subset=['segundos', 'segundos_anterior'])
+        tabla['relacion'] = tabla['segundos'] / tabla['segundos_anterior']
+        tabla['Regresion'] = ((tabla['relacion'] > 1 + tolerancia)
+                              & (tabla['segundos'] - tabla['segundos_anterior'] > min_segundos))
+        partes.append(tabla.rename_axis('etapa').reset_index())
+    if not partes:
+        return pd.DataFrame(columns=['filas', 'etapa', 'segundos_anterior', 'segundos', 'relacion',
+                                     'Regresion'])
+    return pd.concat(partes, ignore_index=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark del camino de datos del dashboard')
+    parser.add_argument('--filas', type=int, nargs='+', default=TAMANOS_DEFECTO,
+                        help=f'tamaños a medir (por ejemplo {" ".join(map(str, TAMANOS))})')
+    parser.add_argument('--semilla', type=int, default=SEMILLA)
+    parser.add_argument('--repeticiones', type=int, default=REPETICIONES)
+    parser.add_argument('--procesos', type=int, default=None, help='procesos para parsear el CSV')
+    parser.add_argument('--sqlite', action='store_true', help='medir también el backend SQLite')
+    parser.add_argument('--salida', default=ARCHIVO_RESULTADOS, help='archivo JSON Lines de resultados')
+    parser.add_argument('--comparar', action='store_true',
+                        help='comparar con la ejecución anterior (sale con código 1 si hay regresiones)')
+    args = parser.parse_args()
+
+    resultados = ejecutar(args.filas, args.semilla, args.repeticiones, args.sqlite, args.procesos,
+                          args.salida)
+    with pd.option_context('display.width', 120, 'display.max_rows', None):
+        print(resultados.pivot(index='etapa', columns='filas', values='segundos')
+              .reindex(resultados['etapa'].unique()).round(4).to_string())
+        print(f"\nPico de RSS por tamaño (MB): {resultados.groupby('filas')['rss_pico_mb'].max().to_dict()}")
+        print(f"Resultados en {args.salida}")
+
+        if args.comparar:
+            cambios = comparar(leer_resultados(args.salida))
+            if cambios.empty:
+                print("\nNo hay una ejecución anterior con la que comparar")
+                return 0
+            regresiones = cambios[cambios['Regresion']]
+            print(f"\n{len(regresiones)} regresiones (> {TOLERANCIA:.0%} más lentas):")
+            print((regresiones if len(regresiones) else cambios).round(4).to_string(index=False))
+            return 1 if len(regresiones) else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,89 @@
+"""
+═════════════════════════════════════════════════════════════════════════════
+    CACHÉ LRU CON TTL - RESULTADOS COMPARTIDOS ENTRE SESIONES
+
+    Guarda resultados (KPIs, agregados...) bajo una clave barata de calcular,
+    como la tupla de filtros del dashboard, en lugar de hashear DataFrames.
+    • Límite de entradas: se expulsa la usada hace más tiempo (LRU)
+    • TTL: las entradas caducan pasado un tiempo
+    • Contadores de aciertos, fallos y expulsiones
+    Es segura entre hilos: Streamlit atiende cada sesión en su propio hilo.
+═════════════════════════════════════════════════════════════════════════════
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class CacheLRU:
+    """
+    Caché LRU acotada por número de entradas y por tiempo de vida.
+
+    Parámetros:
+    -----------
+    max_entradas : int
+        Número máximo de resultados guardados
+    ttl : float or None
+        Segundos que vive una entrada (None = sin caducidad)
+    """
+
+    def __init__(self, max_entradas=256, ttl=3600):
+        self.max_entradas = max_entradas
+        self.ttl = ttl
+        self._datos = OrderedDict()
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+        self.expulsiones = 0
+
+    def obtener(self, clave, calcular):
+        """
+        Devuelve el resultado guardado para la clave o lo calcula.
+
+        Parámetros:
+        -----------
+        clave : hashable
+            Clave del resultado (por ejemplo, la tupla de filtros)
+        calcular : callable
+            Función sin argumentos que produce el resultado si no está en caché
+        """
+        ahora = time.monotonic()
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is not None and (self.ttl is None or ahora - entrada[0] < self.ttl):
+                self._datos.move_to_end(clave)
+                self.aciertos += 1
+                return entrada[1]
+            self.fallos += 1
+
+        # Se calcula fuera del lock para no bloquear a las demás sesiones
+        valor = calcular()
+        self.guardar(clave, valor)
+        return valor
+
+    def guardar(self, clave, valor):
+        """Guarda un resultado ya calculado (por ejemplo, al precalentar)."""
+        with self._lock:
+            self._datos[clave] = (time.monotonic(), valor)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.max_entradas:
+                self._datos.popitem(last=False)
+                self.expulsiones += 1
+
+    def limpiar(self):
+        """Vacía la caché (los contadores se conservan)."""
+        with self._lock:
+            self._datos.clear()
+
+    def estadisticas(self):
+        """Contadores de uso de la caché."""
+        with self._lock:
+            total = self.aciertos + self.fallos
+            return {
+                'entradas': len(self._datos),
+                'aciertos': self.aciertos,
+                'fallos': self.fallos,
+                'expulsiones': self.expulsiones,
+                'tasa_aciertos': self.aciertos / total if total else 0.0,
+            }
@@ -0,0 +1,299 @@
+"""
+═════════════════════════════════════════════════════════════════════════════
+    CUBO OLAP - AGREGADOS PRECALCULADOS POR DÍA × PAÍS × CANTIDAD
+
+    Se construye una sola vez al cargar los datos. Cada celda del cubo guarda:
+    • Ingresos (suma de TotalPrice)
+    • Filas (número de transacciones)
+    • Cantidad (suma de Quantity)
+    • Sketches HyperLogLog de facturas, clientes y productos (conteos
+      distintos aproximados, con un error máximo configurable)
+
+    Los filtros de la barra lateral (país, rango de fechas, cantidad mínima)
+    se resuelven seleccionando celdas, sin volver a recorrer las transacciones.
+
+    Sin filtro de país ni de cantidad, los conteos distintos salen de
+    registros HLL densos por día (3 × días × 2^p bytes, ≈ 3.7 MB con 305
+    días y p = 12) que se calculan la primera vez que se usan.
+═════════════════════════════════════════════════════════════════════════════
+"""
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from almacen import DIRECTORIO_CACHE, cargar_dataset, cargar_derivado, escribir_arrow, leer_arrow
+from fechas import dia_semana, limite_dia, mes_de_dia
+from hll import SketchesParticionados, error_estandar, estimar, precision_para_error
+
+# Cantidades >= a este valor comparten bucket. Coincide con el máximo del
+# slider "cantidad mínima", así el filtro por bucket es exacto.
+CANTIDAD_MAX_BUCKET = 100
+
+# Error relativo estándar máximo de los conteos distintos (2% → precisión 12)
+ERROR_CONTEOS = 0.02
+
+
+class CuboVentas:
+    """
+    Cubo de ventas agregadas por día, país y bucket de cantidad.
+
+    Se construye con CuboVentas.desde_transacciones(df). Dos cubos se
+    combinan con fusionar(), lo que permite incorporar datos nuevos sin
+    volver a recorrer las transacciones ya agregadas.
+
+    Parámetros:
+    -----------
+    tabla : pd.DataFrame
+        Una fila por celda (Dia, Country, Bucket) con sus medidas. Dia es
+        el código de día entero (ver fechas.py)
+    facturas, clientes, productos : SketchesParticionados
+        Sketches HyperLogLog por celda
+    """
+
+    CLAVES = ['Dia', 'Country', 'Bucket']
+    MEDIDAS = ['Ingresos', 'Filas', 'Cantidad']
+
+    SKETCHES = ('facturas', 'clientes', 'productos')
+
+    def __init__(self, tabla, facturas, clientes, productos):
+        self.tabla = tabla
+        self.facturas = facturas
+        self.clientes = clientes
+        self.productos = productos
+        self._por_dia = None
+
+    @property
+    def error(self):
+        """Error relativo estándar de los conteos distintos."""
+        return error_estandar(self.facturas.p)
+
+    @classmethod
+    def desde_transacciones(cls, df, error=ERROR_CONTEOS):
+        """
+        Agrega las transacciones en celdas.
+
+        Parámetros:
+        -----------
+        df : pd.DataFrame
+            DataFrame limpio devuelto por load_data
+        error : float
+            Error relativo estándar máximo de los conteos distintos
+        """
+        claves = pd.DataFrame({
+            'Dia': df['DayCode'].to_numpy(),
+            'Country': df['Country'],
+            'Bucket': df['Quantity'].clip(upper=CANTIDAD_MAX_BUCKET).astype('int8'),
+        })
+        grupos = claves.groupby(cls.CLAVES, observed=True, sort=True)
+        celda = grupos.ngroup().to_numpy()
+
+        tabla = pd.DataFrame({
+            'Ingresos': df['TotalPrice'].to_numpy(),
+            'Filas': 1,
+            'Cantidad': df['Quantity'].to_numpy(dtype='int64'),
+        }).groupby(celda).sum()
+        tabla = pd.concat([grupos.size().index.to_frame(index=False), tabla], axis=1)
+
+        n_celdas = len(tabla)
+        p = precision_para_error(error)
+        return cls(
+            _con_atributos_dia(tabla),
+            SketchesParticionados.desde_valores(celda, df['InvoiceNo'], n_celdas, p),
+            SketchesParticionados.desde_valores(celda, df['CustomerID'], n_celdas, p),
+            SketchesParticionados.desde_valores(celda, df['Description'], n_celdas, p),
+        )
+
+    def fusionar(self, otro):
+        """
+        Nuevo cubo con las celdas de ambos cubos combinadas.
+
+        El costo depende del número de celdas y de registros HLL, no del
+        número de transacciones originales.
+        """
+        paises = pd.api.types.union_categoricals(
+            [self.tabla['Country'], otro.tabla['Country']], ignore_order=True
+        )
+        claves = pd.DataFrame({
+            'Dia': np.concatenate([self.tabla['Dia'].to_numpy(), otro.tabla['Dia'].to_numpy()]),
+            'Country': paises,
+            'Bucket': np.concatenate([self.tabla['Bucket'].to_numpy(), otro.tabla['Bucket'].to_numpy()]),
+        })
+        grupos = claves.groupby(self.CLAVES, observed=True, sort=True)
+        celda = grupos.ngroup().to_numpy()
+
+        medidas = pd.concat([self.tabla[self.MEDIDAS], otro.tabla[self.MEDIDAS]], ignore_index=True)
+        tabla = medidas.groupby(celda).sum()
+        tabla = pd.concat([grupos.size().index.to_frame(index=False), tabla], axis=1)
+
+        n_propias = len(self.tabla)
+        mapa_propio, mapa_otro = celda[:n_propias], celda[n_propias:]
+        n_celdas = len(tabla)
+        return CuboVentas(
+            _con_atributos_dia(tabla),
+            self.facturas.fusionar_con(otro.facturas, mapa_propio, mapa_otro, n_celdas),
+            self.clientes.fusionar_con(otro.clientes, mapa_propio, mapa_otro, n_celdas),
+            self.productos.fusionar_con(otro.productos, mapa_propio, mapa_otro, n_celdas),
+        )
+
+    def guardar(self, directorio):
+        """Guarda la tabla de celdas y los sketches como archivos Arrow en `directorio`."""
+        directorio = Path(directorio)
+        directorio.mkdir(parents=True, exist_ok=True)
+        escribir_arrow(self.tabla, directorio / 'celdas.arrow')
+        for nombre in self.SKETCHES:
+            escribir_arrow(getattr(self, nombre).entradas(), directorio / f'{nombre}.arrow')
+
+    @classmethod
+    def cargar(cls, directorio, error=ERROR_CONTEOS):
+        """Abre un cubo guardado con guardar() (memory-map, sin recalcular)."""
+        directorio = Path(directorio)
+        tabla = leer_arrow(directorio / 'celdas.arrow')
+        p = precision_para_error(error)
+        return cls(tabla, *(SketchesParticionados.desde_entradas(leer_arrow(directorio / f'{nombre}.arrow'),
+                                                                 len(tabla), p)
+                            for nombre in cls.SKETCHES))
+
+    @property
+    def por_dia(self):
+        """
+        Registros HLL densos por día: (días, {sketch: matriz días × 2^p}).
+
+        Se calculan una vez; el cubo no cambia (fusionar devuelve otro).
+        """
+        if self._por_dia is None:
+            dias, grupo = np.unique(self.tabla['Dia'].to_numpy(), return_inverse=True)
+            self._por_dia = (dias, {nombre: getattr(self, nombre).agrupados(grupo, len(dias))
+                                    for nombre in self.SKETCHES})
+        return self._por_dia
+
+    def seleccionar(self, pais, inicio, fin, cantidad_min):
+        """
+        Celdas que cumplen los filtros del dashboard.
+
+        Parámetros:
+        -----------
+        pais : str or None
+            País a filtrar (None = todos)
+        inicio, fin : pd.Timestamp
+            Rango de fechas [inicio, fin)
+        cantidad_min : int
+            Cantidad mínima por transacción
+
+        Retorna:
+        --------
+        SeleccionCubo
+        """
+        tabla = self.tabla
+        desde, hasta = limite_dia(inicio), limite_dia(fin)
+        mascara = (
+            (tabla['Dia'] >= desde) &
+            (tabla['Dia'] < hasta) &
+            (tabla['Bucket'] >= min(cantidad_min, CANTIDAD_MAX_BUCKET))
+        )
+        if pais is not None:
+            mascara &= tabla['Country'] == pais
+        # Sin país ni cantidad se eligen días completos: basta con los
+        # registros por día
+        dias = (desde, hasta) if pais is None and cantidad_min <= 1 else None
+        return SeleccionCubo(self, np.flatnonzero(mascara.to_numpy()), dias)
+
+
+def cargar_cubo(filepath, directorio=DIRECTORIO_CACHE, df=None, error=ERROR_CONTEOS):
+    """
+    Cubo del CSV, reutilizando el guardado si sigue vigente.
+
+    Se guarda junto al caché Arrow del CSV, en la carpeta <nombre>.cubo, y
+    se invalida con el mismo SHA-256 que el caché de transacciones o si
+    cambia la precisión de los sketches (almacen.cargar_derivado).
+
+    Parámetros:
+    -----------
+    filepath : str
+        Ruta al CSV de origen
+    directorio : str
+        Carpeta del caché
+    df : pd.DataFrame, opcional
+        Transacciones ya cargadas con cargar_dataset(filepath, directorio)
+    error : float
+        Error relativo estándar máximo de los conteos distintos
+    """
+    if df is None:
+        df = cargar_dataset(filepath, directorio)
+    return cargar_derivado(filepath, 'cubo', lambda: CuboVentas.desde_transacciones(df, error),
+                           CuboVentas.guardar, lambda ruta: CuboVentas.cargar(ruta, error), directorio,
+                           firma_extra={'precision': precision_para_error(error)})
+
+
+def _con_atributos_dia(tabla):
+    """Añade los códigos Mes y DiaSemana a partir del código de día."""
+    dias = tabla['Dia'].to_numpy()
+    tabla['Mes'] = mes_de_dia(dias)
+    tabla['DiaSemana'] = dia_semana(dias)
+    return tabla
+
+
+class SeleccionCubo:
+    """
+    Subconjunto de celdas del cubo con los agregados que usa el dashboard.
+
+    Si la selección son días completos (dias, rango [desde, hasta) de
+    códigos de día), los conteos distintos usan CuboVentas.por_dia en lugar
+    de fusionar los sketches de cada celda.
+    """
+
+    def __init__(self, cubo, celdas, dias=None):
+        self.cubo = cubo
+        self.celdas = celdas
+        self.dias = dias
+        self.tabla = cubo.tabla.iloc[celdas]
+
+    def _contar(self, nombre):
+        """Conteo distinto aproximado del sketch `nombre` en la selección."""
+        if len(self.celdas) == 0:
+            return 0
+        sketch = getattr(self.cubo, nombre)
+        if self.dias is None:
+            return sketch.contar(self.celdas)
+        dias, densos = self.cubo.por_dia
+        desde, hasta = np.searchsorted(dias, self.dias)
+        return round(estimar(densos[nombre][desde:hasta], sketch.p))
+
+    @property
+    def filas(self):
+        return int(self.tabla['Filas'].sum())
+
+    def metricas(self):
+        """KPIs principales de la selección."""
+        ingresos = self.tabla['Ingresos'].sum()
+        filas = self.filas
+        pedidos = self._contar('facturas')
+        clientes = self._contar('clientes')
+        return {
+            'ingresos_totales': ingresos,
+            'pedidos_totales': pedidos,
+            'clientes_unicos': clientes,
+            'cantidad_productos': self._contar('productos'),
+            # La media de las sumas por pedido/cliente es el total entre el conteo
+            'ticket_promedio': ingresos / pedidos if pedidos else 0.0,
+            'ingresos_promedio_cliente': ingresos / clientes if clientes else 0.0,
+            'cantidad_promedio': self.tabla['Cantidad'].sum() / filas if filas else 0.0,
+        }
+
+    def por_mes(self):
+        """Ingresos y número de transacciones por código de mes."""
+        return self.tabla.groupby('Mes')[['Ingresos', 'Filas']].sum().reset_index()
+
+    def por_dia(self):
+        """Ingresos y número de transacciones por código de día."""
+        return self.tabla.groupby('Dia')[['Ingresos', 'Filas']].sum().reset_index()
+
+    def por_pais(self):
+        """Ingresos por país."""
+        return self.tabla.groupby('Country', observed=True)['Ingresos'].sum()
+
+    def por_dia_semana(self):
+        """Ingresos por día de la semana (0 = lunes ... 6 = domingo)."""
+        return (self.tabla.groupby('DiaSemana')['Ingresos'].sum()
+                .reindex(range(7), fill_value=0))
@@ -16,15 +16,50 @@
 ═════════════════════════════════════════════════════════════════════════════
 """
 
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
 import streamlit as st
-import numpy as np
-from datetime import datetime, timedelta
+from datetime import datetime
+import os
 import warnings
 warnings.filterwarnings('ignore')
 
+from almacen import version_datos
+from arranque import (
+    BACKEND_SQLITE,
+    PRECALENTADOR,
+    clave_metricas,
+    clave_proyeccion,
+    clave_ranking,
+    clave_segmentos,
+)
+from analitica import (
+    Filtros,
+    aplicar_filtros,
+    calcular_kpis,
+    cargar_memoria,
+    cargar_sqlite,
+    evolucion,
+    fuente_incremental,
+    ingresos_por_pais,
+    proyeccion,
+    proyeccion_evolucion,
+    ranking_clientes,
+    ranking_productos,
+    resumen_rfm,
+    segmentar_clientes,
+    serie_pronostico,
+    series_pronostico,
+    ventas_por_dia_semana,
+)
+from cache_lru import CacheLRU
+from exportar import FORMATOS, exportar
+from fechas import NOMBRES_DIA
+from instrumentacion import Ejecucion, RegistroMetricas, perfiladores_disponibles, publicar
+from render import peso_figura, traza_dispersion
+from ingesta import DIRECTORIO_ENTRADA, AlmacenIncremental
+from pronosticos import HORIZONTE, leer_pronosticos, rutas_pronosticos
+from proyeccion import MIN_DIAS
+from topk import K_DEFECTO
+
 # ═════════════════════════════════════════════════════════════════════════════
 # 1. CONFIGURACIÓN INICIAL DE STREAMLIT (DEBE SER LO PRIMERO)
 # ═════════════════════════════════════════════════════════════════════════════
@@ -35,6 +70,21 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Instrumentación de esta ejecución (panel "⏱️ Rendimiento" de la barra
+# lateral). Con DASHBOARD_METRICAS_LOG=1 cada ejecución se emite como una
+# línea JSON; con DASHBOARD_METRICAS_PROM=<archivo> se escriben ahí las
+# métricas acumuladas en formato Prometheus
+METRICAS_LOG = os.environ.get('DASHBOARD_METRICAS_LOG', '0') != '0'
+ARCHIVO_PROMETHEUS = os.environ.get('DASHBOARD_METRICAS_PROM')
+
+# Una ejecución cortada por st.stop() o st.rerun() no llega al final: se
+# cierra aquí para detener su perfil si lo tenía
+if 'ejecucion' in st.session_state:
+    st.session_state['ejecucion'].terminar()
+ejecucion = Ejecucion(perfilador=st.session_state.pop('perfilar', None))
+st.session_state['ejecucion'] = ejecucion
+ejecucion.marca("1. Configuración")
+
 # Estilos CSS personalizados para mejor apariencia
 st.markdown("""
     <style>
@@ -60,64 +110,221 @@ st.markdown("""
 # 2. FUNCIONES AUXILIARES
 # ═════════════════════════════════════════════════════════════════════════════
 
-@st.cache_data
-def load_data(filepath):
+ejecucion.marca("2. Funciones auxiliares")
+
+
+@st.cache_resource(max_entries=1, show_spinner="Cargando datos...")
+def load_data(filepath, version):
     """
-    Carga y limpia los datos del archivo CSV.
+    Fuente en memoria: datos limpios, cubo, índice de filtrado y top-k.
+    
+    Es un recurso compartido: todas las sesiones usan la misma copia (de solo
+    lectura) en lugar de recibir cada una su propio DataFrame deserializado.
+    El CSV solo se parsea la primera vez (o cuando cambia): el resultado
+    limpio se guarda en un caché Arrow que se abre con memory-map (ver
+    almacen.py), así que varios procesos del mismo host comparten memoria.
     
     Parámetros:
     -----------
     filepath : str
         Ruta al archivo CSV
+    version : tuple or None
+        Versión del archivo (almacen.version_datos). Si data.csv cambia, la
+        clave cambia y se carga de nuevo; max_entries=1 libera la anterior.
     
     Retorna:
     --------
-    pd.DataFrame
-        DataFrame limpio y procesado
+    analitica.FuenteDatos or None
+        None si data.csv no existe (ver analitica.cargar_memoria)
     """
+    if version is None:
+        return None
+    ejecucion.registrar_calculo('load_data')
+    # Con `python arranque.py` la fuente ya se cargó (o se está cargando)
+    # en segundo plano al arrancar el servidor
+    fuente = PRECALENTADOR.tomar('load_data', (filepath, version))
+    if fuente is not None:
+        return fuente
+    # Solo se ve la primera vez: el CSV se procesa por bloques
+    barra = st.progress(0.0, text=f"Procesando {filepath}...")
+    
+    def progreso(leidos, total):
+        barra.progress(min(leidos / total, 1.0), text=f"Procesando {filepath}: {leidos / 1e6:,.0f} de {total / 1e6:,.0f} MB")
+    
     try:
-        # Intenta leer el archivo con diferentes encodings
-        df = pd.read_csv(filepath, encoding='utf-8')
-    except UnicodeDecodeError:
-        df = pd.read_csv(filepath, encoding='latin1')
+        return cargar_memoria(filepath, version, progreso=progreso)
     except FileNotFoundError:
         return None
+    finally:
+        barra.empty()
+
+
+@st.cache_resource(max_entries=1, show_spinner="Preparando la base SQLite...")
+def load_base(filepath, version):
+    """
+    Base SQLite del CSV (modo DASHBOARD_BACKEND=sqlite), compartida entre sesiones.
     
-    # ===== LIMPIEZA Y PROCESAMIENTO DE DATOS =====
+    Las transacciones no se guardan en memoria: los filtros y agrupaciones
+    se resuelven con consultas SQL sobre un pool de conexiones de solo
+    lectura (ver basedatos.py).
     
-    # 1. Convertir InvoiceDate a datetime
-    df['InvoiceDate'] = pd.to_datetime(df['InvoiceDate'], format='%m/%d/%Y %H:%M')
+    Retorna:
+    --------
+    analitica.FuenteDatos or None
+    """
+    if version is None:
+        return None
+    ejecucion.registrar_calculo('load_base')
+    fuente = PRECALENTADOR.tomar('load_base', (filepath, version))
+    if fuente is not None:
+        return fuente
+    try:
+        return cargar_sqlite(filepath, version)
+    except FileNotFoundError:
+        return None
+
+
+@st.cache_resource(max_entries=1)
+def load_pronosticos(filepath, version, marca):
+    """
+    Tabla de pronósticos Prophet precalculada (pronosticos.py).
     
-    # 2. Eliminar filas con valores críticos faltantes
-    df = df.dropna(subset=['CustomerID', 'InvoiceNo', 'Country'])
+    El dashboard no ajusta modelos: solo lee la tabla que deja
+    `python pronosticos.py data.csv`. `marca` es la fecha de modificación
+    de esa tabla, así que una tabla recién publicada se lee sin reiniciar.
     
-    # 3. Filtrar valores positivos (rechaza transacciones anormales)
-    df = df[(df['Quantity'] > 0) & (df['UnitPrice'] > 0)]
+    Retorna:
+    --------
+    pd.DataFrame or None
+        None si la tabla no existe o es de otra versión de data.csv
+    """
+    if version is None or marca is None:
+        return None
+    ejecucion.registrar_calculo('load_pronosticos')
+    return leer_pronosticos(filepath)
+
+
+@st.cache_resource
+def load_incremental(directorio):
+    """
+    Almacén incremental compartido para la carpeta vigilada.
     
-    # 4. Crear columnas derivadas útiles
-    df['TotalPrice'] = df['Quantity'] * df['UnitPrice']  # Ingreso por transacción
-    df['YearMonth'] = df['InvoiceDate'].dt.to_period('M').astype(str)  # Período mensual
-    df['Month'] = df['InvoiceDate'].dt.strftime('%Y-%m')  # Formato para series de tiempo
-    df['DayOfWeek'] = df['InvoiceDate'].dt.day_name()  # Día de la semana
+    En cada rerun se llama a sincronizar(): solo los CSV nuevos o
+    modificados se parsean, y sus agregados se fusionan con los existentes.
+    """
+    ejecucion.registrar_calculo('load_incremental')
+    almacen = PRECALENTADOR.tomar('load_incremental', (directorio,))
+    return almacen if almacen is not None else AlmacenIncremental(directorio)
+
+
+@st.cache_resource
+def cache_kpis():
+    """
+    Caché de KPIs compartida por todas las sesiones.
     
-    return df
+    Se indexa con la tupla de filtros (país, fechas, cantidad mínima,
+    versión de los datos), así que nunca hace falta hashear un DataFrame
+    para saber si el resultado ya está calculado. Con `python arranque.py`
+    nace con los KPIs de la vista por defecto ya calculados.
+    """
+    cache = CacheLRU(max_entradas=512, ttl=6 * 3600)
+    PRECALENTADOR.sembrar(cache)
+    return cache
 
 
-@st.cache_data
-def calcular_metricas(df):
+@st.cache_resource
+def registro_metricas():
     """
-    Calcula métricas clave del DataFrame.
+    Métricas de rendimiento acumuladas de todas las sesiones.
+    
+    Cada ejecución del script suma sus tiempos, aciertos de caché y
+    tamaños (ver instrumentacion.py) al terminar.
+    """
+    return RegistroMetricas()
+
+
+def calcular_metricas(consulta, exactos=False):
+    """
+    Calcula métricas clave de la selección (analitica.calcular_kpis).
+    
+    Los conteos distintos (pedidos, clientes, productos) salen de fusionar
+    los sketches HyperLogLog de las celdas seleccionadas. Con exactos=True
+    se cuentan con nunique() sobre las transacciones filtradas (auditoría).
+    En modo SQLite la selección ya devuelve conteos exactos.
+    
+    Las combinaciones de filtros repetidas (o populares entre usuarios)
+    se devuelven directamente desde cache_kpis().
     
     Retorna un diccionario con KPIs principales
     """
-    return {
-        'ingresos_totales': df['TotalPrice'].sum(),
-        'pedidos_totales': df['InvoiceNo'].nunique(),
-        'clientes_unicos': df['CustomerID'].nunique(),
-        'cantidad_productos': df['Description'].nunique(),
-        'ticket_promedio': df.groupby('InvoiceNo')['TotalPrice'].sum().mean(),
-        'ingresos_promedio_cliente': df.groupby('CustomerID')['TotalPrice'].sum().mean(),
-    }
+    return ejecucion.consultar_cache('KPIs: métricas', cache_kpis(), clave_metricas(consulta, exactos),
+                                     lambda: calcular_kpis(consulta, exactos))
+
+
+def calcular_ranking(consulta, entidad, k):
+    """
+    Top-k de productos ('Description') o clientes ('CustomerID').
+    
+    En memoria el ranking sale de las sumas parciales de topk.py y no se
+    guarda; en modo SQLite se agrega sobre los índices de la base, así que
+    el resultado se guarda en cache_kpis() con la clave de los filtros.
+    """
+    ranking = ranking_productos if entidad == 'Description' else ranking_clientes
+    if not consulta.fuente.es_sqlite:
+        return ranking(consulta, k)
+    return ejecucion.consultar_cache(f'KPIs: ranking {entidad}', cache_kpis(),
+                                     clave_ranking(consulta, entidad, k),
+                                     lambda: ranking(consulta, k))
+
+
+def calcular_proyeccion(consulta):
+    """
+    Proyección rápida de los ingresos diarios de la selección (proyeccion.py).
+    
+    El ajuste (tendencia + Fourier por mínimos cuadrados) tarda milisegundos,
+    así que se recalcula cada vez que cambian los filtros; el resultado se
+    guarda en cache_kpis() con la clave de los filtros.
+    """
+    return ejecucion.consultar_cache('KPIs: proyección', cache_kpis(),
+                                     clave_proyeccion(consulta, HORIZONTE),
+                                     lambda: proyeccion(consulta))
+
+
+def calcular_segmentos(fuente):
+    """
+    Tabla RFM por cliente con su segmento, compartida entre sesiones.
+    
+    Se calcula sobre el almacén RFM (una fila por factura), no sobre las
+    transacciones, y se guarda en cache_kpis() para cada versión de los datos.
+    """
+    return ejecucion.consultar_cache('KPIs: segmentos', cache_kpis(), clave_segmentos(fuente),
+                                     lambda: segmentar_clientes(fuente))
+
+
+def mostrar_grafico(fig, nombre):
+    """
+    Dibuja la figura y, si se pidió, apunta el tamaño de su JSON.
+    
+    Medir el peso serializa la figura una segunda vez, así que solo se hace
+    con "Medir el JSON de cada gráfico" marcado en el panel "📦 Peso de los
+    gráficos" de la barra lateral. La medición y el envío se miden como
+    pasos de la ejecución.
+    """
+    if st.session_state.get('medir_pesos', False):
+        with ejecucion.paso(f"{nombre}: JSON Plotly"):
+            st.session_state.setdefault('pesos_graficos', {})[nombre] = peso_figura(fig)
+    with ejecucion.paso(f"{nombre}: envío"):
+        st.plotly_chart(fig, use_container_width=True)
+
+
+def pedir_perfil():
+    """
+    Callback del botón "🔬 Perfilar una ejecución".
+    
+    Los callbacks corren antes del rerun que provoca el clic, así que ese
+    rerun es el que se perfila (ver instrumentacion.Ejecucion).
+    """
+    st.session_state['perfilar'] = st.session_state['perfilador']
 
 
 def format_numero(numero):
@@ -134,45 +341,72 @@ def format_moneda(numero):
 # 3. CARGA DE DATOS
 # ═════════════════════════════════════════════════════════════════════════════
 
-# Intenta cargar datos desde el archivo
-df = load_data('data.csv')
-
-if df is None:
+ejecucion.marca("3. Carga de datos")
+
+# Con DASHBOARD_BACKEND=sqlite (arranque.BACKEND_SQLITE) los filtros y
+# agrupaciones se resuelven en SQLite (basedatos.py) en lugar de sobre el
+# DataFrame en memoria
+# Intenta cargar datos desde el archivo (recurso compartido entre sesiones)
+if BACKEND_SQLITE:
+    fuente = ejecucion.recurso('load_base', load_base, 'data.csv', version_datos('data.csv'))
+elif os.path.isdir(DIRECTORIO_ENTRADA):
+    # Modo incremental: archivos semanales en la carpeta datos/
+    almacen_incremental = ejecucion.recurso('load_incremental', load_incremental, DIRECTORIO_ENTRADA)
+    with ejecucion.paso("Sincronizar carpeta"):
+        almacen_incremental.sincronizar()
+    # Los archivos que no se pudieron ingerir se ignoran hasta que cambien
+    rechazados = almacen_incremental.cuarentena()
+    if rechazados:
+        st.warning(f"⚠️ {len(rechazados)} archivo(s) de {DIRECTORIO_ENTRADA}/ no se pudieron ingerir "
+                   "y se ignoran hasta que cambien:\n\n"
+                   + "\n".join(f"- **{nombre}**: {error}" for nombre, error in sorted(rechazados.items())))
+    fuente = fuente_incremental(almacen_incremental)
+else:
+    fuente = ejecucion.recurso('load_data', load_data, 'data.csv', version_datos('data.csv'))
+
+if fuente is None:
     st.error("❌ Error: No se puede encontrar 'data.csv' en la carpeta del proyecto.")
-    st.info("📋 Asegúrate de que el archivo data.csv esté en la misma carpeta que dashboard.py")
+    st.info(f"📋 Asegúrate de que el archivo data.csv esté en la misma carpeta que dashboard.py (o de dejar archivos CSV en la carpeta {DIRECTORIO_ENTRADA}/)")
     st.stop()
 
-# Información de datos cargados
-data_info = {
-    'filas': len(df),
-    'columnas': len(df.columns),
-    'fecha_inicio': df['InvoiceDate'].min(),
-    'fecha_fin': df['InvoiceDate'].max(),
-}
+# Información de datos cargados (filas, fechas, países y memoria o tamaño
+# de la base)
+data_info = fuente.info()
+if not fuente.es_sqlite:
+    ejecucion.tamano('df', fuente.df)
 
 
 # ═════════════════════════════════════════════════════════════════════════════
 # 4. BARRA LATERAL - FILTROS AVANZADOS
 # ═════════════════════════════════════════════════════════════════════════════
 
+ejecucion.marca("4. Barra lateral")
+
 with st.sidebar:
     st.title("🎛️ Filtros del Dashboard")
     
     # Información de los datos
     with st.expander("📊 Información de Datos", expanded=False):
+        if not fuente.es_sqlite:
+            almacenamiento = f"Memoria: {data_info['memoria'].loc['TOTAL', 'MB']:,.1f} MB"
+        else:
+            almacenamiento = f"Base SQLite: {data_info['mb']:,.1f} MB"
         st.info(f"""
         **Datos Disponibles:**
         - 📈 Filas: {format_numero(data_info['filas'])}
         - 📋 Columnas: {data_info['columnas']}
         - 📅 Período: {data_info['fecha_inicio'].date()} a {data_info['fecha_fin'].date()}
-        - 🌍 Países: {df['Country'].nunique()}
+        - 🌍 Países: {len(data_info['paises'])}
+        - 💾 {almacenamiento}
         """)
+        if not fuente.es_sqlite:
+            st.dataframe(data_info['memoria'][['tipo', 'MB']], use_container_width=True)
     
     st.divider()
     
     # Filtro 1: País
     st.subheader("1️⃣ País")
-    paises_unicos = ['🌍 Todos los Países'] + sorted(df['Country'].unique().tolist())
+    paises_unicos = ['🌍 Todos los Países'] + data_info['paises']
     pais_seleccionado = st.selectbox(
         "Selecciona un país:",
         paises_unicos,
@@ -183,8 +417,8 @@ with st.sidebar:
     
     # Filtro 2: Rango de fechas
     st.subheader("2️⃣ Rango de Fechas")
-    fecha_min = df['InvoiceDate'].min().date()
-    fecha_max = df['InvoiceDate'].max().date()
+    fecha_min = data_info['fecha_inicio'].date()
+    fecha_max = data_info['fecha_fin'].date()
     
     col_fecha1, col_fecha2 = st.columns(2)
     with col_fecha1:
@@ -222,6 +456,29 @@ with st.sidebar:
         help="Filtra transacciones por cantidad mínima"
     )
     
+    # Tamaño de los rankings de productos y clientes (gráficos 2 y 3)
+    k_top = st.slider(
+        "Top K productos / clientes:",
+        min_value=5,
+        max_value=50,
+        value=K_DEFECTO,
+        step=5,
+        help="Número de productos y clientes en los rankings"
+    )
+    
+    # Pedidos, clientes y productos se estiman con los sketches HyperLogLog
+    # del cubo; contarlos exactamente recorre las transacciones filtradas en
+    # cada rerun, así que es solo para auditar. En SQLite siempre son
+    # exactos (COUNT DISTINCT sobre los índices)
+    if not fuente.es_sqlite:
+        conteos_exactos = st.checkbox(
+            "🔍 Conteos exactos",
+            value=False,
+            help=f"Contar exactamente en lugar de estimar con HyperLogLog (error típico ±{fuente.cubo.error:.1%})"
+        )
+    else:
+        conteos_exactos = True
+    
     st.divider()
     
     # Botón para resetear filtros
@@ -234,29 +491,27 @@ with st.sidebar:
 # 5. APLICAR FILTROS AL DATAFRAME
 # ═════════════════════════════════════════════════════════════════════════════
 
-fecha_inicio_dt = pd.to_datetime(fecha_inicio)
-fecha_fin_dt = pd.to_datetime(fecha_fin) + timedelta(days=1)
+ejecucion.marca("5. Filtros")
 
-df_filtrado = df[
-    (df['InvoiceDate'] >= fecha_inicio_dt) &
-    (df['InvoiceDate'] < fecha_fin_dt) &
-    (df['Quantity'] >= cantidad_min)
-]
+pais_filtro = None if pais_seleccionado.startswith('🌍') else pais_seleccionado
+filtros = Filtros.de_fechas(fecha_inicio, fecha_fin, pais_filtro, cantidad_min)
 
-# Aplicar filtro de país
-if not pais_seleccionado.startswith('🌍'):
-    df_filtrado = df_filtrado[df_filtrado['Country'] == pais_seleccionado]
+# En memoria: búsqueda binaria sobre el índice (transacciones) y selección
+# del cubo (KPIs y gráficos agregados). En SQLite los filtros se traducen a
+# SQL; las transacciones solo se leen al exportar o al pedir la vista previa
+consulta = aplicar_filtros(fuente, filtros, paso=ejecucion.paso)
+if not fuente.es_sqlite:
+    ejecucion.tamano('df_filtrado', consulta.transacciones)
+    ejecucion.tamano('seleccion_cubo', consulta.seleccion.tabla)
 
 
 # ═════════════════════════════════════════════════════════════════════════════
 # 6. CUERPO PRINCIPAL - HEADER Y RESUMEN
 # ═════════════════════════════════════════════════════════════════════════════
 
-st.title("📊 Dashboard de Ventas E-Commerce")
+ejecucion.marca("6. Resumen")
 
-# Asegurarse de que TotalPrice existe en el DataFrame filtrado
-if 'TotalPrice' not in df_filtrado.columns:
-    df_filtrado['TotalPrice'] = df_filtrado['Quantity'] * df_filtrado['UnitPrice']
+st.title("📊 Dashboard de Ventas E-Commerce")
 
 st.markdown(f"""
 **Período:** `{fecha_inicio}` → `{fecha_fin}` | 
@@ -265,20 +520,24 @@ st.markdown(f"""
 """)
 
 # Validación de datos filtrados
-if len(df_filtrado) == 0:
+if consulta.filas == 0:
     st.warning("⚠️ No hay datos que coincidan con los filtros seleccionados. Intenta cambiar los filtros.")
     st.stop()
 
-st.info(f"✅ Mostrando {format_numero(len(df_filtrado))} transacciones de {format_numero(df_filtrado['InvoiceNo'].nunique())} pedidos")
+clave_filtros = consulta.clave
+metricas = calcular_metricas(consulta, conteos_exactos)
+
+aproximado = "" if conteos_exactos else "≈"
+st.info(f"✅ Mostrando {format_numero(consulta.filas)} transacciones de {aproximado}{format_numero(metricas['pedidos_totales'])} pedidos")
 
 
 # ═════════════════════════════════════════════════════════════════════════════
 # 7. MÉTRICAS CLAVE (KPIs) - ROW 1
 # ═════════════════════════════════════════════════════════════════════════════
 
-st.header("📈 Métricas Clave")
+ejecucion.marca("7. KPIs")
 
-metricas = calcular_metricas(df_filtrado)
+st.header("📈 Métricas Clave")
 
 # 4 columnas para los KPIs principales
 col1, col2, col3, col4 = st.columns(4)
@@ -287,7 +546,7 @@ with col1:
     st.metric(
         label="💰 Ingresos Totales",
         value=format_moneda(metricas['ingresos_totales']),
-        delta=f"{metricas['ingresos_totales']/len(df_filtrado):.2f} promedio por transacción" if len(df_filtrado) > 0 else "N/A"
+        delta=f"{metricas['ingresos_totales']/consulta.filas:.2f} promedio por transacción" if consulta.filas > 0 else "N/A"
     )
 
 with col2:
@@ -311,27 +570,65 @@ with col4:
         delta=f"{metricas['ingresos_totales']/metricas['cantidad_productos']:.2f} ingresos/producto" if metricas['cantidad_productos'] > 0 else "N/A"
     )
 
+# Estado de la caché de KPIs (compartida entre sesiones)
+with st.sidebar.expander("⚡ Caché de KPIs", expanded=False):
+    stats_cache = cache_kpis().estadisticas()
+    st.caption(
+        f"Entradas: {stats_cache['entradas']} | "
+        f"Aciertos: {stats_cache['aciertos']} | "
+        f"Fallos: {stats_cache['fallos']} | "
+        f"Tasa: {stats_cache['tasa_aciertos']:.0%}"
+    )
+
 
 # ═════════════════════════════════════════════════════════════════════════════
 # 8. GRÁFICOS PRINCIPALES
 # ═════════════════════════════════════════════════════════════════════════════
 
+ejecucion.marca("8. Gráficos")
+
+# Plotly se importa al llegar aquí: una ejecución que se detiene antes (sin
+# datos o sin filas para los filtros) no lo necesita. Con arranque.py ya
+# viene importado desde el arranque
+import plotly.express as px
+import plotly.graph_objects as go
+
 st.header("📊 Visualizaciones Avanzadas")
 
+# Pesos de los gráficos de esta ejecución (ver mostrar_grafico)
+st.session_state['pesos_graficos'] = {}
+
 # GRÁFICO 1: Evolución de Ingresos (Serie de tiempo)
 st.subheader("1. Evolución de Ingresos a lo Largo del Tiempo")
 
-ventas_por_mes = df_filtrado.groupby('Month')['TotalPrice'].agg(['sum', 'count']).reset_index()
-ventas_por_mes.columns = ['Month', 'TotalPrice', 'Transacciones']
+col_granularidad, col_proyeccion = st.columns([3, 1])
+with col_granularidad:
+    granularidad = st.radio(
+        "Granularidad",
+        options=['Mensual', 'Diaria'],
+        horizontal=True,
+        label_visibility='collapsed'
+    )
+with col_proyeccion:
+    mostrar_proyeccion = st.checkbox(
+        f"Proyección {HORIZONTE} días",
+        value=True,
+        help="Tendencia + estacionalidad semanal y anual ajustadas a la selección actual (proyeccion.py)"
+    )
+
+# La serie diaria se reduce con LTTB si supera el presupuesto de puntos
+with ejecucion.paso("1. Evolución: agregación"):
+    ventas_por_mes = evolucion(consulta, granularidad)
 
 fig_tiempo = go.Figure()
 
-fig_tiempo.add_trace(go.Scatter(
+fig_tiempo.add_trace(traza_dispersion(
+    len(ventas_por_mes),
     x=ventas_por_mes['Month'],
     y=ventas_por_mes['TotalPrice'],
-    mode='lines+markers',
+    mode='lines+markers' if granularidad == 'Mensual' else 'lines',
     name='Ingresos',
-    line=dict(color='#1f77b4', width=3),
+    line=dict(color='#1f77b4', width=3 if granularidad == 'Mensual' else 2),
     marker=dict(size=8),
     yaxis='y1'
 ))
@@ -345,9 +642,34 @@ fig_tiempo.add_trace(go.Bar(
     opacity=0.6
 ))
 
+# Proyección de los próximos días sobre la serie filtrada; en la vista
+# mensual el último mes con datos se completa con lo real
+proyectado = calcular_proyeccion(consulta) if mostrar_proyeccion else None
+if proyectado is not None:
+    curva = proyeccion_evolucion(proyectado, ventas_por_mes, granularidad)
+    if granularidad == 'Diaria':
+        fig_tiempo.add_trace(go.Scatter(
+            x=curva['Month'], y=curva['yhat_upper'], mode='lines', line=dict(width=0),
+            showlegend=False, hoverinfo='skip', yaxis='y1'
+        ))
+        fig_tiempo.add_trace(go.Scatter(
+            x=curva['Month'], y=curva['yhat_lower'], mode='lines', line=dict(width=0),
+            fill='tonexty', fillcolor='rgba(255, 127, 14, 0.2)', name='Intervalo 95%', yaxis='y1'
+        ))
+    fig_tiempo.add_trace(go.Scatter(
+        x=curva['Month'],
+        y=curva['yhat'],
+        mode='lines+markers' if granularidad == 'Mensual' else 'lines',
+        name=f'Proyección {HORIZONTE} días',
+        line=dict(color='#ff7f0e', width=2, dash='dash'),
+        yaxis='y1'
+    ))
+elif mostrar_proyeccion:
+    st.caption(f"📉 Se necesitan al menos {MIN_DIAS} días de datos en la selección para proyectar")
+
 fig_tiempo.update_layout(
     title="Ingresos vs Número de Transacciones",
-    xaxis=dict(title='Mes'),
+    xaxis=dict(title='Mes' if granularidad == 'Mensual' else 'Día'),
     yaxis=dict(title='Ingresos (USD)', side='left'),
     yaxis2=dict(title='Cantidad de Transacciones', side='right', overlaying='y'),
     hovermode='x unified',
@@ -355,23 +677,23 @@ fig_tiempo.update_layout(
     showlegend=True
 )
 
-st.plotly_chart(fig_tiempo, use_container_width=True)
+mostrar_grafico(fig_tiempo, "1. Evolución de ingresos")
 
 
 # FILA 2: Gráficos lado a lado
 col_graf1, col_graf2 = st.columns(2)
 
-# GRÁFICO 2: Top 10 Productos
+# GRÁFICO 2: Top K Productos
 with col_graf1:
-    st.subheader("2. Top 10 Productos Más Vendidos")
+    st.subheader(f"2. Top {k_top} Productos Más Vendidos")
     
-    top_productos = df_filtrado.groupby('Description').agg({
-        'Quantity': 'sum',
-        'TotalPrice': 'sum'
-    }).nlargest(10, 'Quantity').reset_index()
+    # Top-K exacto sobre sumas parciales por mes/día y país (topk.py). El
+    # filtro de cantidad mínima no tiene sumas parciales: se agrega directo
+    with ejecucion.paso("2. Top productos: agregación"):
+        top_k_productos = calcular_ranking(consulta, 'Description', k_top)
     
     fig_productos = px.bar(
-        top_productos,
+        top_k_productos,
         x='Quantity',
         y='Description',
         color='TotalPrice',
@@ -387,22 +709,18 @@ with col_graf1:
         showlegend=True
     )
     
-    st.plotly_chart(fig_productos, use_container_width=True)
+    mostrar_grafico(fig_productos, "2. Top productos")
 
 
-# GRÁFICO 3: Top 10 Clientes
+# GRÁFICO 3: Top K Clientes
 with col_graf2:
-    st.subheader("3. Top 10 Clientes Por Ingresos")
-    
-    top_clientes = df_filtrado.groupby('CustomerID').agg({
-        'TotalPrice': 'sum',
-        'InvoiceNo': 'count'
-    }).nlargest(10, 'TotalPrice').reset_index()
+    st.subheader(f"3. Top {k_top} Clientes Por Ingresos")
     
-    top_clientes['CustomerID'] = top_clientes['CustomerID'].astype(str)
+    with ejecucion.paso("3. Top clientes: agregación"):
+        top_k_clientes = calcular_ranking(consulta, 'CustomerID', k_top)
     
     fig_clientes = px.bar(
-        top_clientes,
+        top_k_clientes,
         x='TotalPrice',
         y='CustomerID',
         color='InvoiceNo',
@@ -418,7 +736,7 @@ with col_graf2:
         showlegend=True
     )
     
-    st.plotly_chart(fig_clientes, use_container_width=True)
+    mostrar_grafico(fig_clientes, "3. Top clientes")
 
 
 # FILA 3: Análisis adicional
@@ -428,32 +746,34 @@ col_graf3, col_graf4 = st.columns(2)
 with col_graf3:
     st.subheader("4. Distribución de Ingresos por País")
     
-    ingresos_pais = df_filtrado.groupby('Country')['TotalPrice'].sum().nlargest(10).reset_index()
+    # 9 países principales y el resto agrupado en "Otros"
+    with ejecucion.paso("4. Países: agregación"):
+        ingresos_pais = ingresos_por_pais(consulta)
     
     fig_pais = px.pie(
         ingresos_pais,
         names='Country',
         values='TotalPrice',
-        title='Top 10 Países por Ingresos',
+        title='Principales Países por Ingresos (resto en "Otros")',
         color_discrete_sequence=px.colors.qualitative.Set3
     )
     
     fig_pais.update_layout(height=400)
     
-    st.plotly_chart(fig_pais, use_container_width=True)
+    mostrar_grafico(fig_pais, "4. Ingresos por país")
 
 
 # GRÁFICO 5: Heatmap de Día de la Semana
 with col_graf4:
     st.subheader("5. Patrón de Ventas por Día de Semana")
     
-    # Crear tabla de frecuencia
-    dia_orden = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-    ventas_dia = df_filtrado.groupby('DayOfWeek')['TotalPrice'].sum().reindex(dia_orden)
+    # Crear tabla de frecuencia (DayOfWeek: 0 = lunes ... 6 = domingo)
+    with ejecucion.paso("5. Día de semana: agregación"):
+        ventas_dia = ventas_por_dia_semana(consulta)
     
     fig_dia = go.Figure(data=[
         go.Bar(
-            x=['Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes', 'Sábado', 'Domingo'],
+            x=NOMBRES_DIA,
             y=ventas_dia.values,
             marker=dict(
                 color=ventas_dia.values,
@@ -472,79 +792,199 @@ with col_graf4:
         height=400
     )
     
-    st.plotly_chart(fig_dia, use_container_width=True)
+    mostrar_grafico(fig_dia, "5. Ventas por día de semana")
 
 
 # ═════════════════════════════════════════════════════════════════════════════
 # 9. ANÁLISIS ESTADÍSTICOS
 # ═════════════════════════════════════════════════════════════════════════════
 
+ejecucion.marca("9. Análisis estadísticos")
+
 st.header("📊 Análisis Estadísticos")
 
 col_stat1, col_stat2, col_stat3 = st.columns(3)
 
 with col_stat1:
-    ticket_promedio = df_filtrado.groupby('InvoiceNo')['TotalPrice'].sum().mean()
     st.metric(
         "🎫 Ticket Promedio",
-        format_moneda(ticket_promedio),
+        format_moneda(metricas['ticket_promedio']),
         help="Promedio de ingresos por pedido"
     )
 
 with col_stat2:
-    ingresos_cliente = df_filtrado.groupby('CustomerID')['TotalPrice'].sum().mean()
     st.metric(
         "💳 Ingresos Promedio por Cliente",
-        format_moneda(ingresos_cliente),
+        format_moneda(metricas['ingresos_promedio_cliente']),
         help="Promedio gastado por cliente"
     )
 
 with col_stat3:
-    cantidad_promedio = df_filtrado['Quantity'].mean()
     st.metric(
         "📦 Cantidad Promedio por Transacción",
-        f"{cantidad_promedio:.1f} unidades",
+        f"{metricas['cantidad_promedio']:.1f} unidades",
         help="Promedio de artículos por transacción"
     )
 
+# Segmentos RFM leídos del almacén de features (rfm.py)
+st.subheader("👥 Segmentos de Clientes (RFM)")
+
+segmentos_rfm = resumen_rfm(calcular_segmentos(fuente), pais_filtro)
+
+if segmentos_rfm is None:
+    st.info("No hay clientes con historial RFM para este país")
+else:
+    col_rfm1, col_rfm2 = st.columns(2)
+    
+    with col_rfm1:
+        fig_rfm = px.bar(
+            segmentos_rfm,
+            x='Segmento',
+            y='Clientes',
+            color='Ingresos',
+            color_continuous_scale='Blues',
+            labels={'Clientes': 'Clientes', 'Ingresos': 'Ingresos (USD)'},
+            title='Clientes por segmento (coloreado por ingresos)'
+        )
+        fig_rfm.update_layout(height=400)
+        mostrar_grafico(fig_rfm, "6. Segmentos RFM")
+    
+    with col_rfm2:
+        st.dataframe(
+            segmentos_rfm.style.format({
+                'Recencia': '{:.0f} días',
+                'Frecuencia': '{:.1f}',
+                'Monetario': '${:,.2f}',
+                'Ingresos': '${:,.0f}',
+                '% Clientes': '{:.1f}%'
+            }),
+            use_container_width=True,
+            hide_index=True
+        )
+    
+    st.caption(
+        f"RFM de todo el histórico (referencia: {fuente.rfm.fecha_referencia:%Y-%m-%d}). "
+        "El país es el de la última compra de cada cliente; las fechas y la "
+        "cantidad mínima no se aplican a esta vista."
+    )
+
+# Pronósticos Prophet por país y segmento, precalculados (pronosticos.py)
+st.subheader(f"🔮 Pronóstico de Ingresos a {HORIZONTE} Días (Prophet)")
+
+pronosticos = None
+if fuente.version[0] != 'incremental':
+    ruta_pronosticos, _ = rutas_pronosticos('data.csv')
+    marca = ruta_pronosticos.stat().st_mtime_ns if ruta_pronosticos.exists() else None
+    pronosticos = ejecucion.recurso('load_pronosticos', load_pronosticos, 'data.csv', fuente.version, marca)
+
+if pronosticos is None:
+    st.info("No hay pronósticos precalculados para estos datos. Genéralos con `python pronosticos.py data.csv`")
+else:
+    opciones_serie = series_pronostico(pronosticos)
+    seleccion_defecto = f"País: {pais_filtro}" if pais_filtro is not None else "Total: Total"
+    serie_elegida = st.selectbox(
+        "Serie",
+        options=opciones_serie,
+        index=opciones_serie.index(seleccion_defecto) if seleccion_defecto in opciones_serie else 0
+    )
+    pronostico, futuro = serie_pronostico(pronosticos, serie_elegida)
+    
+    fig_pronostico = go.Figure()
+    fig_pronostico.add_trace(go.Scatter(
+        x=pronostico['ds'], y=pronostico['y'], mode='lines', name='Real',
+        line=dict(color='#1f77b4', width=1)
+    ))
+    fig_pronostico.add_trace(go.Scatter(
+        x=futuro['ds'], y=futuro['yhat_upper'], mode='lines', line=dict(width=0),
+        showlegend=False, hoverinfo='skip'
+    ))
+    fig_pronostico.add_trace(go.Scatter(
+        x=futuro['ds'], y=futuro['yhat_lower'], mode='lines', line=dict(width=0),
+        fill='tonexty', fillcolor='rgba(255, 127, 14, 0.2)', name='Intervalo 95%'
+    ))
+    fig_pronostico.add_trace(go.Scatter(
+        x=pronostico['ds'], y=pronostico['yhat'], mode='lines', name='Pronóstico',
+        line=dict(color='#ff7f0e', width=2)
+    ))
+    fig_pronostico.update_layout(
+        title=f"Ingresos diarios: {serie_elegida}",
+        xaxis=dict(title='Día'),
+        yaxis=dict(title='Ingresos (USD)'),
+        hovermode='x unified',
+        height=450
+    )
+    mostrar_grafico(fig_pronostico, "7. Pronóstico")
+    
+    st.caption(
+        f"Ingresos pronosticados en los próximos {HORIZONTE} días: "
+        f"{format_moneda(futuro['yhat'].sum())} "
+        f"(95%: {format_moneda(futuro['yhat_lower'].sum())} – {format_moneda(futuro['yhat_upper'].sum())}). "
+        "Pronóstico de todo el histórico: las fechas y la cantidad mínima no se aplican a esta vista."
+    )
+
+# Tamaño del JSON que se envía al navegador por cada gráfico (solo si se
+# pidió: medirlo cuesta una serialización extra por gráfico)
+with st.sidebar.expander("📦 Peso de los gráficos", expanded=st.session_state.get('medir_pesos', False)):
+    st.checkbox("Medir el JSON de cada gráfico", key='medir_pesos',
+                help="Serializa cada figura una vez más en cada ejecución para medir su tamaño")
+    pesos = st.session_state.get('pesos_graficos', {})
+    for nombre, peso in pesos.items():
+        st.caption(f"{nombre}: {peso / 1024:,.1f} KB")
+    if pesos:
+        st.caption(f"**Total: {sum(pesos.values()) / 1024:,.1f} KB**")
+
 
 # ═════════════════════════════════════════════════════════════════════════════
 # 10. SECCIÓN DE DATOS CRUDOS CON OPCIÓN DE DESCARGA
 # ═════════════════════════════════════════════════════════════════════════════
 
+ejecucion.marca("10. Descarga")
+
 st.header("📥 Descargar Datos")
 
+# El archivo solo se genera al pulsar "Preparar archivo" (y se reutiliza
+# entre sesiones con los mismos filtros); antes no se serializa nada
 col_down1, col_down2 = st.columns(2)
 
 with col_down1:
-    # Opción para descargar datos filtrados como CSV
-    csv_data = df_filtrado.to_csv(index=False)
-    st.download_button(
-        label="⬇️ Descargar Datos Filtrados (CSV)",
-        data=csv_data,
-        file_name=f"ventas_{fecha_inicio}_{fecha_fin}.csv",
-        mime="text/csv"
+    formato_export = st.radio(
+        "Formato de descarga",
+        options=list(FORMATOS),
+        format_func=lambda f: FORMATOS[f]['nombre'],
+        horizontal=True
     )
 
 with col_down2:
-    # Opción para descargar datos como Excel
-    try:
-        excel_data = df_filtrado.to_excel(index=False)
-        st.download_button(
-            label="⬇️ Descargar Datos Filtrados (Excel)",
-            data=excel_data,
-            file_name=f"ventas_{fecha_inicio}_{fecha_fin}.xlsx",
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-        )
-    except:
-        st.info("💡 Instala 'openpyxl' para descargar en formato Excel")
+    exportacion = st.session_state.get('exportacion')
+    if st.button("📦 Preparar archivo"):
+        try:
+            with st.spinner("Generando archivo..."), ejecucion.paso("Exportación"):
+                ruta_export = exportar(consulta.transacciones_exportables(), formato_export, clave_filtros)
+            exportacion = (clave_filtros, formato_export, str(ruta_export))
+            st.session_state['exportacion'] = exportacion
+        except ImportError:
+            st.info("💡 Instala 'openpyxl' para descargar en formato Excel")
+        except ValueError as e:
+            st.warning(f"⚠️ {e}")
+
+    if (exportacion is not None
+            and exportacion[:2] == (clave_filtros, formato_export)
+            and os.path.exists(exportacion[2])):
+        with open(exportacion[2], 'rb') as archivo_export, ejecucion.paso("Botón de descarga"):
+            st.download_button(
+                label=f"⬇️ Descargar Datos Filtrados ({FORMATOS[formato_export]['nombre']})",
+                data=archivo_export,
+                file_name=f"ventas_{fecha_inicio}_{fecha_fin}.{FORMATOS[formato_export]['extension']}",
+                mime=FORMATOS[formato_export]['mime']
+            )
 
 
 # Vista previa de datos
 if st.checkbox("👀 Ver Datos Crudos (preview)", value=False):
     st.subheader("Preview de Datos Filtrados")
+    preview = consulta.vista_previa(100)
     st.dataframe(
-        df_filtrado.head(100).style.format({
+        preview.style.format({
             'TotalPrice': '${:,.2f}',
             'UnitPrice': '${:,.2f}',
             'InvoiceDate': '{:%Y-%m-%d %H:%M}'
@@ -552,13 +992,15 @@ if st.checkbox("👀 Ver Datos Crudos (preview)", value=False):
         use_container_width=True
     )
     
-    st.info(f"Mostrando 100 de {len(df_filtrado)} registros")
+    st.info(f"Mostrando 100 de {consulta.filas} registros")
 
 
 # ═════════════════════════════════════════════════════════════════════════════
 # 11. FOOTER
 # ═════════════════════════════════════════════════════════════════════════════
 
+ejecucion.marca("11. Footer")
+
 st.divider()
 st.markdown("""
 ---
@@ -567,4 +1009,42 @@ st.markdown("""
     <br>
     ⚡ Últimas actualizaciones: Datos en tiempo real | Filtros avanzados | Análisis estadístico
 </div>
-""", unsafe_allow_html=True)
\ No newline at end of file
+""", unsafe_allow_html=True)
+
+# ═════════════════════════════════════════════════════════════════════════════
+# 12. RENDIMIENTO DE ESTA EJECUCIÓN
+# ═════════════════════════════════════════════════════════════════════════════
+
+# Tiempos por sección y paso, aciertos de caché y tamaños de esta ejecución
+# (instrumentacion.py). El panel se dibuja después de cerrar las mediciones
+publicar(ejecucion, registro_metricas(), log=METRICAS_LOG, archivo_prometheus=ARCHIVO_PROMETHEUS)
+if ejecucion.perfil is not None:
+    st.session_state['ultimo_perfil'] = ejecucion.perfil
+
+with st.sidebar.expander("⏱️ Rendimiento de esta ejecución", expanded=ejecucion.perfil is not None):
+    secciones, pasos, caches, tamanos = ejecucion.tablas()
+    st.caption(f"**Total: {ejecucion.total * 1000:,.0f} ms**")
+    arranque = PRECALENTADOR.resumen()
+    if arranque['estado'] != 'frio':
+        st.caption(f"Precalentamiento al arrancar: {arranque['estado']} "
+                   f"({arranque['segundos'] or 0:,.1f} s)")
+    st.dataframe(secciones.style.format({'Segundos': '{:.3f}'}), hide_index=True, use_container_width=True)
+    st.dataframe(pasos.style.format({'Segundos': '{:.3f}'}), hide_index=True, use_container_width=True)
+    aciertos = sum(c['Acierto'] for c in ejecucion.caches)
+    st.caption(f"Cachés: {aciertos} aciertos, {len(ejecucion.caches) - aciertos} fallos")
+    st.dataframe(caches, hide_index=True, use_container_width=True)
+    st.dataframe(tamanos.style.format({'Filas': '{:,}', 'Bytes': '{:,}'}), hide_index=True,
+                 use_container_width=True)
+    
+    # Perfil de una sola ejecución: la que provoca el clic en el botón
+    st.selectbox("Perfilador", perfiladores_disponibles(), key='perfilador')
+    st.button("🔬 Perfilar una ejecución", on_click=pedir_perfil, use_container_width=True)
+    perfil = st.session_state.get('ultimo_perfil')
+    if perfil is not None:
+        st.caption(f"Último perfil ({perfil['perfilador']})")
+        st.code(perfil['texto'], language=None)
+        st.download_button(f"⬇️ {perfil['nombre_archivo']}", data=perfil['archivo'],
+                           file_name=perfil['nombre_archivo'], mime=perfil['mime'])
+    
+    st.download_button("⬇️ Métricas (Prometheus)", data=registro_metricas().prometheus(),
+                       file_name="metricas.prom", mime="text/plain")
@@ -0,0 +1,208 @@
+"""
+═════════════════════════════════════════════════════════════════════════════
+    EXPORTACIÓN BAJO DEMANDA - CSV, EXCEL Y PARQUET POR BLOQUES
+
+    Los archivos de descarga solo se generan cuando alguien los pide, y se
+    escriben a disco bloque a bloque:
+    • CSV: cada bloque se serializa y se añade al archivo
+    • Excel: openpyxl en modo write_only (memoria constante)
+    • Parquet: un row group por bloque con pyarrow
+
+    Cada exportación se guarda bajo una clave (filtros + formato), así que
+    varias sesiones con los mismos filtros reutilizan el mismo archivo.
+    Los códigos enteros de fecha (fechas.py) se traducen de nuevo a
+    etiquetas bloque a bloque: la descarga y la vista previa conservan las
+    columnas YearMonth, Month y DayOfWeek ('Monday'...) de siempre.
+═════════════════════════════════════════════════════════════════════════════
+"""
+
+import hashlib
+import os
+import threading
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from almacen import DIRECTORIO_CACHE
+from fechas import NOMBRES_DIA_INGLES, etiquetas_mes
+
+DIRECTORIO_EXPORTACIONES = os.path.join(DIRECTORIO_CACHE, 'exportaciones')
+
+# Filas serializadas por bloque
+TAMANO_BLOQUE_EXPORTACION = 50_000
+
+# Archivos que se conservan en disco (se borran los más antiguos)
+MAX_EXPORTACIONES = 20
+
+# Límite de filas de una hoja de Excel (incluye el encabezado)
+MAX_FILAS_EXCEL = 1_048_576
+
+# Columnas internas que no se exportan (códigos enteros de fechas.py)
+COLUMNAS_INTERNAS = ['DayCode', 'MonthCode']
+
+# Columnas de la descarga, en el orden de siempre
+COLUMNAS_DESCARGA = [
+    'InvoiceNo', 'StockCode', 'Description', 'Quantity', 'InvoiceDate', 'UnitPrice',
+    'CustomerID', 'Country', 'TotalPrice', 'YearMonth', 'Month', 'DayOfWeek',
+]
+
+FORMATOS = {
+    'csv': {'nombre': 'CSV', 'extension': 'csv', 'mime': 'text/csv'},
+    'xlsx': {
+        'nombre': 'Excel',
+        'extension': 'xlsx',
+        'mime': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    },
+    'parquet': {
+        'nombre': 'Parquet',
+        'extension': 'parquet',
+        'mime': 'application/vnd.apache.parquet',
+    },
+}
+
+
+def formato_descarga(df):
+    """
+    Transacciones con las columnas que ve el usuario (descarga y vista previa).
+
+    Los códigos de mes y día de la semana vuelven a ser textos ('AAAA-MM' y
+    el nombre en inglés de Series.dt.day_name(), fechas.NOMBRES_DIA_INGLES)
+    y se quitan las columnas internas. Se aplica a un bloque o a una vista
+    previa, nunca a toda la selección de una vez.
+    """
+    meses = etiquetas_mes(df['MonthCode'].to_numpy()) if 'MonthCode' in df.columns else None
+    df = df.drop(columns=[c for c in COLUMNAS_INTERNAS if c in df.columns])
+    if meses is not None:
+        df['YearMonth'] = meses
+        df['Month'] = meses
+    if 'DayOfWeek' in df.columns and pd.api.types.is_integer_dtype(df['DayOfWeek']):
+        df['DayOfWeek'] = np.asarray(NOMBRES_DIA_INGLES, dtype=object)[df['DayOfWeek'].to_numpy()]
+    return df[[c for c in COLUMNAS_DESCARGA if c in df.columns]
+              + [c for c in df.columns if c not in COLUMNAS_DESCARGA]]
+
+
+def _bloques(df, tamano_bloque, columnas=None):
+    """Trozos consecutivos de df con el formato de descarga (sin copiar df entero)."""
+    for inicio in range(0, len(df), tamano_bloque):
+        bloque = formato_descarga(df.iloc[inicio:inicio + tamano_bloque])
+        yield bloque if columnas is None else bloque[columnas]
+
+
+def _vacio(df, columnas):
+    """DataFrame sin filas con las columnas a exportar (encabezado/esquema)."""
+    vacio = formato_descarga(df.head(0))
+    return vacio if columnas is None else vacio[columnas]
+
+
+def escribir_csv(df, destino, columnas=None, tamano_bloque=TAMANO_BLOQUE_EXPORTACION):
+    """Escribe el CSV por bloques (solo un bloque serializado a la vez)."""
+    with open(destino, 'w', encoding='utf-8', newline='') as f:
+        _vacio(df, columnas).to_csv(f, index=False)
+        for bloque in _bloques(df, tamano_bloque, columnas):
+            bloque.to_csv(f, index=False, header=False)
+
+
+def escribir_xlsx(df, destino, columnas=None, tamano_bloque=TAMANO_BLOQUE_EXPORTACION):
+    """
+    Escribe el Excel con openpyxl en modo write_only.
+
+    Las filas se vuelcan a disco a medida que se añaden, así que la memoria
+    no crece con el número de filas. Lanza ValueError si la selección no
+    cabe en una hoja.
+    """
+    if len(df) + 1 > MAX_FILAS_EXCEL:
+        raise ValueError(
+            f"La selección tiene {len(df):,} filas; Excel admite como máximo "
+            f"{MAX_FILAS_EXCEL - 1:,} por hoja"
+        )
+    from openpyxl import Workbook
+
+    libro = Workbook(write_only=True)
+    hoja = libro.create_sheet('Ventas')
+    hoja.append(list(_vacio(df, columnas).columns))
+    for bloque in _bloques(df, tamano_bloque, columnas):
+        # float32 (UnitPrice) pasaría a Excel como 0.5899999737...: se usa
+        # su representación decimal más corta
+        reales32 = bloque.select_dtypes('float32').columns
+        if len(reales32):
+            bloque = (bloque.astype({c: str for c in reales32})
+                      .astype({c: 'float64' for c in reales32}))
+        for fila in bloque.itertuples(index=False, name=None):
+            hoja.append(fila)
+    libro.save(destino)
+
+
+def escribir_parquet(df, destino, columnas=None, tamano_bloque=TAMANO_BLOQUE_EXPORTACION):
+    """Escribe el Parquet con un row group por bloque."""
+    # Como openpyxl, solo se importa al exportar en este formato
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    escritor = None
+    try:
+        for bloque in _bloques(df, tamano_bloque, columnas):
+            tabla = pa.Table.from_pandas(bloque, preserve_index=False)
+            if escritor is None:
+                escritor = pq.ParquetWriter(str(destino), tabla.schema)
+            escritor.write_table(tabla)
+        if escritor is None:
+            pq.write_table(pa.Table.from_pandas(_vacio(df, columnas), preserve_index=False),
+                           str(destino))
+    finally:
+        if escritor is not None:
+            escritor.close()
+
+
+ESCRITORES = {
+    'csv': escribir_csv,
+    'xlsx': escribir_xlsx,
+    'parquet': escribir_parquet,
+}
+
+
+def exportar(df, formato, clave, directorio=DIRECTORIO_EXPORTACIONES):
+    """
+    Devuelve la ruta del archivo exportado, generándolo si no existe.
+
+    Parámetros:
+    -----------
+    df : pd.DataFrame
+        Transacciones a exportar
+    formato : str
+        'csv', 'xlsx' o 'parquet'
+    clave : hashable
+        Identifica la selección (por ejemplo, la tupla de filtros)
+    directorio : str
+        Carpeta donde se guardan los archivos generados
+
+    Retorna:
+    --------
+    Path
+        Ruta del archivo listo para descargar
+    """
+    directorio = Path(directorio)
+    huella = hashlib.sha256(repr((clave, formato)).encode()).hexdigest()[:16]
+    ruta = directorio / f'{huella}.{FORMATOS[formato]["extension"]}'
+    if ruta.exists():
+        os.utime(ruta)
+        return ruta
+
+    directorio.mkdir(parents=True, exist_ok=True)
+    temporal = ruta.with_name(f'{ruta.name}.{os.getpid()}-{threading.get_ident()}.tmp')
+    try:
+        ESCRITORES[formato](df, temporal)
+        os.replace(temporal, ruta)
+    finally:
+        temporal.unlink(missing_ok=True)
+
+    limpiar_exportaciones(directorio)
+    return ruta
+
+
+def limpiar_exportaciones(directorio=DIRECTORIO_EXPORTACIONES, max_archivos=MAX_EXPORTACIONES):
+    """Borra las exportaciones más antiguas si hay más de max_archivos."""
+    archivos = [r for r in Path(directorio).glob('*') if r.suffix != '.tmp']
+    archivos.sort(key=lambda r: r.stat().st_mtime, reverse=True)
+    for ruta in archivos[max_archivos:]:
+        ruta.unlink(missing_ok=True)
@@ -0,0 +1,79 @@
+"""
+═════════════════════════════════════════════════════════════════════════════
+    CÓDIGOS DE FECHA - DÍA, MES Y DÍA DE LA SEMANA COMO ENTEROS
+
+    Las columnas derivadas de InvoiceDate se guardan como enteros calculados
+    directamente sobre los valores datetime64 (sin crear un texto por fila):
+    • Día: días desde 1970-01-01
+    • Mes: meses desde 1970-01
+    • Día de la semana: 0 = lunes ... 6 = domingo
+
+    Agrupar por enteros es más rápido que agrupar por textos, y las
+    etiquetas legibles ('2011-03', 'Lunes'...) se generan solo al dibujar,
+    para los pocos grupos del resultado.
+═════════════════════════════════════════════════════════════════════════════
+"""
+
+import numpy as np
+import pandas as pd
+
+# El 1970-01-01 fue jueves (3 con lunes = 0)
+DIA_SEMANA_EPOCH = 3
+
+NOMBRES_DIA = ['Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes', 'Sábado', 'Domingo']
+
+# Los de Series.dt.day_name(): la columna DayOfWeek de las descargas
+NOMBRES_DIA_INGLES = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+
+def _datetime64(fechas):
+    return np.asarray(fechas, dtype='datetime64[ns]')
+
+
+def codigo_dia(fechas):
+    """Días desde 1970-01-01 de cada fecha (int32)."""
+    return _datetime64(fechas).astype('datetime64[D]').astype(np.int32)
+
+
+def codigo_mes(fechas):
+    """Meses desde 1970-01 de cada fecha (int16)."""
+    return _datetime64(fechas).astype('datetime64[M]').astype(np.int16)
+
+
+def mes_de_dia(codigos_dia):
+    """Código de mes a partir del código de día."""
+    dias = np.asarray(codigos_dia, dtype=np.int64).astype('datetime64[D]')
+    return dias.astype('datetime64[M]').astype(np.int16)
+
+
+def primer_dia_mes(codigos_mes):
+    """Código de día del primer día de cada mes."""
+    meses = np.asarray(codigos_mes, dtype=np.int64).astype('datetime64[M]')
+    return meses.astype('datetime64[D]').astype(np.int64)
+
+
+def dia_semana(codigos_dia):
+    """Día de la semana (0 = lunes) a partir del código de día."""
+    return ((np.asarray(codigos_dia, dtype=np.int64) + DIA_SEMANA_EPOCH) % 7).astype(np.int8)
+
+
+def limite_dia(fecha):
+    """
+    Primer código de día que empieza en o después de la fecha.
+
+    Sirve para traducir un rango de fechas [inicio, fin) a un rango de
+    códigos de día [limite_dia(inicio), limite_dia(fin)).
+    """
+    ns_dia = 86_400 * 10**9
+    return -(-pd.Timestamp(fecha).value // ns_dia)
+
+
+def etiquetas_mes(codigos_mes):
+    """Texto 'AAAA-MM' de cada código de mes (para ejes y tablas)."""
+    meses = np.asarray(codigos_mes, dtype=np.int64).astype('datetime64[M]')
+    return np.datetime_as_string(meses, unit='M')
+
+
+def fechas_de_dia(codigos_dia):
+    """Fechas (a medianoche) de cada código de día."""
+    return pd.to_datetime(np.asarray(codigos_dia, dtype=np.int64), unit='D')
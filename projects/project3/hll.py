@@ -0,0 +1,289 @@
+"""
+═════════════════════════════════════════════════════════════════════════════
+    HYPERLOGLOG VECTORIZADO - CONTEOS DISTINTOS APROXIMADOS Y FUSIONABLES
+
+    Cada valor se convierte en un hash de 64 bits. Los primeros p bits eligen
+    un registro y el resto aporta "rho" (posición del primer bit a 1). Un
+    sketch guarda el máximo rho por registro; dos sketches se fusionan con
+    un máximo registro a registro, así que los conteos de varias particiones
+    (días, países...) se combinan sin volver a leer los datos.
+
+    Los sketches por partición se guardan en forma dispersa: solo los
+    registros que tienen algún valor, ordenados por partición. Al consultar,
+    las entradas elegidas se vuelcan con np.maximum.at en un vector denso
+    (sin ordenar); agrupados() precalcula vectores densos por grupos de
+    particiones (p. ej. por día) para las consultas más frecuentes.
+═════════════════════════════════════════════════════════════════════════════
+"""
+
+import math
+
+import numpy as np
+import pandas as pd
+
+# 2^12 = 4096 registros → error estándar ≈ 1.04 / sqrt(4096) ≈ 1.6%
+PRECISION = 12
+PRECISION_MIN, PRECISION_MAX = 4, 18
+
+
+def precision_para_error(error):
+    """
+    Menor precisión cuyo error estándar (1.04 / sqrt(2^p)) no supera `error`.
+
+    Cada bit más duplica la memoria de los sketches y divide el error
+    entre sqrt(2).
+    """
+    p = math.ceil(2 * math.log2(1.04 / error))
+    return min(max(p, PRECISION_MIN), PRECISION_MAX)
+
+
+def error_estandar(p=PRECISION):
+    """Error relativo estándar de un sketch de precisión p."""
+    return 1.04 / math.sqrt(1 << p)
+
+
+def hash_valores(valores):
+    """
+    Hash determinista de 64 bits de cada valor (estable entre procesos).
+
+    En columnas categóricas se hashea cada categoría una sola vez y se
+    reparte por sus códigos; el resultado es el mismo que hashear los textos.
+    Los textos que son un entero ('536365') se hashean como ese entero:
+    InvoiceNo es int32 en unos archivos y category (con letras) en otros, y
+    el mismo código debe caer en el mismo registro para poder fusionar.
+    """
+    if isinstance(getattr(valores, 'dtype', None), pd.CategoricalDtype):
+        categorico = pd.Categorical(valores)
+        hashes = _hash_enteros_o_textos(categorico.categories)
+        # El código -1 (valor faltante) cae en el último elemento: hash de None
+        hashes = np.append(hashes, pd.util.hash_array(np.array([None], dtype=object)))
+        return hashes[categorico.codes]
+    valores = np.asarray(valores)
+    if np.issubdtype(valores.dtype, np.integer):
+        valores = valores.astype(np.int64)
+    return pd.util.hash_array(valores)
+
+
+def _hash_enteros_o_textos(categorias):
+    """Hash de cada categoría; los enteros (y sus textos canónicos) como int64."""
+    if pd.api.types.is_integer_dtype(categorias.dtype):
+        return pd.util.hash_array(np.asarray(categorias, dtype=np.int64))
+    textos = np.asarray(categorias, dtype=object)
+    hashes = pd.util.hash_array(textos)
+    if not len(textos) or not pd.api.types.is_string_dtype(categorias.dtype):
+        return hashes
+
+    # Caracteres como una matriz de código Unicode (0 = relleno a la derecha).
+    # Solo la forma canónica es un entero: '007' o '+7' no son el 7
+    unicode = textos.astype(str)
+    caracteres = unicode.view(np.uint32).reshape(len(unicode), -1)
+    digitos = caracteres.astype(np.int64) - ord('0')
+    largo = (caracteres != 0).sum(axis=1)
+    enteros = (((digitos >= 0) & (digitos <= 9)) | (caracteres == 0)).all(axis=1)
+    enteros &= (largo >= 1) & (largo <= 18) & ((largo == 1) | (digitos[:, 0] != 0))
+    if enteros.any():
+        valores = np.zeros(int(enteros.sum()), dtype=np.int64)
+        digitos, largo = digitos[enteros], largo[enteros]
+        for j in range(int(largo.max())):
+            activo = j < largo
+            valores[activo] = valores[activo] * 10 + digitos[activo, j]
+        hashes[enteros] = pd.util.hash_array(valores)
+    return hashes
+
+
+def _longitud_bits(x):
+    """Número de bits significativos de cada uint64 (0 para el valor 0)."""
+    x = x.copy()
+    n = np.zeros(len(x), dtype=np.uint8)
+    for s in (32, 16, 8, 4, 2, 1):
+        alto = x >= (np.uint64(1) << np.uint64(s))
+        x[alto] >>= np.uint64(s)
+        n[alto] += s
+    n += (x > 0).astype(np.uint8)
+    return n
+
+
+def registros_y_rho(hashes, p=PRECISION):
+    """
+    Separa cada hash en (registro, rho).
+
+    Retorna:
+    --------
+    tuple(np.ndarray, np.ndarray)
+        Índice de registro (uint32) y rho (uint8) de cada hash
+    """
+    resto_bits = np.uint64(64 - p)
+    registro = (hashes >> resto_bits).astype(np.uint32)
+    resto = hashes & ((np.uint64(1) << resto_bits) - np.uint64(1))
+    rho = (64 - p) - _longitud_bits(resto) + 1
+    return registro, rho.astype(np.uint8)
+
+
+def estimar(registros, p=PRECISION):
+    """Estimación HyperLogLog a partir de un vector denso de registros."""
+    if registros.ndim > 1:
+        registros = registros.max(axis=0) if len(registros) else np.zeros(1 << p, dtype=np.uint8)
+    m = 1 << p
+    alpha = 0.7213 / (1 + 1.079 / m)
+    estimacion = alpha * m * m / np.sum(np.ldexp(1.0, -registros.astype(np.int64)))
+
+    # Corrección para cardinalidades pequeñas (linear counting)
+    ceros = int(np.count_nonzero(registros == 0))
+    if estimacion <= 2.5 * m and ceros > 0:
+        estimacion = m * np.log(m / ceros)
+    return float(estimacion)
+
+
+def _ultimo_por_clave(clave, rho):
+    """Para cada clave distinta se queda con el rho máximo."""
+    orden = np.lexsort((rho, clave))
+    clave, rho = clave[orden], rho[orden]
+    ultimo = np.ones(len(clave), dtype=bool)
+    ultimo[:-1] = clave[1:] != clave[:-1]
+    return clave[ultimo], rho[ultimo]
+
+
+def rangos(inicio, fin):
+    """Concatena np.arange(inicio[i], fin[i]) para todos los i, sin bucles."""
+    largos = fin - inicio
+    total = int(largos.sum())
+    if total == 0:
+        return np.empty(0, dtype=np.int64)
+    desplazamiento = np.repeat(inicio - np.cumsum(largos) + largos, largos)
+    return np.arange(total, dtype=np.int64) + desplazamiento
+
+
+class SketchesParticionados:
+    """
+    Un sketch HyperLogLog disperso por partición.
+
+    Se construye con SketchesParticionados.desde_valores(...). El constructor
+    recibe ternas (partición, registro, rho) ya calculadas, que pueden estar
+    repetidas: para cada (partición, registro) se conserva el rho máximo.
+
+    Parámetros:
+    -----------
+    particion : np.ndarray
+        Id de partición (entero de 0 a n_particiones - 1) de cada terna
+    registro, rho : np.ndarray
+        Registro y rho de cada terna
+    n_particiones : int
+        Número total de particiones
+    p : int
+        Precisión (bits de registro)
+    """
+
+    def __init__(self, particion, registro, rho, n_particiones, p=PRECISION):
+        self.p = p
+        clave = np.asarray(particion, dtype=np.int64) * (1 << p) + registro
+        clave, self.rho = _ultimo_por_clave(clave, rho)
+
+        self.registro = (clave & ((1 << p) - 1)).astype(np.uint32)
+        particion_ordenada = clave >> p
+        self.offsets = np.searchsorted(particion_ordenada, np.arange(n_particiones + 1))
+
+    @classmethod
+    def desde_valores(cls, particion, valores, n_particiones, p=PRECISION):
+        """
+        Construye los sketches a partir de los valores de cada fila.
+
+        Parámetros:
+        -----------
+        particion : np.ndarray
+            Id de partición de cada fila
+        valores : array-like
+            Valor a contar (factura, cliente...) de cada fila
+        """
+        registro, rho = registros_y_rho(hash_valores(valores), p)
+        return cls(particion, registro, rho, n_particiones, p)
+
+    def entradas(self):
+        """Entradas (Particion, Registro, Rho) como DataFrame, para guardarlas."""
+        return pd.DataFrame({
+            'Particion': self.particiones().astype(np.int32),
+            'Registro': self.registro,
+            'Rho': self.rho,
+        })
+
+    @classmethod
+    def desde_entradas(cls, entradas, n_particiones, p=PRECISION):
+        """Sketches a partir de entradas(): ya ordenadas y sin repetir."""
+        sketches = cls.__new__(cls)
+        sketches.p = p
+        sketches.registro = entradas['Registro'].to_numpy()
+        sketches.rho = entradas['Rho'].to_numpy()
+        conteos = np.bincount(entradas['Particion'].to_numpy(), minlength=n_particiones)
+        sketches.offsets = np.concatenate([[0], np.cumsum(conteos)])
+        return sketches
+
+    @property
+    def n_particiones(self):
+        return len(self.offsets) - 1
+
+    def particiones(self):
+        """Id de partición de cada registro guardado."""
+        return np.repeat(np.arange(self.n_particiones), np.diff(self.offsets))
+
+    def fusionar_con(self, otro, mapa_propio, mapa_otro, n_particiones):
+        """
+        Combina dos conjuntos de sketches en un nuevo espacio de particiones.
+
+        Parámetros:
+        -----------
+        otro : SketchesParticionados
+            Sketches a incorporar (misma precisión)
+        mapa_propio, mapa_otro : np.ndarray
+            Nueva partición de cada partición de self y de otro
+        n_particiones : int
+            Número de particiones del resultado
+        """
+        if otro.p != self.p:
+            raise ValueError("No se pueden fusionar sketches de distinta precisión")
+        return SketchesParticionados(
+            np.concatenate([mapa_propio[self.particiones()], mapa_otro[otro.particiones()]]),
+            np.concatenate([self.registro, otro.registro]),
+            np.concatenate([self.rho, otro.rho]),
+            n_particiones,
+            self.p,
+        )
+
+    def fusionar(self, particiones):
+        """
+        Vector denso de registros resultante de fusionar las particiones.
+
+        np.maximum.at vuelca las entradas sin ordenarlas: el costo es lineal
+        en el número de entradas elegidas.
+        """
+        particiones = np.asarray(particiones, dtype=np.int64)
+        filas = rangos(self.offsets[particiones], self.offsets[particiones + 1])
+
+        densos = np.zeros(1 << self.p, dtype=np.uint8)
+        np.maximum.at(densos, self.registro[filas], self.rho[filas])
+        return densos
+
+    def agrupados(self, grupo, n_grupos):
+        """
+        Un vector denso de registros por grupo de particiones.
+
+        Parámetros:
+        -----------
+        grupo : np.ndarray
+            Grupo (0 a n_grupos - 1) de cada partición
+        n_grupos : int
+
+        Retorna:
+        --------
+        np.ndarray
+            Matriz uint8 (n_grupos, 2^p). Contar un conjunto de grupos es el
+            máximo de sus filas: el costo depende del número de grupos, no
+            de las entradas
+        """
+        densos = np.zeros((n_grupos, 1 << self.p), dtype=np.uint8)
+        np.maximum.at(densos, (np.asarray(grupo)[self.particiones()], self.registro), self.rho)
+        return densos
+
+    def contar(self, particiones):
+        """Número aproximado de valores distintos en las particiones dadas."""
+        if len(particiones) == 0:
+            return 0
+        return round(estimar(self.fusionar(particiones), self.p))
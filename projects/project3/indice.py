@@ -0,0 +1,169 @@
+"""
+═════════════════════════════════════════════════════════════════════════════
+    ÍNDICE DE FECHAS Y PAÍSES - FILTRADO POR BÚSQUEDA BINARIA
+
+    El DataFrame se guarda ordenado por InvoiceDate (ver almacen.py), así que
+    un rango de fechas es un intervalo contiguo de filas que se localiza con
+    searchsorted en O(log n). Para cada país se guardan las posiciones de sus
+    filas (también ordenadas por fecha), de modo que el filtro por país es
+    una búsqueda en ese arreglo y no una máscara sobre todo el dataset.
+
+    El costo de filtrar depende del tamaño del resultado, no del dataset.
+═════════════════════════════════════════════════════════════════════════════
+"""
+
+import numpy as np
+import pandas as pd
+
+from almacen import DIRECTORIO_CACHE, cargar_dataset, cargar_derivado, escribir_arrow, leer_arrow
+
+
+class IndiceVentas:
+    """
+    Índice de filas por fecha y por país.
+
+    Parámetros:
+    -----------
+    df : pd.DataFrame
+        DataFrame limpio, ordenado por InvoiceDate
+    """
+
+    def __init__(self, df):
+        self.fechas = df['InvoiceDate'].to_numpy()
+        if len(self.fechas) and not (self.fechas[1:] >= self.fechas[:-1]).all():
+            raise ValueError("El DataFrame debe estar ordenado por InvoiceDate")
+
+        self.cantidades = df['Quantity'].to_numpy()
+
+        # Posiciones de cada país: orden estable por código = orden por fecha
+        codigos = df['Country'].cat.codes.to_numpy()
+        orden = np.argsort(codigos, kind='stable')
+        limites = np.searchsorted(codigos[orden], np.arange(len(df['Country'].cat.categories) + 1))
+        self.paises = {
+            pais: orden[limites[i]:limites[i + 1]]
+            for i, pais in enumerate(df['Country'].cat.categories)
+        }
+
+    def guardar(self, ruta):
+        """Guarda las posiciones de cada país como archivo Arrow (Fila, Country)."""
+        paises = list(self.paises)
+        filas = [self.paises[pais] for pais in paises]
+        codigos = np.repeat(np.arange(len(paises)), [len(f) for f in filas])
+        escribir_arrow(pd.DataFrame({
+            'Fila': np.concatenate(filas) if filas else np.empty(0, dtype=np.intp),
+            'Country': pd.Categorical.from_codes(codigos, paises),
+        }), ruta)
+
+    @classmethod
+    def cargar(cls, ruta, df):
+        """
+        Abre un índice guardado con guardar() para el mismo DataFrame.
+
+        Fechas y cantidades son las columnas de df; las posiciones de cada
+        país se abren con memory-map, sin volver a ordenarlas.
+        """
+        tabla = leer_arrow(ruta)
+        indice = cls.__new__(cls)
+        indice.fechas = df['InvoiceDate'].to_numpy()
+        indice.cantidades = df['Quantity'].to_numpy()
+        filas = tabla['Fila'].to_numpy()
+        categorias = tabla['Country'].cat.categories
+        limites = np.searchsorted(tabla['Country'].cat.codes.to_numpy(), np.arange(len(categorias) + 1))
+        indice.paises = {pais: filas[limites[i]:limites[i + 1]] for i, pais in enumerate(categorias)}
+        return indice
+
+    def ampliar(self, df_nuevo):
+        """
+        Índice de las filas actuales seguidas de las de df_nuevo.
+
+        Solo se indexan las filas nuevas; las posiciones de cada país se
+        desplazan y se añaden a las existentes. Requiere que df_nuevo no
+        tenga fechas anteriores a la última ya indexada (las filas nuevas
+        van al final del DataFrame). El índice actual no se modifica.
+
+        Retorna:
+        --------
+        IndiceVentas
+        """
+        nuevo = IndiceVentas(df_nuevo)
+        if len(self.fechas) and len(nuevo.fechas) and nuevo.fechas[0] < self.fechas[-1]:
+            raise ValueError("Las filas nuevas deben ser posteriores a las ya indexadas")
+
+        desplazamiento = len(self.fechas)
+        ampliado = IndiceVentas.__new__(IndiceVentas)
+        ampliado.fechas = np.concatenate([self.fechas, nuevo.fechas])
+        ampliado.cantidades = np.concatenate([self.cantidades, nuevo.cantidades])
+        ampliado.paises = dict(self.paises)
+        for pais, filas in nuevo.paises.items():
+            filas = filas + desplazamiento
+            previas = ampliado.paises.get(pais)
+            ampliado.paises[pais] = filas if previas is None else np.concatenate([previas, filas])
+        return ampliado
+
+    def posiciones(self, pais, inicio, fin, cantidad_min=1):
+        """
+        Posiciones de las filas que cumplen los filtros.
+
+        Parámetros:
+        -----------
+        pais : str or None
+            País a filtrar (None = todos)
+        inicio, fin : pd.Timestamp
+            Rango de fechas [inicio, fin)
+        cantidad_min : int
+            Cantidad mínima por transacción
+
+        Retorna:
+        --------
+        slice or np.ndarray
+            Un slice si no hace falta filtrar más que por fecha, o un arreglo
+            de posiciones en otro caso
+        """
+        desde, hasta = np.searchsorted(
+            self.fechas, np.array([inicio, fin], dtype=self.fechas.dtype)
+        )
+
+        if pais is None:
+            filas = slice(desde, hasta)
+            # Todas las cantidades son > 0 tras la limpieza: con 1 no se filtra
+            if cantidad_min <= 1:
+                return filas
+            filas = np.arange(desde, hasta)
+        else:
+            filas_pais = self.paises.get(pais, np.empty(0, dtype=np.intp))
+            a, b = np.searchsorted(filas_pais, [desde, hasta])
+            filas = filas_pais[a:b]
+
+        if cantidad_min > 1:
+            filas = filas[self.cantidades[filas] >= cantidad_min]
+        return filas
+
+    def filtrar(self, df, pais, inicio, fin, cantidad_min=1):
+        """Aplica los filtros del dashboard y devuelve el DataFrame filtrado."""
+        filas = self.posiciones(pais, inicio, fin, cantidad_min)
+        if isinstance(filas, slice):
+            return df.iloc[filas]
+        return df.take(filas)
+
+
+def cargar_indice(filepath, directorio=DIRECTORIO_CACHE, df=None):
+    """
+    Índice del CSV, reutilizando el guardado si sigue vigente.
+
+    Se guarda junto al caché Arrow del CSV (<nombre>.indice.arrow) y se
+    invalida con el mismo SHA-256 que el caché de transacciones
+    (almacen.cargar_derivado).
+
+    Parámetros:
+    -----------
+    filepath : str
+        Ruta al CSV de origen
+    directorio : str
+        Carpeta del caché
+    df : pd.DataFrame, opcional
+        Transacciones ya cargadas con cargar_dataset(filepath, directorio)
+    """
+    if df is None:
+        df = cargar_dataset(filepath, directorio)
+    return cargar_derivado(filepath, 'indice', lambda: IndiceVentas(df), IndiceVentas.guardar,
+                           lambda ruta: IndiceVentas.cargar(ruta, df), directorio, extension='.arrow')
@@ -0,0 +1,310 @@
+"""
+═════════════════════════════════════════════════════════════════════════════
+    INGESTA INCREMENTAL - ARCHIVOS SEMANALES EN UNA CARPETA VIGILADA
+
+    En lugar de reemplazar data.csv y recargar todo, los archivos nuevos
+    (p. ej. ventas_semana_*.csv) se dejan en una carpeta. En cada
+    sincronización:
+    • Se detectan archivos nuevos, modificados o eliminados
+    • Solo esos archivos se parsean y limpian
+    • Cada archivo se guarda como una parte Arrow en el almacén columnar
+    • El cubo (agregados + sketches HLL) y las sumas parciales del top-K
+      se fusionan con los de las filas nuevas, sin volver a agregar las
+      transacciones anteriores
+
+    Si un archivo ya ingerido cambia o desaparece, sus filas no se pueden
+    "restar" de los sketches HLL: en ese caso se reconstruye el estado a
+    partir de las partes ya guardadas (sin re-parsear ningún CSV).
+
+    Un archivo que no se puede leer o que no tiene las columnas del dataset
+    (p. ej. un export de otro proyecto) queda en cuarentena: se ignora, se
+    anota en el manifiesto con su error y no se vuelve a intentar hasta que
+    cambie.
+═════════════════════════════════════════════════════════════════════════════
+"""
+
+import threading
+from pathlib import Path
+
+import pandas as pd
+
+from almacen import (
+    DIRECTORIO_CACHE,
+    TAMANO_BLOQUE,
+    VERSION_ESQUEMA,
+    concatenar,
+    escribir_arrow,
+    escribir_manifiesto,
+    hash_archivo,
+    huella_archivo,
+    leer_arrow,
+    leer_csv,
+    leer_manifiesto,
+    leer_por_bloques,
+    limpiar_datos,
+)
+from cubo import CuboVentas
+from indice import IndiceVentas
+from rfm import FeaturesRFM
+from topk import TopK
+
+# Carpeta vigilada por defecto (junto a dashboard.py)
+DIRECTORIO_ENTRADA = 'datos'
+
+# Errores de lectura o limpieza que ponen un archivo en cuarentena
+# (ParserError y UnicodeDecodeError son ValueError; KeyError = falta una columna)
+ERRORES_INGESTA = (OSError, ValueError, KeyError)
+
+
+# Estructuras del estado en memoria y cómo se calculan a partir del DataFrame
+CONSTRUCTORES = {
+    'cubo': CuboVentas.desde_transacciones,
+    'indice': IndiceVentas,
+    'top_productos': lambda df: TopK.desde_transacciones(df, 'Description'),
+    'top_clientes': lambda df: TopK.desde_transacciones(df, 'CustomerID'),
+    'rfm': FeaturesRFM.desde_transacciones,
+}
+
+
+def construir_estado(df, **estructuras):
+    """
+    Estructuras que usa el dashboard a partir del DataFrame completo.
+
+    Las que ya se tienen (por ejemplo, leídas de disco con cubo.cargar_cubo,
+    topk.cargar_topk o rfm.cargar_rfm) se pasan por nombre y se reutilizan
+    en lugar de calcularlas.
+    """
+    estado = {'df': df}
+    for nombre, construir in CONSTRUCTORES.items():
+        estado[nombre] = estructuras[nombre] if estructuras.get(nombre) is not None else construir(df)
+    return estado
+
+
+class AlmacenIncremental:
+    """
+    Almacén columnar alimentado por los CSV de una carpeta.
+
+    Parámetros:
+    -----------
+    directorio : str
+        Carpeta vigilada con los archivos CSV
+    directorio_cache : str
+        Carpeta donde se guardan las partes Arrow y el manifiesto
+    """
+
+    def __init__(self, directorio=DIRECTORIO_ENTRADA, directorio_cache=DIRECTORIO_CACHE):
+        self.directorio = Path(directorio)
+        self.ruta_partes = Path(directorio_cache) / 'incremental' / self.directorio.name
+        self.ruta_manifiesto = self.ruta_partes / 'manifiesto.json'
+        self.ruta_rfm = self.ruta_partes / 'rfm.arrow'
+        self.version = 0
+        self._estado = None
+        self._lock = threading.Lock()
+
+        manifiesto = leer_manifiesto(self.ruta_manifiesto)
+        if manifiesto is None or manifiesto.get('version') != VERSION_ESQUEMA:
+            manifiesto = {'version': VERSION_ESQUEMA, 'archivos': {}}
+        manifiesto.setdefault('cuarentena', {})
+        self._manifiesto = manifiesto
+
+        self.sincronizar()
+
+    def estado(self):
+        """
+        Estado actual: {'df', 'cubo', 'indice'} o None si no hay datos.
+
+        Se reemplaza entero en cada cambio, así que las sesiones que ya lo
+        tienen siguen trabajando con una versión coherente.
+        """
+        return self._estado
+
+    def cuarentena(self):
+        """Archivos ignorados por no poder ingerirse: {nombre: mensaje de error}."""
+        return {nombre: datos['error'] for nombre, datos in self._manifiesto['cuarentena'].items()}
+
+    # ─────────────────────────────────────────────────────────────────────────
+    # Detección de cambios
+    # ─────────────────────────────────────────────────────────────────────────
+
+    def _ruta_parte(self, nombre):
+        return self.ruta_partes / (Path(nombre).stem + '.arrow')
+
+    def _ingerir(self, ruta, huella):
+        """
+        Parsea, limpia y guarda un archivo como parte Arrow.
+
+        Lanza una de ERRORES_INGESTA si el archivo no se puede leer o no
+        tiene las columnas del dataset; entonces no se escribe nada.
+        """
+        df = concatenar(leer_por_bloques(ruta))
+        if df is None:
+            df = limpiar_datos(leer_csv(ruta))
+        df = _facturas_como_texto(df)
+        escribir_arrow(df, self._ruta_parte(ruta.name))
+        self._manifiesto['archivos'][ruta.name] = {
+            'huella': huella,
+            'sha256': hash_archivo(ruta),
+            'filas': len(df),
+        }
+
+    def detectar_cambios(self):
+        """
+        Compara la carpeta con el manifiesto e ingiere lo que haya cambiado.
+
+        Retorna:
+        --------
+        dict
+            Listas de archivos 'nuevos', 'modificados', 'eliminados' y
+            'cuarentena' (los que fallaron en esta sincronización). Un
+            archivo ya ingerido que ahora falla cuenta también como eliminado
+        """
+        archivos = self._manifiesto['archivos']
+        cuarentena = self._manifiesto['cuarentena']
+        cambios = {'nuevos': [], 'modificados': [], 'eliminados': [], 'cuarentena': []}
+
+        presentes = sorted(self.directorio.glob('*.csv')) if self.directorio.is_dir() else []
+        for ruta in presentes:
+            huella = huella_archivo(ruta)
+            previo = archivos.get(ruta.name)
+
+            if previo is not None and self._ruta_parte(ruta.name).exists():
+                if previo['huella'] == huella:
+                    continue
+                if previo['sha256'] == hash_archivo(ruta):
+                    previo['huella'] = huella
+                    continue
+            elif ruta.name in cuarentena and cuarentena[ruta.name]['huella'] == huella:
+                continue
+
+            try:
+                self._ingerir(ruta, huella)
+            except ERRORES_INGESTA as e:
+                cuarentena[ruta.name] = {'huella': huella, 'error': _mensaje_error(e)}
+                cambios['cuarentena'].append(ruta.name)
+                if previo is not None:
+                    del archivos[ruta.name]
+                    self._ruta_parte(ruta.name).unlink(missing_ok=True)
+                    cambios['eliminados'].append(ruta.name)
+                continue
+            cuarentena.pop(ruta.name, None)
+            cambios['nuevos' if previo is None else 'modificados'].append(ruta.name)
+
+        nombres = {ruta.name for ruta in presentes}
+        for nombre in sorted(set(archivos) - nombres):
+            del archivos[nombre]
+            self._ruta_parte(nombre).unlink(missing_ok=True)
+            cambios['eliminados'].append(nombre)
+        retirados = set(cuarentena) - nombres
+        for nombre in retirados:
+            del cuarentena[nombre]
+
+        if any(cambios.values()) or retirados:
+            escribir_manifiesto(self.ruta_manifiesto, self._manifiesto)
+        return cambios
+
+    # ─────────────────────────────────────────────────────────────────────────
+    # Sincronización
+    # ─────────────────────────────────────────────────────────────────────────
+
+    def sincronizar(self):
+        """
+        Incorpora los cambios de la carpeta al estado en memoria.
+
+        Retorna:
+        --------
+        dict
+            Los cambios detectados (ver detectar_cambios)
+        """
+        with self._lock:
+            cambios = self.detectar_cambios()
+            primera_vez = self._estado is None and self.version == 0
+
+            if primera_vez or cambios['modificados'] or cambios['eliminados']:
+                df = concatenar([leer_arrow(self._ruta_parte(nombre))
+                                 for nombre in sorted(self._manifiesto['archivos'])])
+                self._estado = None if df is None or df.empty else construir_estado(df)
+            elif cambios['nuevos']:
+                self._estado = self._agregar(cambios['nuevos'])
+            else:
+                return cambios
+
+            # Features RFM al día para otros procesos (segmentación, project4)
+            if self._estado is not None:
+                self._estado['rfm'].guardar(self.ruta_rfm)
+            else:
+                self.ruta_rfm.unlink(missing_ok=True)
+            self.version += 1
+            return cambios
+
+    def _agregar(self, nombres):
+        """
+        Añade partes nuevas fusionando su cubo con el existente.
+
+        Si las filas nuevas son posteriores a las que ya había (el caso
+        habitual: la semana siguiente), el índice se amplía solo con ellas;
+        si no, concatenar() reordena el DataFrame y el índice se reconstruye.
+        """
+        df_nuevo = concatenar([leer_arrow(self._ruta_parte(nombre)) for nombre in nombres])
+        if df_nuevo is None or df_nuevo.empty:
+            return self._estado
+        if self._estado is None:
+            return construir_estado(df_nuevo)
+
+        anterior = self._estado['df']
+        df = concatenar([anterior, df_nuevo])
+        if anterior.empty or df_nuevo['InvoiceDate'].iloc[0] >= anterior['InvoiceDate'].iloc[-1]:
+            indice = self._estado['indice'].ampliar(df_nuevo)
+        else:
+            indice = IndiceVentas(df)
+        return {
+            'df': df,
+            'cubo': self._estado['cubo'].fusionar(CuboVentas.desde_transacciones(df_nuevo)),
+            'indice': indice,
+            'top_productos': self._estado['top_productos'].fusionar(
+                TopK.desde_transacciones(df_nuevo, 'Description')),
+            'top_clientes': self._estado['top_clientes'].fusionar(
+                TopK.desde_transacciones(df_nuevo, 'CustomerID')),
+            'rfm': self._estado['rfm'].actualizar(df_nuevo),
+        }
+
+
+def _facturas_como_texto(df):
+    """
+    InvoiceNo como category de texto en todas las partes.
+
+    aplicar_esquema lo deja en int32 si el archivo no tiene facturas con
+    letras (abonos 'C...'): una semana sería int32 y otra category, y el
+    mismo número cambiaría de tipo entre partes, en las features RFM y en
+    los sketches. Con un solo tipo las partes se unen sin conversiones.
+    """
+    if isinstance(df['InvoiceNo'].dtype, pd.CategoricalDtype):
+        return df
+    return df.assign(InvoiceNo=df['InvoiceNo'].astype(str).astype('category'))
+
+
+def _mensaje_error(error):
+    """Texto breve del error de ingesta para el manifiesto y el dashboard."""
+    if isinstance(error, KeyError):
+        return f"Falta la columna {error} (¿es un archivo de transacciones?)"
+    return f"{type(error).__name__}: {error}"
+
+
+def cubo_por_bloques(filepath, tamano_bloque=TAMANO_BLOQUE, progreso=None):
+    """
+    Construye el cubo de un CSV sin cargarlo entero en memoria.
+
+    Cada bloque limpio se agrega y se fusiona con el cubo acumulado, así
+    que la memoria máxima depende del tamaño del bloque y del cubo, no del
+    número de filas. Útil para procesos batch que solo necesitan agregados.
+
+    Retorna:
+    --------
+    CuboVentas or None
+    """
+    cubo = None
+    for bloque in leer_por_bloques(filepath, tamano_bloque, progreso):
+        if bloque.empty:
+            continue
+        parcial = CuboVentas.desde_transacciones(bloque)
+        cubo = parcial if cubo is None else cubo.fusionar(parcial)
+    return cubo
@@ -0,0 +1,307 @@
+"""
+═════════════════════════════════════════════════════════════════════════════
+    INSTRUMENTACIÓN - TIEMPOS DE CADA EJECUCIÓN DEL DASHBOARD
+
+    Mide en qué se va el tiempo de cada rerun de dashboard.py:
+    • marca(): tiempo de cada sección numerada (cada marca cierra la
+      anterior, así no hace falta indentar el script)
+    • paso(): tiempo de una operación dentro de una sección (un filtro,
+      una agregación, la serialización de una figura Plotly...)
+    • Aciertos y fallos de las cachés (st.cache_resource y la caché de KPIs)
+    • Filas y bytes de los DataFrames de la ejecución
+    • Perfil opcional de una sola ejecución con cProfile o pyinstrument
+
+    Cada ejecución se acumula en un RegistroMetricas compartido que se
+    exporta con el formato de texto de Prometheus, y puede emitirse como
+    una línea JSON por ejecución con logging.
+═════════════════════════════════════════════════════════════════════════════
+"""
+
+import cProfile
+import importlib.util
+import io
+import json
+import logging
+import marshal
+import os
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+import pandas as pd
+
+logger = logging.getLogger('dashboard.rendimiento')
+
+# Funciones del perfil de cProfile que se muestran (por tiempo acumulado)
+FILAS_PERFIL = 30
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+# 1. PERFILADORES (UNA SOLA EJECUCIÓN)
+# ═════════════════════════════════════════════════════════════════════════════
+
+def perfiladores_disponibles():
+    """cProfile siempre; pyinstrument si está instalado."""
+    return ['cProfile'] + (['pyinstrument'] if importlib.util.find_spec('pyinstrument') else [])
+
+
+class _PerfilCProfile:
+    """cProfile del hilo de la ejecución; resultado en texto (pstats) y .prof."""
+
+    def __init__(self):
+        self.perfil = cProfile.Profile()
+        self.perfil.enable()
+
+    def detener(self):
+        self.perfil.disable()
+        texto = io.StringIO()
+        pstats.Stats(self.perfil, stream=texto).sort_stats('cumulative').print_stats(FILAS_PERFIL)
+        self.perfil.create_stats()
+        return {
+            'perfilador': 'cProfile',
+            'texto': texto.getvalue(),
+            # Mismo contenido que Profile.dump_stats (se abre con snakeviz o pstats)
+            'archivo': marshal.dumps(self.perfil.stats),
+            'nombre_archivo': 'perfil.prof',
+            'mime': 'application/octet-stream',
+        }
+
+
+class _PerfilPyinstrument:
+    """Perfil por muestreo de pyinstrument; resultado en texto y HTML."""
+
+    def __init__(self):
+        from pyinstrument import Profiler
+        self.perfil = Profiler()
+        self.perfil.start()
+
+    def detener(self):
+        self.perfil.stop()
+        return {
+            'perfilador': 'pyinstrument',
+            'texto': self.perfil.output_text(),
+            'archivo': self.perfil.output_html().encode('utf-8'),
+            'nombre_archivo': 'perfil.html',
+            'mime': 'text/html',
+        }
+
+
+PERFILADORES = {'cProfile': _PerfilCProfile, 'pyinstrument': _PerfilPyinstrument}
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+# 2. MEDICIONES DE UNA EJECUCIÓN
+# ═════════════════════════════════════════════════════════════════════════════
+
+class Ejecucion:
+    """
+    Tiempos, cachés y tamaños de una ejecución del script.
+
+    Parámetros:
+    -----------
+    perfilador : str, opcional
+        'cProfile' o 'pyinstrument' para perfilar esta ejecución
+    """
+
+    def __init__(self, perfilador=None):
+        self.fecha = datetime.now().isoformat(timespec='seconds')
+        self.inicio = time.perf_counter()
+        self.secciones = []
+        self.pasos = []
+        self.caches = []
+        self.tamanos = {}
+        self.total = None
+        self.perfil = None
+        self._seccion = None
+        self._calculados = set()
+        self._perfilador = None if perfilador is None else PERFILADORES[perfilador]()
+
+    def marca(self, nombre):
+        """Cierra la sección en curso y empieza `nombre`."""
+        ahora = time.perf_counter()
+        if self._seccion is not None:
+            self.secciones.append({'Sección': self._seccion[0], 'Segundos': ahora - self._seccion[1]})
+        self._seccion = None if nombre is None else (nombre, ahora)
+
+    @contextmanager
+    def paso(self, nombre):
+        """Mide una operación dentro de la sección en curso."""
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.pasos.append({
+                'Sección': None if self._seccion is None else self._seccion[0],
+                'Paso': nombre,
+                'Segundos': time.perf_counter() - inicio,
+            })
+
+    def registrar_calculo(self, nombre):
+        """Se llama dentro de una función con st.cache_resource: hubo fallo."""
+        self._calculados.add(nombre)
+
+    def recurso(self, nombre, funcion, *args):
+        """
+        Llama a una función con st.cache_resource y anota si acertó la caché.
+
+        La función debe llamar a registrar_calculo(nombre) en su cuerpo, que
+        solo se ejecuta cuando el resultado no estaba en la caché.
+        """
+        self._calculados.discard(nombre)
+        with self.paso(nombre):
+            valor = funcion(*args)
+        self.caches.append({'Caché': nombre, 'Acierto': nombre not in self._calculados})
+        return valor
+
+    def consultar_cache(self, nombre, cache, clave, calcular):
+        """CacheLRU.obtener anotando si el resultado ya estaba guardado."""
+        calculado = []
+
+        def calcular_y_anotar():
+            calculado.append(True)
+            return calcular()
+
+        with self.paso(nombre):
+            valor = cache.obtener(clave, calcular_y_anotar)
+        self.caches.append({'Caché': nombre, 'Acierto': not calculado})
+        return valor
+
+    def tamano(self, nombre, datos):
+        """Anota filas y bytes (sin contar objetos Python) de un DataFrame o Series."""
+        if datos is not None:
+            self.tamanos[nombre] = {'Filas': len(datos), 'Bytes': int(datos.memory_usage(index=True).sum())
+                                    if isinstance(datos, pd.DataFrame) else int(datos.memory_usage(index=True))}
+
+    def terminar(self):
+        """Cierra la última sección y detiene el perfil (solo la primera vez)."""
+        if self.total is not None:
+            return self
+        self.marca(None)
+        self.total = time.perf_counter() - self.inicio
+        if self._perfilador is not None:
+            self.perfil, self._perfilador = self._perfilador.detener(), None
+        return self
+
+    def tablas(self):
+        """(secciones, pasos, cachés, tamaños) como DataFrames para el panel."""
+        tamanos = pd.DataFrame.from_dict(self.tamanos, orient='index').rename_axis('DataFrame')
+        return (pd.DataFrame(self.secciones, columns=['Sección', 'Segundos']),
+                pd.DataFrame(self.pasos, columns=['Sección', 'Paso', 'Segundos']),
+                pd.DataFrame(self.caches, columns=['Caché', 'Acierto']),
+                tamanos.reset_index() if len(tamanos) else pd.DataFrame(columns=['DataFrame', 'Filas', 'Bytes']))
+
+    def a_dict(self):
+        """Resumen serializable (una línea JSON de log por ejecución)."""
+        return {
+            'fecha': self.fecha,
+            'segundos': self.total,
+            'secciones': {s['Sección']: round(s['Segundos'], 6) for s in self.secciones},
+            'pasos': [{'seccion': p['Sección'], 'paso': p['Paso'], 'segundos': round(p['Segundos'], 6)}
+                      for p in self.pasos],
+            'caches': [{'cache': c['Caché'], 'acierto': c['Acierto']} for c in self.caches],
+            'tamanos': {nombre: {'filas': t['Filas'], 'bytes': t['Bytes']} for nombre, t in self.tamanos.items()},
+            'perfil': None if self.perfil is None else self.perfil['perfilador'],
+        }
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+# 3. MÉTRICAS ACUMULADAS (FORMATO PROMETHEUS)
+# ═════════════════════════════════════════════════════════════════════════════
+
+def _etiqueta(valor):
+    """Valor de etiqueta de Prometheus con \\, " y saltos de línea escapados."""
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class RegistroMetricas:
+    """
+    Métricas de todas las ejecuciones del proceso (todas las sesiones).
+
+    Es segura entre hilos: Streamlit atiende cada sesión en su propio hilo.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.ejecuciones = 0
+        self.segundos = 0.0
+        self.secciones = {}
+        self.pasos = {}
+        self.caches = {}
+        self.tamanos = {}
+
+    def agregar(self, ejecucion):
+        """Suma una ejecución terminada a los contadores."""
+        with self._lock:
+            self.ejecuciones += 1
+            self.segundos += ejecucion.total
+            for s in ejecucion.secciones:
+                suma, cuenta = self.secciones.get(s['Sección'], (0.0, 0))
+                self.secciones[s['Sección']] = (suma + s['Segundos'], cuenta + 1)
+            for p in ejecucion.pasos:
+                suma, cuenta = self.pasos.get(p['Paso'], (0.0, 0))
+                self.pasos[p['Paso']] = (suma + p['Segundos'], cuenta + 1)
+            for c in ejecucion.caches:
+                clave = (c['Caché'], 'acierto' if c['Acierto'] else 'fallo')
+                self.caches[clave] = self.caches.get(clave, 0) + 1
+            self.tamanos.update(ejecucion.tamanos)
+
+    def prometheus(self):
+        """Texto con el formato de exposición de Prometheus."""
+        with self._lock:
+            lineas = [
+                '# HELP dashboard_ejecuciones_total Ejecuciones (reruns) del dashboard',
+                '# TYPE dashboard_ejecuciones_total counter',
+                f'dashboard_ejecuciones_total {self.ejecuciones}',
+                '# HELP dashboard_ejecucion_segundos_total Tiempo acumulado de las ejecuciones',
+                '# TYPE dashboard_ejecucion_segundos_total counter',
+                f'dashboard_ejecucion_segundos_total {self.segundos:.6f}',
+            ]
+            for metrica, descripcion, valores in [('seccion', 'sección', self.secciones),
+                                                  ('paso', 'paso', self.pasos)]:
+                etiqueta = metrica
+                lineas += [f'# HELP dashboard_{metrica}_segundos Tiempo por {descripcion} y ejecución',
+                           f'# TYPE dashboard_{metrica}_segundos summary']
+                for nombre, (suma, cuenta) in valores.items():
+                    lineas += [f'dashboard_{metrica}_segundos_sum{{{etiqueta}="{_etiqueta(nombre)}"}} {suma:.6f}',
+                               f'dashboard_{metrica}_segundos_count{{{etiqueta}="{_etiqueta(nombre)}"}} {cuenta}']
+            lineas += ['# HELP dashboard_cache_consultas_total Consultas a las cachés por resultado',
+                       '# TYPE dashboard_cache_consultas_total counter']
+            lineas += [f'dashboard_cache_consultas_total{{cache="{_etiqueta(cache)}",resultado="{resultado}"}} {n}'
+                       for (cache, resultado), n in self.caches.items()]
+            for medida in ['Filas', 'Bytes']:
+                lineas += [f'# HELP dashboard_dataframe_{medida.lower()} {medida} del DataFrame en la última ejecución',
+                           f'# TYPE dashboard_dataframe_{medida.lower()} gauge']
+                lineas += [f'dashboard_dataframe_{medida.lower()}{{nombre="{_etiqueta(nombre)}"}} {t[medida]}'
+                           for nombre, t in self.tamanos.items()]
+        return '\n'.join(lineas) + '\n'
+
+
+def publicar(ejecucion, registro, log=False, archivo_prometheus=None):
+    """
+    Termina la ejecución, la suma al registro y la emite.
+
+    Parámetros:
+    -----------
+    ejecucion : Ejecucion
+    registro : RegistroMetricas
+    log : bool
+        Emitir una línea JSON con logger 'dashboard.rendimiento' (INFO)
+    archivo_prometheus : str, opcional
+        Archivo que se reescribe con registro.prometheus() (por ejemplo
+        para el textfile collector de node_exporter)
+    """
+    ejecucion.terminar()
+    registro.agregar(ejecucion)
+    if log:
+        if not logger.handlers:
+            logger.addHandler(logging.StreamHandler())
+            logger.setLevel(logging.INFO)
+        logger.info(json.dumps(ejecucion.a_dict(), ensure_ascii=False))
+    if archivo_prometheus:
+        # Se escribe aparte y se renombra: el lector nunca ve un archivo a medias
+        temporal = f'{archivo_prometheus}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(temporal, 'w', encoding='utf-8') as f:
+            f.write(registro.prometheus())
+        os.replace(temporal, archivo_prometheus)
@@ -0,0 +1,368 @@
+"""
+═════════════════════════════════════════════════════════════════════════════
+    SERVICIO DE PRONÓSTICOS - PROPHET POR PAÍS Y POR SEGMENTO RFM
+
+    Pronósticos de ingresos diarios para decenas de series (total, cada
+    país y cada segmento RFM):
+    • Las series diarias de una dimensión salen de una sola pasada sobre
+      las transacciones (bincount sobre código de grupo × DayCode), sin un
+      resample('D') por serie
+    • Los modelos Prophet se ajustan en paralelo, un proceso por serie
+    • Cada modelo se guarda con una huella (SHA-256 de la serie y de los
+      parámetros): una serie que no cambió nunca se vuelve a ajustar
+    • El resultado se publica como tabla Arrow (<nombre>.pronosticos.arrow)
+      que el dashboard lee sin necesitar Prophet
+
+    Uso (desde project3):
+        python pronosticos.py ../project1/data.csv
+═════════════════════════════════════════════════════════════════════════════
+"""
+
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from almacen import (
+    DIRECTORIO_CACHE,
+    VERSION_ESQUEMA,
+    cargar_dataset,
+    escribir_arrow,
+    escribir_manifiesto,
+    leer_arrow,
+    leer_manifiesto,
+    rutas_cache,
+)
+from fechas import fechas_de_dia
+from rfm import cargar_rfm, segmentar
+
+# Días que se pronostican después del último día con datos
+HORIZONTE = 90
+
+# Mismos parámetros que el modelo global del notebook de project5
+PARAMETROS_PROPHET = {
+    'seasonality_mode': 'multiplicative',
+    'yearly_seasonality': True,
+    'weekly_seasonality': True,
+    'daily_seasonality': False,
+    'interval_width': 0.95,
+}
+
+# Series con menos días de venta no se pronostican (países pequeños)
+MIN_DIAS_VENTA = 60
+
+# Subcarpeta del caché con los modelos (<huella>.json) y sus pronósticos
+DIRECTORIO_MODELOS = 'pronosticos'
+
+COLUMNAS = ['Tipo', 'Grupo', 'ds', 'y', 'yhat', 'yhat_lower', 'yhat_upper']
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+# 1. SERIES DIARIAS
+# ═════════════════════════════════════════════════════════════════════════════
+
+def series_diarias(df, claves):
+    """
+    Ingresos diarios de cada grupo en una sola pasada.
+
+    Cada fila se ubica en la celda (grupo, día) de una matriz y se suma
+    con np.bincount; los días sin ventas quedan en 0, como con
+    resample('D').sum().
+
+    Parámetros:
+    -----------
+    df : pd.DataFrame
+        Transacciones con DayCode y TotalPrice
+    claves : array-like
+        Grupo de cada fila (por ejemplo df['Country']). Las filas con
+        clave nula se ignoran
+
+    Retorna:
+    --------
+    pd.DataFrame
+        Índice = fechas diarias del rango de df, una columna por grupo
+    """
+    codigos, grupos = pd.factorize(np.asarray(claves), sort=True)
+    dias = df['DayCode'].to_numpy(dtype=np.int64)
+    primero = dias.min()
+    n_dias = int(dias.max() - primero + 1)
+
+    validas = codigos >= 0
+    celdas = codigos[validas] * n_dias + (dias[validas] - primero)
+    matriz = np.bincount(
+        celdas,
+        weights=df['TotalPrice'].to_numpy(dtype=np.float64)[validas],
+        minlength=len(grupos) * n_dias,
+    ).reshape(len(grupos), n_dias)
+
+    fechas = fechas_de_dia(np.arange(primero, primero + n_dias))
+    return pd.DataFrame(matriz.T, index=fechas, columns=grupos)
+
+
+def series_por_grupo(df, clientes):
+    """
+    Series diarias del total, de cada país y de cada segmento RFM.
+
+    Parámetros:
+    -----------
+    df : pd.DataFrame
+        Transacciones limpias
+    clientes : pd.DataFrame
+        Clientes con CustomerID y Segmento (rfm.segmentar)
+
+    Retorna:
+    --------
+    pd.DataFrame
+        Columnas con MultiIndex (Tipo, Grupo): ('Total', 'Total'),
+        ('País', <país>) y ('Segmento', <segmento>)
+    """
+    segmento = pd.Series(clientes['Segmento'].astype(str).to_numpy(),
+                         index=clientes['CustomerID'].to_numpy())
+    partes = {
+        'Total': series_diarias(df, np.zeros(len(df), dtype=np.int8)).set_axis(['Total'], axis=1),
+        'País': series_diarias(df, df['Country'].astype(str)),
+        'Segmento': series_diarias(df, df['CustomerID'].map(segmento)),
+    }
+    return pd.concat(partes, axis=1, names=['Tipo', 'Grupo'])
+
+
+def recortar(serie):
+    """Serie desde su primer día con ventas (un país que empieza tarde no arrastra ceros)."""
+    con_ventas = serie.to_numpy() != 0
+    if not con_ventas.any():
+        return serie.iloc[:0]
+    return serie.iloc[con_ventas.argmax():]
+
+
+def huella_serie(serie, parametros, horizonte):
+    """SHA-256 (16 caracteres) de las fechas, los valores y los parámetros."""
+    h = hashlib.sha256()
+    h.update(str(serie.index[0]).encode() if len(serie) else b'')
+    h.update(np.ascontiguousarray(serie.to_numpy(dtype=np.float64)).tobytes())
+    h.update(json.dumps({'parametros': parametros, 'horizonte': horizonte}, sort_keys=True).encode())
+    return h.hexdigest()[:16]
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+# 2. AJUSTE (UN PROCESO POR SERIE)
+# ═════════════════════════════════════════════════════════════════════════════
+
+def modelo_prophet(fechas, valores, parametros):
+    """
+    Modelo Prophet ajustado sobre una serie.
+
+    Prophet se importa aquí, así que el resto del módulo (y el dashboard)
+    no depende de él.
+    """
+    from prophet import Prophet
+
+    logging.getLogger('cmdstanpy').disabled = True
+    modelo = Prophet(**parametros)
+    return modelo.fit(pd.DataFrame({'ds': fechas, 'y': valores}))
+
+
+def ajustar_prophet(fechas, valores, parametros, horizonte):
+    """
+    Ajusta Prophet sobre una serie y pronostica `horizonte` días.
+
+    Se ejecuta en un proceso del pool.
+
+    Retorna:
+    --------
+    tuple
+        (modelo serializado en JSON, DataFrame con ds, yhat, yhat_lower y
+        yhat_upper del histórico y del horizonte)
+    """
+    from prophet.serialize import model_to_json
+
+    modelo = modelo_prophet(fechas, valores, parametros)
+    futuro = modelo.make_future_dataframe(periods=horizonte, freq='D')
+    pronostico = modelo.predict(futuro)[['ds', 'yhat', 'yhat_lower', 'yhat_upper']]
+    return model_to_json(modelo), pronostico
+
+
+class ServicioPronosticos:
+    """
+    Ajusta Prophet sobre muchas series y reutiliza los modelos guardados.
+
+    Cada serie se guarda en el directorio como <huella>.json (modelo) y
+    <huella>.arrow (pronóstico). Si la serie y los parámetros no cambian,
+    el pronóstico se lee de disco sin ajustar nada.
+
+    Parámetros:
+    -----------
+    directorio : str
+        Carpeta de los modelos
+    parametros : dict, opcional
+        Argumentos de Prophet (por defecto PARAMETROS_PROPHET)
+    horizonte : int
+        Días a pronosticar
+    procesos : int, opcional
+        Procesos en paralelo (por defecto, los núcleos disponibles)
+    """
+
+    def __init__(self, directorio=Path(DIRECTORIO_CACHE) / DIRECTORIO_MODELOS,
+                 parametros=None, horizonte=HORIZONTE, procesos=None):
+        self.directorio = Path(directorio)
+        self.parametros = dict(PARAMETROS_PROPHET if parametros is None else parametros)
+        self.horizonte = horizonte
+        self.procesos = procesos or os.cpu_count() or 1
+        self.ajustados = 0
+        self.reutilizados = 0
+
+    def ruta(self, huella):
+        return self.directorio / f'{huella}.arrow'
+
+    def cargar_modelo(self, huella):
+        """Modelo Prophet guardado con esa huella."""
+        from prophet.serialize import model_from_json
+
+        with open(self.directorio / f'{huella}.json', encoding='utf-8') as f:
+            return model_from_json(f.read())
+
+    def _guardar(self, huella, modelo_json, pronostico):
+        # El .arrow se escribe al final: si existe, el modelo también
+        self.directorio.mkdir(parents=True, exist_ok=True)
+        with open(self.directorio / f'{huella}.json', 'w', encoding='utf-8') as f:
+            f.write(modelo_json)
+        escribir_arrow(pronostico, self.ruta(huella))
+
+    def pronosticar(self, series, min_dias_venta=MIN_DIAS_VENTA):
+        """
+        Pronóstico de cada columna de `series`.
+
+        Parámetros:
+        -----------
+        series : pd.DataFrame
+            Series diarias (series_por_grupo); columnas (Tipo, Grupo)
+        min_dias_venta : int
+            Las series con menos días de venta se omiten
+
+        Retorna:
+        --------
+        pd.DataFrame
+            Tipo, Grupo, ds, y (valor real; NaN en el horizonte), yhat,
+            yhat_lower y yhat_upper
+        """
+        trabajos = {}
+        for clave in series.columns:
+            serie = recortar(series[clave])
+            if (serie.to_numpy() != 0).sum() >= min_dias_venta:
+                trabajos[clave] = (serie, huella_serie(serie, self.parametros, self.horizonte))
+
+        pendientes = {clave: t for clave, t in trabajos.items() if not self.ruta(t[1]).exists()}
+        self.reutilizados += len(trabajos) - len(pendientes)
+        self._ajustar(pendientes)
+
+        tablas = []
+        for (tipo, grupo), (serie, huella) in trabajos.items():
+            pronostico = leer_arrow(self.ruta(huella))
+            pronostico['y'] = serie.reindex(pronostico['ds']).to_numpy()
+            tablas.append(pronostico.assign(Tipo=tipo, Grupo=grupo))
+        if not tablas:
+            return pd.DataFrame(columns=COLUMNAS)
+        return pd.concat(tablas, ignore_index=True)[COLUMNAS]
+
+    def _ajustar(self, pendientes):
+        """Ajusta las series pendientes (en paralelo si hay más de un proceso)."""
+        argumentos = {
+            huella: (serie.index, serie.to_numpy(), self.parametros, self.horizonte)
+            for serie, huella in pendientes.values()
+        }
+        procesos = min(self.procesos, len(argumentos))
+        if procesos <= 1:
+            for huella, args in argumentos.items():
+                self._guardar(huella, *ajustar_prophet(*args))
+                self.ajustados += 1
+            return
+
+        contexto = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=procesos, mp_context=contexto) as pool:
+            futuros = {pool.submit(ajustar_prophet, *args): huella
+                       for huella, args in argumentos.items()}
+            for futuro in as_completed(futuros):
+                self._guardar(futuros[futuro], *futuro.result())
+                self.ajustados += 1
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+# 3. TABLA PRECALCULADA PARA EL DASHBOARD
+# ═════════════════════════════════════════════════════════════════════════════
+
+def rutas_pronosticos(filepath, directorio=DIRECTORIO_CACHE):
+    """Devuelve (ruta_arrow, ruta_manifiesto) de la tabla de pronósticos."""
+    ruta_arrow, _ = rutas_cache(filepath, directorio)
+    ruta = ruta_arrow.with_name(ruta_arrow.stem + '.pronosticos.arrow')
+    return ruta, ruta.with_suffix('.json')
+
+
+def _firma(filepath, directorio):
+    _, ruta_manifiesto = rutas_cache(filepath, directorio)
+    manifiesto = leer_manifiesto(ruta_manifiesto)
+    return {'version': VERSION_ESQUEMA, 'sha256': manifiesto and manifiesto['sha256']}
+
+
+def calcular_pronosticos(filepath, directorio=DIRECTORIO_CACHE, servicio=None):
+    """
+    Pronostica el total, cada país y cada segmento RFM y publica la tabla.
+
+    Parámetros:
+    -----------
+    filepath : str
+        Ruta al CSV de origen
+    directorio : str
+        Carpeta del caché (la misma que usa el dashboard)
+    servicio : ServicioPronosticos, opcional
+        Por defecto, uno con los modelos en <directorio>/pronosticos
+
+    Retorna:
+    --------
+    pd.DataFrame
+        La tabla publicada (ver ServicioPronosticos.pronosticar)
+    """
+    if servicio is None:
+        servicio = ServicioPronosticos(Path(directorio) / DIRECTORIO_MODELOS)
+    df = cargar_dataset(filepath, directorio)
+    clientes = segmentar(cargar_rfm(filepath, directorio, df).clientes())
+    tabla = servicio.pronosticar(series_por_grupo(df, clientes))
+
+    ruta, ruta_manifiesto = rutas_pronosticos(filepath, directorio)
+    escribir_arrow(tabla, ruta)
+    escribir_manifiesto(ruta_manifiesto, {
+        **_firma(filepath, directorio),
+        'parametros': servicio.parametros,
+        'horizonte': servicio.horizonte,
+    })
+    return tabla
+
+
+def leer_pronosticos(filepath, directorio=DIRECTORIO_CACHE):
+    """
+    Tabla de pronósticos publicada, o None si no existe o es de otros datos.
+
+    No ajusta nada: la tabla se genera con calcular_pronosticos (o
+    `python pronosticos.py <csv>`).
+    """
+    ruta, ruta_manifiesto = rutas_pronosticos(filepath, directorio)
+    manifiesto = leer_manifiesto(ruta_manifiesto)
+    if manifiesto is None or not ruta.exists():
+        return None
+    firma = _firma(filepath, directorio)
+    if {clave: manifiesto.get(clave) for clave in firma} != firma:
+        return None
+    return leer_arrow(ruta)
+
+
+if __name__ == '__main__':
+    archivo = sys.argv[1] if len(sys.argv) > 1 else 'data.csv'
+    servicio = ServicioPronosticos()
+    tabla = calcular_pronosticos(archivo, servicio=servicio)
+    print(f"✅ {tabla.groupby(['Tipo', 'Grupo']).ngroups} series pronosticadas "
+          f"({servicio.ajustados} ajustadas, {servicio.reutilizados} reutilizadas)")
@@ -0,0 +1,182 @@
+"""
+═════════════════════════════════════════════════════════════════════════════
+    PROYECCIÓN RÁPIDA - TENDENCIA + TÉRMINOS DE FOURIER POR MÍNIMOS CUADRADOS
+
+    Alternativa ligera a Prophet para pronosticar en cada rerun:
+    • Tendencia lineal y estacionalidad semanal y anual como términos de
+      Fourier (senos y cosenos de 7 y 365.25 días)
+    • Un solo sistema de ecuaciones (ridge) para todas las series a la vez:
+      la matriz de diseño es la misma, solo cambian las columnas de Y
+    • Intervalo del 95% a partir del error residual de cada serie
+
+    Ajustar una serie diaria tarda menos de un milisegundo, y miles de
+    series se ajustan en una sola llamada a np.linalg.solve.
+═════════════════════════════════════════════════════════════════════════════
+"""
+
+import numpy as np
+import pandas as pd
+
+from fechas import fechas_de_dia
+from pronosticos import HORIZONTE
+
+# Armónicos de cada estacionalidad (3 semanales describen cualquier patrón
+# de 7 días; los anuales se limitan para no seguir el ruido)
+ORDEN_SEMANAL = 3
+ORDEN_ANUAL = 6
+
+# Penalización ridge de los términos de Fourier, relativa al número de días
+REGULARIZACION = 0.01
+
+# Días de historia mínimos para proyectar, y para incluir la estacionalidad anual
+MIN_DIAS = 28
+MIN_DIAS_ANUAL = 365
+
+# Cuantil normal del intervalo del 95%
+Z_95 = 1.96
+
+
+def terminos_fourier(dias, periodo, orden):
+    """Senos y cosenos de los `orden` primeros armónicos (días × 2·orden)."""
+    angulos = 2 * np.pi * np.outer(dias, np.arange(1, orden + 1)) / periodo
+    return np.hstack([np.sin(angulos), np.cos(angulos)])
+
+
+class ModeloFourier:
+    """
+    Regresión de una o muchas series diarias sobre tendencia y Fourier.
+
+    Se ajusta con ajustar(dias, valores) y se proyecta con predecir(dias).
+    `valores` puede tener una columna por serie: todas comparten la
+    matriz de diseño y se resuelven en el mismo sistema.
+
+    Parámetros:
+    -----------
+    orden_semanal : int
+        Armónicos de la estacionalidad semanal
+    orden_anual : int
+        Armónicos de la estacionalidad anual (se omite con menos de
+        MIN_DIAS_ANUAL días de historia)
+    regularizacion : float
+        Penalización ridge de los términos de Fourier
+    """
+
+    def __init__(self, orden_semanal=ORDEN_SEMANAL, orden_anual=ORDEN_ANUAL,
+                 regularizacion=REGULARIZACION):
+        self.orden_semanal = orden_semanal
+        self.orden_anual = orden_anual
+        self.regularizacion = regularizacion
+
+    def diseno(self, dias):
+        """Matriz de diseño: constante, tendencia y términos de Fourier."""
+        dias = np.asarray(dias, dtype=np.float64)
+        columnas = [np.ones((len(dias), 1)), ((dias - self.origen) / self.escala)[:, None],
+                    terminos_fourier(dias, 7, self.orden_semanal)]
+        if self.anual:
+            columnas.append(terminos_fourier(dias, 365.25, self.orden_anual))
+        return np.hstack(columnas)
+
+    def ajustar(self, dias, valores):
+        """
+        Ajusta el modelo por mínimos cuadrados (ridge).
+
+        Parámetros:
+        -----------
+        dias : array-like
+            Código de día de cada fila (consecutivos, sin huecos)
+        valores : array-like
+            Valores (días,) o (días × series)
+        """
+        dias = np.asarray(dias, dtype=np.float64)
+        y = np.asarray(valores, dtype=np.float64)
+        self.origen = dias[0]
+        self.escala = max(dias[-1] - dias[0], 1.0)
+        self.anual = self.orden_anual > 0 and len(dias) >= MIN_DIAS_ANUAL
+
+        x = self.diseno(dias)
+        penalizacion = np.full(x.shape[1], self.regularizacion * len(dias))
+        penalizacion[:2] = 0.0   # constante y tendencia sin penalizar
+        self.coeficientes = np.linalg.solve(x.T @ x + np.diag(penalizacion), x.T @ y)
+
+        residuos = y - x @ self.coeficientes
+        grados = max(len(dias) - x.shape[1], 1)
+        self.error = np.sqrt((residuos ** 2).sum(axis=0) / grados)
+        return self
+
+    def predecir(self, dias):
+        """
+        Proyección en los días pedidos.
+
+        Retorna:
+        --------
+        tuple
+            (yhat, yhat_lower, yhat_upper) con la forma de `valores`. Los
+            ingresos no pueden ser negativos: los tres se recortan en 0
+        """
+        yhat = self.diseno(dias) @ self.coeficientes
+        margen = Z_95 * self.error
+        return (np.maximum(yhat, 0.0),
+                np.maximum(yhat - margen, 0.0),
+                np.maximum(yhat + margen, 0.0))
+
+
+def proyectar(por_dia, horizonte=HORIZONTE, columna='Ingresos', modelo=None):
+    """
+    Proyección de una serie diaria (por ejemplo seleccion.por_dia()).
+
+    Los días sin filas cuentan como días sin ventas (0).
+
+    Parámetros:
+    -----------
+    por_dia : pd.DataFrame
+        Columnas Dia (código de día) y `columna`
+    horizonte : int
+        Días a proyectar después del último día
+    modelo : ModeloFourier, opcional
+
+    Retorna:
+    --------
+    pd.DataFrame or None
+        Dia, yhat, yhat_lower y yhat_upper de los días proyectados; None
+        si hay menos de MIN_DIAS días de historia
+    """
+    if por_dia.empty:
+        return None
+    primero, ultimo = int(por_dia['Dia'].min()), int(por_dia['Dia'].max())
+    if ultimo - primero + 1 < MIN_DIAS:
+        return None
+    dias = np.arange(primero, ultimo + 1)
+    valores = np.zeros(len(dias))
+    np.add.at(valores, por_dia['Dia'].to_numpy(dtype=np.int64) - primero, por_dia[columna].to_numpy())
+
+    modelo = (modelo or ModeloFourier()).ajustar(dias, valores)
+    futuro = np.arange(ultimo + 1, ultimo + 1 + horizonte)
+    yhat, inferior, superior = modelo.predecir(futuro)
+    return pd.DataFrame({'Dia': futuro, 'yhat': yhat, 'yhat_lower': inferior, 'yhat_upper': superior})
+
+
+def proyectar_series(series, horizonte=HORIZONTE, modelo=None):
+    """
+    Proyección de muchas series diarias con un solo ajuste.
+
+    Parámetros:
+    -----------
+    series : pd.DataFrame
+        Índice = fechas diarias consecutivas, una columna por serie (por
+        ejemplo pronosticos.series_por_grupo)
+
+    Retorna:
+    --------
+    pd.DataFrame
+        Índice = fechas proyectadas; columnas (yhat | yhat_lower |
+        yhat_upper, serie)
+    """
+    dias = (series.index.values.astype('datetime64[D]').astype(np.int64))
+    modelo = (modelo or ModeloFourier()).ajustar(dias, series.to_numpy(dtype=np.float64))
+    futuro = np.arange(dias[-1] + 1, dias[-1] + 1 + horizonte)
+    indice = fechas_de_dia(futuro)
+    partes = {
+        nombre: pd.DataFrame(valores, index=indice, columns=series.columns)
+        for nombre, valores in zip(['yhat', 'yhat_lower', 'yhat_upper'], modelo.predecir(futuro))
+    }
+    return pd.concat(partes, axis=1)
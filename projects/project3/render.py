@@ -0,0 +1,122 @@
+"""
+═════════════════════════════════════════════════════════════════════════════
+    PRESUPUESTO DE RENDER - DATOS ACOTADOS PARA LOS GRÁFICOS PLOTLY
+
+    Cada gráfico viaja al navegador como JSON de Plotly. Entre los agregados
+    de pandas y st.plotly_chart se aplican estos límites:
+    • Series de tiempo: muestreo LTTB (Largest Triangle Three Buckets), que
+      conserva la forma visual de la serie con un número fijo de puntos
+    • Categorías: las N mayores y el resto sumado en "Otros"
+    • Trazas WebGL (Scattergl) a partir de cierto número de puntos
+    • Tamaño del JSON de cada figura, para vigilar el peso de la página
+═════════════════════════════════════════════════════════════════════════════
+"""
+
+import numpy as np
+import pandas as pd
+
+# Puntos máximos por serie de tiempo
+PUNTOS_MAX = 1000
+
+# A partir de estos puntos las líneas se dibujan con WebGL
+UMBRAL_WEBGL = 500
+
+# Categorías máximas por gráfico (incluida "Otros")
+CATEGORIAS_MAX = 10
+
+ETIQUETA_OTROS = 'Otros'
+
+
+def lttb(x, y, n_puntos):
+    """
+    Índices de los puntos elegidos por Largest Triangle Three Buckets.
+
+    Se conservan el primer y el último punto. El resto se reparte en
+    n_puntos - 2 grupos y de cada uno se elige el punto que forma el
+    triángulo de mayor área con el punto elegido antes y con la media del
+    grupo siguiente.
+
+    Parámetros:
+    -----------
+    x, y : array-like
+        Coordenadas de la serie (x creciente)
+    n_puntos : int
+        Número de puntos a conservar
+
+    Retorna:
+    --------
+    np.ndarray
+        Índices (crecientes) de los puntos conservados
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(x)
+    if n_puntos >= n or n_puntos < 3:
+        return np.arange(n)
+
+    bordes = np.linspace(1, n - 1, n_puntos - 1).astype(np.int64)
+    elegidos = np.empty(n_puntos, dtype=np.int64)
+    elegidos[0], elegidos[-1] = 0, n - 1
+
+    a = 0
+    for i in range(n_puntos - 2):
+        inicio, fin = bordes[i], bordes[i + 1]
+        if i == n_puntos - 3:
+            cx, cy = x[-1], y[-1]
+        else:
+            siguiente = slice(bordes[i + 1], bordes[i + 2])
+            cx, cy = x[siguiente].mean(), y[siguiente].mean()
+
+        area = np.abs((x[a] - cx) * (y[inicio:fin] - y[a])
+                      - (x[a] - x[inicio:fin]) * (cy - y[a]))
+        a = inicio + int(np.argmax(area))
+        elegidos[i + 1] = a
+    return elegidos
+
+
+def reducir_serie(df, x, y, n_puntos=PUNTOS_MAX):
+    """
+    Reduce un DataFrame ordenado por x a n_puntos filas con LTTB sobre y.
+
+    Las demás columnas se toman de las mismas filas elegidas.
+    """
+    if len(df) <= n_puntos:
+        return df
+    return df.iloc[lttb(df[x], df[y], n_puntos)]
+
+
+def agrupar_otros(serie, max_categorias=CATEGORIAS_MAX, etiqueta=ETIQUETA_OTROS):
+    """
+    Las max_categorias - 1 mayores y el resto sumado bajo `etiqueta`.
+
+    Parámetros:
+    -----------
+    serie : pd.Series
+        Valor por categoría (índice = categoría)
+
+    Retorna:
+    --------
+    pd.Series
+        Ordenada de mayor a menor, con "Otros" al final si hace falta
+    """
+    serie = serie.sort_values(ascending=False)
+    if len(serie) <= max_categorias:
+        return serie
+    principales = serie.iloc[:max_categorias - 1]
+    resto = pd.Series([serie.iloc[max_categorias - 1:].sum()], index=[etiqueta])
+    principales.index = principales.index.astype(str)
+    return pd.concat([principales, resto])
+
+
+def traza_dispersion(n_puntos, **kwargs):
+    """go.Scatter, o go.Scattergl (WebGL) si la serie supera UMBRAL_WEBGL."""
+    # Plotly solo hace falta al dibujar: el motor de análisis (analitica/)
+    # usa este módulo sin él
+    import plotly.graph_objects as go
+    tipo = go.Scattergl if n_puntos > UMBRAL_WEBGL else go.Scatter
+    return tipo(**kwargs)
+
+
+def peso_figura(fig):
+    """Bytes del JSON de la figura, como se envía al navegador."""
+    return len(fig.to_json().encode('utf-8'))
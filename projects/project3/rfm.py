@@ -0,0 +1,222 @@
+"""
+═════════════════════════════════════════════════════════════════════════════
+    ALMACÉN DE FEATURES RFM - RECENCIA, FRECUENCIA Y MONETARIO POR CLIENTE
+
+    La base es una tabla por factura (cliente, factura, país, fecha, total),
+    mucho más pequeña que las transacciones. A partir de ella se calculan
+    en una sola agregación vectorizada:
+    • Recencia: días desde la última compra hasta la fecha de referencia
+    • Frecuencia: número de facturas distintas
+    • Monetario: suma de TotalPrice
+
+    Las transacciones nuevas se agregan por factura y se combinan con la
+    tabla existente, así que la actualización es exacta sin volver a leer
+    el histórico. La tabla se guarda como archivo Arrow, y la comparten el
+    dashboard y el pipeline de segmentación (project4).
+═════════════════════════════════════════════════════════════════════════════
+"""
+
+import numpy as np
+import pandas as pd
+
+from almacen import (
+    DIRECTORIO_CACHE,
+    cargar_dataset,
+    cargar_derivado,
+    escribir_arrow,
+    leer_arrow,
+)
+
+# Segmentos por puntuaciones R, F y M de 1 a 5 (quintiles). Mismos nombres
+# que usa asignar_nombre_segmento en project4
+SEGMENTOS = ['Campeones 🏆', 'Leales 💪', 'Nuevos 🆕', 'En Riesgo ⚠️', 'Otros']
+
+
+def facturas_de_transacciones(df):
+    """
+    Agrega las transacciones limpias a una fila por (cliente, factura).
+
+    Retorna:
+    --------
+    pd.DataFrame
+        CustomerID, InvoiceNo, Country, Fecha (última línea de la factura)
+        y Total (suma de TotalPrice)
+    """
+    facturas = df.groupby(['CustomerID', 'InvoiceNo'], observed=True, sort=False).agg(
+        Country=('Country', 'last'),
+        Fecha=('InvoiceDate', 'max'),
+        Total=('TotalPrice', 'sum'),
+    )
+    return facturas.reset_index()
+
+
+def _unificar_categorias(partes, columna):
+    """Las partes con `columna` como category y las mismas categorías (para pd.concat)."""
+    categorias = pd.api.types.union_categoricals(
+        [p[columna].astype('category') for p in partes], ignore_order=True).categories
+    return [p.assign(**{columna: p[columna].astype('category').cat.set_categories(categorias)})
+            for p in partes]
+
+
+def _combinar_facturas(partes):
+    """Une tablas de facturas; una factura repartida entre lotes se suma."""
+    partes = _unificar_categorias(partes, 'Country')
+    # InvoiceNo es category en el almacén incremental (ver ingesta.py): sin
+    # unificar, pd.concat lo convertiría a object
+    if all(isinstance(p['InvoiceNo'].dtype, pd.CategoricalDtype) for p in partes):
+        partes = _unificar_categorias(partes, 'InvoiceNo')
+    facturas = pd.concat(partes, ignore_index=True)
+    if not facturas.duplicated(['CustomerID', 'InvoiceNo']).any():
+        return facturas
+    return (facturas.sort_values('Fecha', kind='stable')
+            .groupby(['CustomerID', 'InvoiceNo'], observed=True, sort=False)
+            .agg(Country=('Country', 'last'), Fecha=('Fecha', 'max'), Total=('Total', 'sum'))
+            .reset_index())
+
+
+class FeaturesRFM:
+    """
+    Features RFM por cliente sobre una tabla de facturas.
+
+    Se construye con FeaturesRFM.desde_transacciones(df) o se lee de disco
+    con FeaturesRFM.cargar(ruta). actualizar(df_nuevo) devuelve un nuevo
+    objeto con las transacciones nuevas incorporadas.
+
+    Parámetros:
+    -----------
+    facturas : pd.DataFrame
+        Tabla devuelta por facturas_de_transacciones
+    """
+
+    def __init__(self, facturas):
+        self.facturas = facturas
+        self._clientes = None
+
+    @classmethod
+    def desde_transacciones(cls, df):
+        return cls(facturas_de_transacciones(df))
+
+    def actualizar(self, df_nuevo):
+        """Nuevo FeaturesRFM con las transacciones de df_nuevo añadidas."""
+        if df_nuevo is None or df_nuevo.empty:
+            return self
+        facturas = facturas_de_transacciones(df_nuevo)
+        return FeaturesRFM(_combinar_facturas([self.facturas, facturas]))
+
+    @property
+    def fecha_referencia(self):
+        """Un día después de la última compra (el "hoy" del análisis RFM)."""
+        return self.facturas['Fecha'].max() + pd.Timedelta(days=1)
+
+    def clientes(self, fecha_referencia=None):
+        """
+        Tabla RFM: una fila por cliente.
+
+        Parámetros:
+        -----------
+        fecha_referencia : pd.Timestamp, opcional
+            Fecha contra la que se mide la recencia (por defecto, el día
+            siguiente a la última compra)
+
+        Retorna:
+        --------
+        pd.DataFrame
+            CustomerID, Country, Recencia, Frecuencia, Monetario,
+            PrimeraCompra y UltimaCompra
+        """
+        if self._clientes is None:
+            self._clientes = (
+                self.facturas.sort_values('Fecha', kind='stable')
+                .groupby('CustomerID', sort=True)
+                .agg(
+                    Country=('Country', 'last'),
+                    Frecuencia=('InvoiceNo', 'size'),
+                    Monetario=('Total', 'sum'),
+                    PrimeraCompra=('Fecha', 'min'),
+                    UltimaCompra=('Fecha', 'max'),
+                )
+                .reset_index()
+            )
+
+        referencia = self.fecha_referencia if fecha_referencia is None else fecha_referencia
+        clientes = self._clientes.copy()
+        clientes.insert(2, 'Recencia', (referencia - clientes['UltimaCompra']).dt.days)
+        return clientes[['CustomerID', 'Country', 'Recencia', 'Frecuencia', 'Monetario',
+                         'PrimeraCompra', 'UltimaCompra']]
+
+    def guardar(self, ruta):
+        """Guarda la tabla de facturas como archivo Arrow."""
+        escribir_arrow(self.facturas, ruta)
+
+    @classmethod
+    def cargar(cls, ruta):
+        return cls(leer_arrow(ruta))
+
+
+def puntuar(clientes, n=5):
+    """
+    Añade las puntuaciones R, F y M (1 a n) por cuantiles.
+
+    Una recencia baja puntúa alto. Se usa el rango percentil, así que los
+    empates (muchos clientes con 1 factura) reciben la misma puntuación.
+    """
+    clientes = clientes.copy()
+    for columna, nombre, ascendente in [('Recencia', 'R', False),
+                                        ('Frecuencia', 'F', True),
+                                        ('Monetario', 'M', True)]:
+        pct = clientes[columna].rank(method='average', pct=True, ascending=ascendente)
+        clientes[nombre] = np.ceil(pct * n).clip(1, n).astype('int8')
+    return clientes
+
+
+def segmentar(clientes):
+    """Asigna un segmento de SEGMENTOS a cada cliente según sus puntuaciones."""
+    clientes = puntuar(clientes)
+    r, f, m = clientes['R'], clientes['F'], clientes['M']
+    condiciones = [
+        (r >= 4) & (f >= 4) & (m >= 4),
+        (f >= 4) & (m >= 3),
+        (r >= 4) & (f <= 2),
+        (r <= 2),
+    ]
+    clientes['Segmento'] = pd.Categorical(
+        np.select(condiciones, SEGMENTOS[:-1], default=SEGMENTOS[-1]),
+        categories=SEGMENTOS,
+    )
+    return clientes
+
+
+def resumen_segmentos(clientes):
+    """Clientes, medias RFM e ingresos por segmento."""
+    resumen = clientes.groupby('Segmento', observed=True).agg(
+        Clientes=('CustomerID', 'size'),
+        Recencia=('Recencia', 'mean'),
+        Frecuencia=('Frecuencia', 'mean'),
+        Monetario=('Monetario', 'mean'),
+        Ingresos=('Monetario', 'sum'),
+    )
+    resumen['% Clientes'] = resumen['Clientes'] / resumen['Clientes'].sum() * 100
+    return resumen
+
+
+def cargar_rfm(filepath, directorio=DIRECTORIO_CACHE, df=None):
+    """
+    Features RFM del CSV, reutilizando la tabla guardada si sigue vigente.
+
+    La tabla se guarda junto al caché Arrow del CSV (<nombre>.rfm.arrow) y
+    se invalida con el mismo SHA-256 que el caché de transacciones
+    (almacen.cargar_derivado).
+
+    Parámetros:
+    -----------
+    filepath : str
+        Ruta al CSV de origen
+    directorio : str
+        Carpeta del caché
+    df : pd.DataFrame, opcional
+        Transacciones ya cargadas con cargar_dataset(filepath, directorio)
+    """
+    if df is None:
+        df = cargar_dataset(filepath, directorio)
+    return cargar_derivado(filepath, 'rfm', lambda: FeaturesRFM.desde_transacciones(df),
+                           FeaturesRFM.guardar, FeaturesRFM.cargar, directorio, extension='.arrow')
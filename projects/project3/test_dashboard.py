@@ -35,6 +35,25 @@ print("-" * 80)
 
 archivos_requeridos = {
     'dashboard.py': 'Código del dashboard',
+    'almacen.py': 'Caché columnar (Arrow)',
+    'cubo.py': 'Cubo OLAP de agregados',
+    'hll.py': 'Sketches HyperLogLog',
+    'indice.py': 'Índice de fechas y países',
+    'cache_lru.py': 'Caché LRU de KPIs',
+    'ingesta.py': 'Ingesta incremental',
+    'fechas.py': 'Códigos de fecha enteros',
+    'exportar.py': 'Exportación bajo demanda',
+    'render.py': 'Presupuesto de render',
+    'topk.py': 'Top-K exacto',
+    'rfm.py': 'Features RFM por cliente',
+    'basedatos.py': 'Backend SQLite',
+    'pronosticos.py': 'Pronósticos Prophet',
+    'proyeccion.py': 'Proyección rápida (Fourier)',
+    'validacion.py': 'Backtesting de pronósticos',
+    'benchmark.py': 'Benchmark del camino de datos',
+    'instrumentacion.py': 'Tiempos por ejecución',
+    'analitica/__init__.py': 'Motor de análisis',
+    'arranque.py': 'Arranque en caliente',
     'data.csv': 'Dataset principal',
     'requirements.txt': 'Dependencias',
     'README.md': 'Documentación',
@@ -76,6 +95,7 @@ librerias = {
     'streamlit': 'Framework web',
     'numpy': 'Operaciones numéricas',
     'openpyxl': 'Exportar a Excel',
+    'pyarrow': 'Caché columnar',
 }
 
 librerias_faltantes = []
@@ -105,15 +125,29 @@ print("-" * 80)
 
 try:
     import pandas as pd
+    from almacen import detectar_encoding, TAMANO_BLOQUE, TIPOS_CSV
     
-    # Intenta leer el CSV
-    try:
-        df = pd.read_csv('data.csv', encoding='utf-8')
-    except UnicodeDecodeError:
-        df = pd.read_csv('data.csv', encoding='latin1')
+    # Lee el CSV por bloques: la memoria no depende del tamaño del archivo
+    filas_totales = 0
+    fecha_min, fecha_max = None, None
+    paises, clientes, productos = set(), set(), set()
+    df = None  # Primer bloque (para columnas y tipos)
+    
+    lector = pd.read_csv('data.csv', encoding=detectar_encoding('data.csv'),
+                         dtype=TIPOS_CSV, chunksize=TAMANO_BLOQUE)
+    for bloque in lector:
+        if df is None:
+            df = bloque
+        filas_totales += len(bloque)
+        fechas = pd.to_datetime(bloque['InvoiceDate'], format='%m/%d/%Y %H:%M', errors='coerce')
+        fecha_min = min(filter(pd.notna, [fecha_min, fechas.min()]), default=None)
+        fecha_max = max(filter(pd.notna, [fecha_max, fechas.max()]), default=None)
+        paises.update(bloque['Country'].dropna().unique())
+        clientes.update(bloque['CustomerID'].dropna().unique())
+        productos.update(bloque['Description'].dropna().unique())
     
     print(f"{GREEN}✓{RESET} CSV cargado correctamente")
-    print(f"  • Filas: {len(df):,}")
+    print(f"  • Filas: {filas_totales:,}")
     print(f"  • Columnas: {len(df.columns)}")
     print(f"  • Columnas: {', '.join(df.columns)}")
     
@@ -151,7 +185,7 @@ with open('dashboard.py', 'r') as f:
 
 checks = {
     'st.set_page_config': 'Configuración de página',
-    '@st.cache_data': 'Cache de datos',
+    '@st.cache_resource': 'Datos compartidos entre sesiones',
     'load_data': 'Función de carga',
     'st.sidebar': 'Barra lateral',
     'st.metric': 'KPIs',
@@ -184,10 +218,10 @@ print(f"  3. Prueba todos los filtros y gráficos")
 print(f"  4. Cuando esté listo, sube a GitHub y Streamlit Cloud\n")
 
 print(f"{BOLD}Dashboard Information:{RESET}")
-print(f"  • Registros: {len(df):,}")
-print(f"  • Período: {df['InvoiceDate'].min()} a {df['InvoiceDate'].max()}")
-print(f"  • Países: {df['Country'].nunique()}")
-print(f"  • Clientes únicos: {df['CustomerID'].nunique():,}")
-print(f"  • Productos únicos: {df['Description'].nunique():,}\n")
+print(f"  • Registros: {filas_totales:,}")
+print(f"  • Período: {fecha_min} a {fecha_max}")
+print(f"  • Países: {len(paises)}")
+print(f"  • Clientes únicos: {len(clientes):,}")
+print(f"  • Productos únicos: {len(productos):,}\n")
 
 print(f"{GREEN}🎉 ¡Todo listo para producción! 🎉{RESET}\n")
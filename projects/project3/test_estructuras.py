@@ -0,0 +1,535 @@
+"""
+═════════════════════════════════════════════════════════════════════════════
+    PRUEBAS DE LAS ESTRUCTURAS DEL CAMINO DE DATOS
+
+    Cada estructura se compara con el mismo cálculo hecho directamente con
+    pandas sobre un CSV sintético pequeño (benchmark.generar_csv):
+    • Cubo e índice leídos de disco contra los recién construidos
+    • Cubo: seleccionar() contra máscaras de pandas
+    • Índice: posiciones contra máscaras
+    • Ingesta incremental: fusión de cubos y sketches, ampliar() del
+      índice, cuarentena y facturas repartidas entre lotes
+    • consolidar_partes contra concatenar
+    • Formato de descarga
+    • LTTB
+    • HyperLogLog: error dentro de la cota
+    • Top-K (Threshold Algorithm) contra groupby + nlargest
+    • SQLite contra memoria con los mismos filtros
+    • Proyección Fourier
+    • Pliegues del backtesting
+
+    Uso (desde projects/project3):
+        python -m pytest -q test_estructuras.py
+═════════════════════════════════════════════════════════════════════════════
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from almacen import (cargar_dataset, concatenar, consolidar_partes, escribir_arrow, leer_arrow,
+                     rutas_cache)
+from analitica import (Filtros, aplicar_filtros, calcular_kpis, cargar_memoria, cargar_sqlite,
+                       evolucion, ingresos_por_pais, ranking_clientes, ranking_productos,
+                       ventas_por_dia_semana)
+from benchmark import generar_csv
+from cubo import CuboVentas, cargar_cubo
+from exportar import COLUMNAS_DESCARGA, formato_descarga
+from hll import SketchesParticionados, error_estandar, hash_valores
+from indice import IndiceVentas
+from ingesta import AlmacenIncremental
+from proyeccion import MIN_DIAS, ModeloFourier, proyectar
+from render import lttb, reducir_serie
+from rfm import FeaturesRFM
+from topk import MEDIDAS, TopK
+from validacion import cortes, pronostico_fourier, validar
+
+FILAS = 20_000
+
+K = 10
+
+# Desviaciones estándar del HLL admitidas (más 1 para conteos pequeños)
+SIGMAS = 4
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+# DATOS DE PRUEBA
+# ═════════════════════════════════════════════════════════════════════════════
+
+@pytest.fixture(scope='module')
+def directorio(tmp_path_factory):
+    return tmp_path_factory.mktemp('estructuras')
+
+
+@pytest.fixture(scope='module')
+def csv(directorio):
+    return generar_csv(directorio / 'data.csv', FILAS)
+
+
+@pytest.fixture(scope='module')
+def df(csv, directorio):
+    return cargar_dataset(csv, directorio / '.cache', procesos=1)
+
+
+def escenarios(df):
+    """Filtros (país, inicio, fin, cantidad mínima) en límites de día."""
+    inicio = df['InvoiceDate'].min().normalize()
+    fin = df['InvoiceDate'].max().normalize() + pd.Timedelta(days=1)
+    dia = pd.Timedelta(days=1)
+    return [
+        (None, inicio, fin, 1),
+        ('France', inicio, fin, 1),
+        (None, inicio + 40 * dia, fin - 60 * dia, 1),
+        ('Germany', inicio + 40 * dia, fin - 60 * dia, 1),
+        (None, inicio, fin, 5),
+        ('United Kingdom', inicio + 10 * dia, inicio + 50 * dia, 3),
+    ]
+
+
+def mascara(df, pais, inicio, fin, cantidad_min):
+    filas = (df['InvoiceDate'] >= inicio) & (df['InvoiceDate'] < fin) & (df['Quantity'] >= cantidad_min)
+    if pais is not None:
+        filas &= df['Country'] == pais
+    return filas.to_numpy()
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+# HYPERLOGLOG
+# ═════════════════════════════════════════════════════════════════════════════
+
+def test_hll_error_dentro_de_la_cota():
+    rng = np.random.default_rng(0)
+    p = 12
+    for n in (500, 5_000, 50_000):
+        valores = rng.choice(10 ** 9, n, replace=False)
+        sketches = SketchesParticionados.desde_valores(np.zeros(n, dtype=np.int64), valores, 1, p)
+        assert abs(sketches.contar([0]) - n) <= SIGMAS * error_estandar(p) * n
+
+
+def test_hll_fusion_de_particiones():
+    rng = np.random.default_rng(1)
+    valores = rng.integers(0, 20_000, 60_000)
+    particion = rng.integers(0, 10, 60_000)
+    sketches = SketchesParticionados.desde_valores(particion, valores, 10)
+
+    elegidas = [1, 3, 5, 7]
+    exacto = len(np.unique(valores[np.isin(particion, elegidas)]))
+    assert abs(sketches.contar(elegidas) - exacto) <= SIGMAS * error_estandar(sketches.p) * exacto
+
+    # Fusionar dos mitades da exactamente los mismos registros que todo junto
+    mitad = len(valores) // 2
+    a = SketchesParticionados.desde_valores(particion[:mitad], valores[:mitad], 10)
+    b = SketchesParticionados.desde_valores(particion[mitad:], valores[mitad:], 10)
+    fusion = a.fusionar_con(b, np.arange(10), np.arange(10), 10)
+    assert np.array_equal(fusion.registro, sketches.registro)
+    assert np.array_equal(fusion.rho, sketches.rho)
+    assert np.array_equal(fusion.offsets, sketches.offsets)
+
+
+def test_hll_textos_enteros():
+    # Un código de factura numérico cae en el mismo registro sea int o texto
+    categorias = hash_valores(pd.Categorical(['536365', 'C536379', '007']))
+    assert categorias[0] == hash_valores(np.array([536365], dtype=np.int32))[0]
+    assert categorias[1] == hash_valores(np.array(['C536379'], dtype=object))[0]
+    assert categorias[2] == hash_valores(np.array(['007'], dtype=object))[0]
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+# CUBO E ÍNDICE
+# ═════════════════════════════════════════════════════════════════════════════
+
+def test_cubo_seleccionar_igual_a_pandas(df):
+    cubo = CuboVentas.desde_transacciones(df)
+    for escenario in escenarios(df):
+        seleccion = cubo.seleccionar(*escenario)
+        ref = df[mascara(df, *escenario)]
+        metricas = seleccion.metricas()
+
+        assert seleccion.filas == len(ref)
+        assert metricas['ingresos_totales'] == pytest.approx(ref['TotalPrice'].sum())
+        assert metricas['cantidad_promedio'] == pytest.approx(ref['Quantity'].mean())
+        for clave, columna in (('pedidos_totales', 'InvoiceNo'), ('clientes_unicos', 'CustomerID'),
+                               ('cantidad_productos', 'Description')):
+            exacto = ref[columna].nunique()
+            assert abs(metricas[clave] - exacto) <= SIGMAS * cubo.error * exacto + 1
+
+        por_mes = seleccion.por_mes()
+        ref_mes = ref.groupby('MonthCode').agg(Ingresos=('TotalPrice', 'sum'), Filas=('TotalPrice', 'size'))
+        assert np.array_equal(por_mes['Mes'], ref_mes.index)
+        assert np.array_equal(por_mes['Filas'], ref_mes['Filas'])
+        assert np.allclose(por_mes['Ingresos'], ref_mes['Ingresos'])
+
+        ref_pais = ref.groupby('Country', observed=True)['TotalPrice'].sum()
+        assert seleccion.por_pais().to_dict() == pytest.approx(ref_pais.to_dict())
+
+
+def test_kpis_estimados_por_defecto(df, csv, directorio):
+    # HyperLogLog por defecto; exactos=True cuenta sobre las transacciones
+    fuente = cargar_memoria(str(csv), directorio=str(directorio / '.cache'))
+    for pais, inicio, fin, cantidad_min in escenarios(df):
+        consulta = aplicar_filtros(fuente, Filtros(inicio, fin, pais, cantidad_min))
+        assert calcular_kpis(consulta) == consulta.seleccion.metricas()
+        ref = df[mascara(df, pais, inicio, fin, cantidad_min)]
+        exactos = calcular_kpis(consulta, exactos=True)
+        assert exactos['pedidos_totales'] == ref['InvoiceNo'].nunique()
+        assert exactos['clientes_unicos'] == ref['CustomerID'].nunique()
+        assert exactos['cantidad_productos'] == ref['Description'].nunique()
+
+
+def test_cubo_fusionar_igual_al_completo(df):
+    completo = CuboVentas.desde_transacciones(df)
+    mitad = len(df) // 2
+    fusion = (CuboVentas.desde_transacciones(df.iloc[:mitad])
+              .fusionar(CuboVentas.desde_transacciones(df.iloc[mitad:])))
+
+    for columna in ['Dia', 'Bucket', 'Filas', 'Cantidad', 'Mes', 'DiaSemana']:
+        assert np.array_equal(fusion.tabla[columna], completo.tabla[columna])
+    assert np.array_equal(fusion.tabla['Country'].astype(str), completo.tabla['Country'].astype(str))
+    assert np.allclose(fusion.tabla['Ingresos'], completo.tabla['Ingresos'])
+    for nombre in CuboVentas.SKETCHES:
+        a, b = getattr(fusion, nombre), getattr(completo, nombre)
+        assert np.array_equal(a.registro, b.registro) and np.array_equal(a.rho, b.rho)
+    for escenario in escenarios(df):
+        assert fusion.seleccionar(*escenario).metricas() == pytest.approx(
+            completo.seleccionar(*escenario).metricas())
+
+
+def _filas(posiciones, n):
+    return np.arange(n)[posiciones] if isinstance(posiciones, slice) else posiciones
+
+
+def test_indice_igual_a_mascara(df):
+    indice = IndiceVentas(df)
+    for escenario in escenarios(df):
+        esperado = np.flatnonzero(mascara(df, *escenario))
+        assert np.array_equal(_filas(indice.posiciones(*escenario), len(df)), esperado)
+
+
+def test_cubo_e_indice_guardados(df, tmp_path):
+    cubo = CuboVentas.desde_transacciones(df)
+    cubo.guardar(tmp_path / 'cubo')
+    cubo_cargado = CuboVentas.cargar(tmp_path / 'cubo')
+    pd.testing.assert_frame_equal(cubo_cargado.tabla, cubo.tabla)
+
+    indice = IndiceVentas(df)
+    indice.guardar(tmp_path / 'indice.arrow')
+    indice_cargado = IndiceVentas.cargar(tmp_path / 'indice.arrow', df)
+    for escenario in escenarios(df):
+        assert cubo_cargado.seleccionar(*escenario).metricas() == cubo.seleccionar(*escenario).metricas()
+        assert np.array_equal(_filas(indice_cargado.posiciones(*escenario), len(df)),
+                              _filas(indice.posiciones(*escenario), len(df)))
+
+
+@pytest.mark.parametrize('manifiesto', ['', '{roto'])
+def test_derivado_sin_manifiesto(df, csv, tmp_path, manifiesto):
+    # Sin manifiesto del caché (o ilegible) se recalcula en lugar de fallar
+    cargar_dataset(csv, tmp_path, procesos=1)
+    _, ruta_manifiesto = rutas_cache(csv, tmp_path)
+    if manifiesto:
+        ruta_manifiesto.write_text(manifiesto)
+    else:
+        ruta_manifiesto.unlink()
+    cubo = cargar_cubo(csv, tmp_path, df)
+    pd.testing.assert_frame_equal(cubo.tabla, CuboVentas.desde_transacciones(df).tabla)
+    assert not list(tmp_path.glob('*.cubo*'))
+
+
+def test_indice_ampliar_igual_a_reconstruir(df):
+    corte = int(np.searchsorted(df['InvoiceDate'].to_numpy(), np.datetime64('2011-06-01')))
+    ampliado = IndiceVentas(df.iloc[:corte]).ampliar(df.iloc[corte:])
+    completo = IndiceVentas(df)
+    assert np.array_equal(ampliado.fechas, completo.fechas)
+    assert ampliado.paises.keys() == completo.paises.keys()
+    for pais, filas in completo.paises.items():
+        assert np.array_equal(ampliado.paises[pais], filas)
+
+    with pytest.raises(ValueError):
+        IndiceVentas(df.iloc[corte:]).ampliar(df.iloc[:corte])
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+# TOP-K
+# ═════════════════════════════════════════════════════════════════════════════
+
+@pytest.mark.parametrize('entidad', ['Description', 'CustomerID'])
+def test_topk_igual_a_groupby(df, entidad, tmp_path):
+    topk = TopK.desde_transacciones(df, entidad)
+    mitad = len(df) // 2
+    fusion = (TopK.desde_transacciones(df.iloc[:mitad], entidad)
+              .fusionar(TopK.desde_transacciones(df.iloc[mitad:], entidad)))
+    topk.guardar(tmp_path / 'topk')
+    cargado = TopK.cargar(tmp_path / 'topk', entidad)
+
+    # Además de los escenarios: dentro de un solo mes y meses completos
+    dia = pd.Timedelta(days=1)
+    rangos = [(pais, inicio, fin) for pais, inicio, fin, cantidad_min in escenarios(df)
+              if cantidad_min == 1]  # Las sumas parciales son de todas las filas
+    rangos += [('United Kingdom', pd.Timestamp('2011-03-05'), pd.Timestamp('2011-03-20')),
+               (None, pd.Timestamp('2011-02-01'), pd.Timestamp('2011-05-01'))]
+    for pais, inicio, fin in rangos:
+        seleccion = df[mascara(df, pais, inicio, fin, 1)]
+        ref = seleccion.groupby(entidad, observed=True).agg(
+            Cantidad=('Quantity', 'sum'), Ingresos=('TotalPrice', 'sum'), Filas=('Quantity', 'size'))
+        for medida in MEDIDAS:
+            resultado = topk.consultar(pais, inicio, fin, medida, K, seleccion)
+            esperado = ref[medida].nlargest(K).to_numpy(dtype=np.float64)
+            assert np.allclose(resultado[medida].to_numpy(dtype=np.float64), esperado)
+            # Los totales de cada entidad devuelta son los exactos
+            totales = ref.loc[resultado[entidad], MEDIDAS].to_numpy(dtype=np.float64)
+            assert np.allclose(resultado[MEDIDAS].to_numpy(dtype=np.float64), totales)
+
+            for otro in (fusion, cargado):
+                assert np.allclose(otro.consultar(pais, inicio, fin, medida, K, seleccion)[medida]
+                                   .to_numpy(dtype=np.float64), esperado)
+
+    # Meses completos: no hacen falta las transacciones; días sueltos, sí
+    pd.testing.assert_frame_equal(topk.consultar(*rangos[-1], 'Ingresos', K),
+                                  topk.consultar(*rangos[-1], 'Ingresos', K, df))
+    with pytest.raises(ValueError):
+        topk.consultar(None, pd.Timestamp('2011-02-01'), pd.Timestamp('2011-02-15') + dia, 'Ingresos', K)
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+# SQLITE CONTRA MEMORIA
+# ═════════════════════════════════════════════════════════════════════════════
+
+def test_sqlite_igual_a_memoria(df, csv, directorio):
+    memoria = cargar_memoria(str(csv), directorio=str(directorio / '.cache'))
+    sqlite = cargar_sqlite(str(csv), directorio=str(directorio / '.cache'))
+    try:
+        for pais, inicio, fin, cantidad_min in escenarios(df):
+            filtros = Filtros(inicio, fin, pais, cantidad_min)
+            en_memoria, en_sqlite = aplicar_filtros(memoria, filtros), aplicar_filtros(sqlite, filtros)
+
+            assert calcular_kpis(en_memoria, True) == pytest.approx(calcular_kpis(en_sqlite, True))
+            pd.testing.assert_frame_equal(evolucion(en_memoria), evolucion(en_sqlite), check_dtype=False)
+            pd.testing.assert_frame_equal(ingresos_por_pais(en_memoria), ingresos_por_pais(en_sqlite),
+                                          check_dtype=False, check_categorical=False)
+            assert np.allclose(ventas_por_dia_semana(en_memoria), ventas_por_dia_semana(en_sqlite))
+            for ranking, medida in ((ranking_productos, 'Quantity'), (ranking_clientes, 'TotalPrice')):
+                assert np.allclose(ranking(en_memoria, K)[medida].to_numpy(dtype=np.float64),
+                                   ranking(en_sqlite, K)[medida].to_numpy(dtype=np.float64))
+    finally:
+        sqlite.base.pool.cerrar()
+
+
+def test_sqlite_descarga_igual_a_memoria(df, csv, directorio):
+    # Las transacciones con la misma fecha salen en el mismo orden
+    memoria = cargar_memoria(str(csv), directorio=str(directorio / '.cache'))
+    sqlite = cargar_sqlite(str(csv), directorio=str(directorio / '.cache'))
+    assert df['InvoiceDate'].duplicated().any()
+    try:
+        for pais, inicio, fin, cantidad_min in escenarios(df):
+            filtros = Filtros(inicio, fin, pais, cantidad_min)
+            en_memoria = aplicar_filtros(memoria, filtros).transacciones_exportables()
+            en_sqlite = aplicar_filtros(sqlite, filtros).transacciones_exportables()
+            pd.testing.assert_frame_equal(formato_descarga(en_sqlite.reset_index(drop=True)),
+                                          formato_descarga(en_memoria.reset_index(drop=True)),
+                                          check_dtype=False, check_categorical=False)
+    finally:
+        sqlite.base.pool.cerrar()
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+# INGESTA INCREMENTAL
+# ═════════════════════════════════════════════════════════════════════════════
+
+def test_ingesta_incremental(df, csv, tmp_path):
+    crudo = pd.read_csv(csv, dtype=str)
+    meses = pd.to_datetime(crudo['InvoiceDate'], format='%m/%d/%Y %H:%M').dt.to_period('M')
+    entrada = tmp_path / 'datos'
+    entrada.mkdir()
+
+    # Tres archivos consecutivos: el segundo y el tercero amplían el índice
+    tramos = [meses < '2011-04', (meses >= '2011-04') & (meses < '2011-08'), meses >= '2011-08']
+    crudo[tramos[0]].to_csv(entrada / 'parte1.csv', index=False)
+    almacen = AlmacenIncremental(entrada, tmp_path / '.cache')
+
+    crudo[tramos[1]].to_csv(entrada / 'parte2.csv', index=False)
+    (entrada / 'roto.csv').write_text('a,b\n1,2\n')
+    cambios = almacen.sincronizar()
+    assert cambios['nuevos'] == ['parte2.csv']
+    assert cambios['cuarentena'] == ['roto.csv']
+    assert list(almacen.cuarentena()) == ['roto.csv']
+
+    # Un archivo en cuarentena no se reintenta mientras no cambie
+    version = almacen.version
+    assert not any(almacen.sincronizar().values())
+    assert almacen.version == version
+
+    crudo[tramos[2]].to_csv(entrada / 'parte3.csv', index=False)
+    almacen.sincronizar()
+    estado = almacen.estado()
+    assert len(estado['df']) == len(df)
+    assert estado['df']['TotalPrice'].sum() == pytest.approx(df['TotalPrice'].sum())
+
+    completo = IndiceVentas(estado['df'])
+    for pais, filas in completo.paises.items():
+        assert np.array_equal(estado['indice'].paises[pais], filas)
+    cubo = CuboVentas.desde_transacciones(df)
+    for escenario in escenarios(df):
+        assert estado['cubo'].seleccionar(*escenario).metricas() == pytest.approx(
+            cubo.seleccionar(*escenario).metricas())
+    pd.testing.assert_frame_equal(estado['rfm'].clientes(), FeaturesRFM.desde_transacciones(df).clientes(),
+                                  check_dtype=False, check_categorical=False)
+
+    # Al corregirse, el archivo sale de la cuarentena y se ingiere
+    crudo[tramos[0]].head(100).to_csv(entrada / 'roto.csv', index=False)
+    cambios = almacen.sincronizar()
+    assert cambios['nuevos'] == ['roto.csv']
+    assert almacen.cuarentena() == {}
+    assert len(almacen.estado()['df']) > len(df)
+
+
+def test_rfm_factura_entre_dos_lotes(df):
+    # Una factura repartida entre dos lotes se suma, sin crear combinaciones
+    # (cliente, factura) que no existen cuando InvoiceNo es category
+    df = df.assign(InvoiceNo=df['InvoiceNo'].astype(str).astype('category'))
+    mitad = len(df) // 2
+    df.loc[df.index[mitad], 'InvoiceNo'] = df['InvoiceNo'].iloc[mitad - 1]
+    df.loc[df.index[mitad], 'CustomerID'] = df['CustomerID'].iloc[mitad - 1]
+
+    actualizado = FeaturesRFM.desde_transacciones(df.iloc[:mitad]).actualizar(df.iloc[mitad:])
+    completo = FeaturesRFM.desde_transacciones(df)
+    assert len(actualizado.facturas) == len(completo.facturas)
+    pd.testing.assert_frame_equal(actualizado.clientes(), completo.clientes(),
+                                  check_dtype=False, check_categorical=False)
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+# ALMACÉN Y EXPORTACIÓN
+# ═════════════════════════════════════════════════════════════════════════════
+
+@pytest.mark.parametrize('invertir', [False, True])
+def test_consolidar_partes_igual_a_concatenar(df, tmp_path, invertir):
+    # Cada parte con sus propias categorías, como las de escribir_en_paralelo
+    partes = [df.iloc[i:i + 4_000].reset_index(drop=True) for i in range(0, len(df), 4_000)]
+    partes = [p.assign(Country=p['Country'].cat.remove_unused_categories()) for p in partes]
+    if invertir:
+        partes = partes[::-1]
+    rutas = []
+    for i, parte in enumerate(partes):
+        rutas.append(tmp_path / f'parte{i}.arrow')
+        escribir_arrow(parte, rutas[-1])
+
+    filas = consolidar_partes(rutas, tmp_path / 'unido.arrow', tamano_bloque=3_000)
+    assert filas == len(df)
+    pd.testing.assert_frame_equal(leer_arrow(tmp_path / 'unido.arrow'),
+                                  concatenar([leer_arrow(r) for r in rutas]))
+
+
+def test_formato_descarga(df):
+    bloque = df.iloc[:1_000]
+    descarga = formato_descarga(bloque)
+    assert list(descarga.columns) == COLUMNAS_DESCARGA
+    assert 'MonthCode' in bloque.columns
+    # Los mismos textos que calculaba el dashboard original
+    fechas = bloque['InvoiceDate']
+    for columna, esperado in (('YearMonth', fechas.dt.to_period('M').astype(str)),
+                              ('Month', fechas.dt.strftime('%Y-%m')),
+                              ('DayOfWeek', fechas.dt.day_name())):
+        assert descarga[columna].dtype == object
+        assert np.array_equal(descarga[columna], esperado)
+    for columna in ['InvoiceNo', 'Description', 'Quantity', 'InvoiceDate', 'CustomerID', 'TotalPrice']:
+        assert descarga[columna].equals(bloque[columna])
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+# RENDER
+# ═════════════════════════════════════════════════════════════════════════════
+
+def test_lttb_extremos_y_tamano():
+    rng = np.random.default_rng(2)
+    x = np.arange(5_000)
+    y = rng.normal(size=5_000).cumsum()
+    y[2_500] = 1e6
+    for n_puntos in (3, 10, 1_000):
+        elegidos = lttb(x, y, n_puntos)
+        assert len(elegidos) == n_puntos
+        assert elegidos[0] == 0 and elegidos[-1] == len(x) - 1
+        assert (np.diff(elegidos) > 0).all()
+    # El pico siempre sobrevive
+    assert 2_500 in lttb(x, y, 100)
+    assert np.array_equal(lttb(x[:50], y[:50], 100), np.arange(50))
+
+    serie = pd.DataFrame({'Dia': x, 'Ingresos': y, 'Filas': x * 2})
+    reducida = reducir_serie(serie, 'Dia', 'Ingresos', 200)
+    assert len(reducida) == 200
+    assert (reducida['Filas'] == reducida['Dia'] * 2).all()
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+# PROYECCIÓN
+# ═════════════════════════════════════════════════════════════════════════════
+
+def _serie_sintetica(dias):
+    t = dias - 15_000
+    return 100 + 0.5 * t + 20 * np.sin(2 * np.pi * dias / 7) + 10 * np.cos(4 * np.pi * dias / 7)
+
+
+def test_fourier_recupera_tendencia_y_estacionalidad():
+    dias = np.arange(15_000, 15_400)
+    futuro = np.arange(15_400, 15_430)
+    modelo = ModeloFourier().ajustar(dias, _serie_sintetica(dias))
+    yhat, inferior, superior = modelo.predecir(futuro)
+    # La penalización ridge encoge un poco las amplitudes de Fourier
+    assert np.allclose(yhat, _serie_sintetica(futuro), atol=1.0)
+    assert (inferior <= yhat).all() and (yhat <= superior).all()
+
+    # Varias series en un solo ajuste = cada una por separado
+    y = _serie_sintetica(dias)
+    conjunto = ModeloFourier().ajustar(dias, np.column_stack([y, 2 * y + 5])).predecir(futuro)[0]
+    separado = ModeloFourier().ajustar(dias, 2 * y + 5).predecir(futuro)[0]
+    assert np.allclose(conjunto[:, 1], separado)
+
+
+def test_proyectar_dias_sin_ventas():
+    dias = np.arange(15_000, 15_400)
+    por_dia = pd.DataFrame({'Dia': dias, 'Ingresos': _serie_sintetica(dias)})
+    # Los días que faltan cuentan como 0: quitarlos cambia la proyección
+    completa = proyectar(por_dia, horizonte=14)
+    con_huecos = proyectar(por_dia.iloc[::2], horizonte=14)
+    assert len(completa) == 14 and completa['Dia'].iloc[0] == dias[-1] + 1
+    assert con_huecos['yhat'].mean() < completa['yhat'].mean()
+    assert proyectar(por_dia.head(MIN_DIAS - 1)) is None
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+# BACKTESTING
+# ═════════════════════════════════════════════════════════════════════════════
+
+def test_cortes_de_los_pliegues():
+    assert cortes(400, horizonte=90, n_pliegues=5, paso=30) == [190, 220, 250, 280, 310]
+    assert cortes(300, horizonte=90, n_pliegues=5, paso=30) == [180, 210]
+    assert cortes(200, horizonte=90) == []
+
+
+def test_validar_pliegues(tmp_path):
+    fechas = pd.date_range('2011-01-01', periods=400, freq='D')
+    dias = fechas.values.astype('datetime64[D]').astype(np.int64)
+    serie = pd.Series(_serie_sintetica(dias) + np.random.default_rng(3).normal(0, 5, 400), index=fechas)
+    horizonte = 30
+    modelos = ['Fourier', 'Ingenuo semanal']
+
+    resultado = validar(serie, modelos, horizonte=horizonte, n_pliegues=3, paso=30,
+                        procesos=1, directorio=tmp_path)
+    predicciones = resultado.predicciones
+    for corte in cortes(len(serie), horizonte, 3, 30):
+        real = serie.iloc[corte:corte + horizonte]
+        for nombre in modelos:
+            pliegue = predicciones[(predicciones['Modelo'] == nombre)
+                                   & (predicciones['Corte'] == real.index[0])]
+            assert list(pliegue['Horizonte']) == list(range(1, horizonte + 1))
+            assert np.array_equal(pliegue['y'], real.to_numpy())
+        ingenuo = predicciones[(predicciones['Modelo'] == 'Ingenuo semanal')
+                               & (predicciones['Corte'] == real.index[0])]
+        assert np.array_equal(ingenuo['yhat'], np.resize(serie.iloc[corte - 7:corte], horizonte))
+        fourier = predicciones[(predicciones['Modelo'] == 'Fourier') & (predicciones['Corte'] == real.index[0])]
+        historia = serie.iloc[:corte]
+        assert np.allclose(fourier['yhat'], pronostico_fourier(historia.index, historia.to_numpy(), horizonte))
+
+    # La segunda validación reutiliza todos los pliegues guardados
+    repetida = validar(serie, modelos, horizonte=horizonte, n_pliegues=3, paso=30,
+                       procesos=1, directorio=tmp_path)
+    assert (repetida.costos['Reutilizados'] == repetida.costos['Pliegues']).all()
+    pd.testing.assert_frame_equal(repetida.predicciones, predicciones)
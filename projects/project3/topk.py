@@ -0,0 +1,452 @@
+"""
+═════════════════════════════════════════════════════════════════════════════
+    TOP-K EXACTO SOBRE SUMAS PARCIALES (THRESHOLD ALGORITHM)
+
+    Al cargar los datos se precalculan sumas parciales por entidad
+    (producto, cliente...) en dos niveles: Mes × País y Mes (todos los
+    países).
+
+    Un rango de fechas se cubre con los meses completos que contiene; los
+    días sueltos de los extremos se suman en el momento a partir de las
+    transacciones de la selección (como mucho dos meses parciales), así
+    que cada consulta combina pocas listas. Cada lista está ordenada de
+    mayor a menor y el top-K se obtiene con el Threshold Algorithm de
+    Fagin: se leen las listas en profundidad creciente, se calcula el
+    total exacto de las entidades vistas y se para cuando el K-ésimo total
+    supera la cota de lo que queda sin leer. El resultado es exacto sin
+    agregar todas las entidades.
+
+    Memoria: cada nivel guarda una fila por (mes[, país], entidad) con las
+    tres medidas y cinco índices int32 (~40 B por fila). Un nivel diario
+    por país tendría casi una fila por transacción (tan grande como el
+    propio dataset), por eso no se precalcula. Los niveles se guardan
+    junto al caché Arrow (cargar_topk) y se abren con memory-map al
+    arrancar.
+
+    Las sumas son de todas las filas: con una cantidad mínima por
+    transacción (cantidad_min > 1) el ranking se agrega sobre las
+    transacciones filtradas (analitica.graficos).
+═════════════════════════════════════════════════════════════════════════════
+"""
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from almacen import (
+    DIRECTORIO_CACHE,
+    cargar_dataset,
+    cargar_derivado,
+    escribir_arrow,
+    leer_arrow,
+)
+from fechas import limite_dia, mes_de_dia, primer_dia_mes
+from hll import rangos
+
+K_DEFECTO = 10
+
+MEDIDAS = ['Cantidad', 'Ingresos', 'Filas']
+
+# Tipos con que se guardan las sumas parciales (se agregan en int64)
+TIPOS_MEDIDAS = {'Cantidad': np.int32, 'Ingresos': np.float64, 'Filas': np.int32}
+
+# (periodo, por país)
+NIVELES = [('Mes', True), ('Mes', False)]
+
+
+class _Nivel:
+    """
+    Sumas parciales de un nivel con tres índices:
+    • acceso ordenado: por partición, de mayor a menor valor de cada medida
+    • acceso aleatorio: todas las filas de cada entidad o de cada partición
+
+    Todo vive en un DataFrame `datos` con una fila por (periodo[, país],
+    entidad) y columnas int32 (salvo Ingresos), que se guarda y se abre
+    con memory-map como el caché de transacciones. Se construye con
+    _Nivel.desde_tabla; las cotas por partición se recalculan al abrirlo.
+    """
+
+    def __init__(self, datos, n_entidades):
+        self.datos = datos
+        self.particion = datos['Particion'].to_numpy()
+        self.entidad = datos['Entidad'].to_numpy()
+        self.valores = {m: datos[m].to_numpy() for m in MEDIDAS}
+        self.orden = {m: datos['Orden' + m].to_numpy() for m in MEDIDAS}
+        self.por_particion = datos['PorParticion'].to_numpy()
+        self.por_entidad = datos['PorEntidad'].to_numpy()
+
+        n_particiones = int(self.particion.max()) + 1 if len(self.particion) else 0
+        self.offsets = np.concatenate(
+            [[0], np.cumsum(np.bincount(self.particion, minlength=n_particiones))])
+        self.offsets_entidad = np.concatenate(
+            [[0], np.cumsum(np.bincount(self.entidad, minlength=n_entidades))])
+
+        # Periodo y país de cada partición: los de su primera fila
+        primeras = self.por_particion[self.offsets[:-1]]
+        self.periodo = datos['Periodo'].to_numpy()[primeras].astype(np.int64)
+        self.pais = datos['Country'].iloc[primeras].reset_index(drop=True) if 'Country' in datos else None
+
+    @classmethod
+    def desde_tabla(cls, tabla, n_entidades):
+        """Calcula los índices de una tabla de _agregar_niveles."""
+        claves = ['Periodo'] + (['Country'] if 'Country' in tabla.columns else [])
+        particion = tabla.groupby(claves, observed=True, sort=True).ngroup().to_numpy()
+        entidad = tabla['Entidad'].to_numpy()
+        # Los índices caben en int32: la mitad de memoria que los int64 de argsort
+        datos = tabla[claves].copy()
+        datos['Periodo'] = datos['Periodo'].astype(np.int32)
+        datos['Particion'] = particion.astype(np.int32)
+        datos['Entidad'] = entidad.astype(np.int32)
+        for m in MEDIDAS:
+            datos[m] = tabla[m].to_numpy(dtype=TIPOS_MEDIDAS[m])
+        for m in MEDIDAS:
+            datos['Orden' + m] = np.lexsort((-tabla[m].to_numpy(), particion)).astype(np.int32)
+        datos['PorParticion'] = np.argsort(particion, kind='stable').astype(np.int32)
+        datos['PorEntidad'] = np.argsort(entidad, kind='stable').astype(np.int32)
+        return cls(datos.reset_index(drop=True), n_entidades)
+
+    def tabla(self):
+        """Sumas parciales (Periodo[, Country], Entidad y medidas), para fusionar."""
+        columnas = ['Periodo'] + (['Country'] if self.pais is not None else []) + ['Entidad'] + MEDIDAS
+        return self.datos[columnas]
+
+    def mascara(self, inicio, fin, pais=None):
+        """Particiones con periodo en [inicio, fin) y del país."""
+        mascara = (self.periodo >= inicio) & (self.periodo < fin)
+        if pais is not None:
+            mascara &= (self.pais == pais).to_numpy()
+        return mascara
+
+    def filas(self, particiones, profundidad=None):
+        """Filas de las particiones (hasta `profundidad` por partición)."""
+        largos = self.offsets[particiones + 1] - self.offsets[particiones]
+        if profundidad is not None:
+            largos = np.minimum(largos, profundidad)
+        return int(largos.sum())
+
+    def sumas(self, particiones, n_entidades):
+        """Suma de cada medida para todas las entidades en las particiones."""
+        filas = self.por_particion[rangos(self.offsets[particiones], self.offsets[particiones + 1])]
+        entidad = self.entidad[filas]
+        return {m: np.bincount(entidad, weights=v[filas], minlength=n_entidades)
+                for m, v in self.valores.items()}
+
+    def acceso_ordenado(self, particiones, medida, profundidad):
+        """
+        Entidades de las primeras `profundidad` posiciones de cada lista.
+
+        Retorna:
+        --------
+        tuple(np.ndarray, float, bool)
+            Entidades vistas, cota de cualquier entidad no vista (suma del
+            siguiente valor de cada lista) y si todas las listas se agotaron
+        """
+        inicio = self.offsets[particiones]
+        fin = self.offsets[particiones + 1]
+        filas = self.orden[medida][rangos(inicio, np.minimum(inicio + profundidad, fin))]
+
+        siguiente = inicio + profundidad
+        pendientes = siguiente < fin
+        cota = self.valores[medida][self.orden[medida][siguiente[pendientes]]].sum()
+        return self.entidad[filas], float(cota), not pendientes.any()
+
+    def totales(self, mascara, particiones, candidatos, posicion):
+        """
+        Suma exacta de cada medida para los candidatos en las particiones.
+
+        `posicion` da, para cada entidad, su índice en `candidatos` (o -1).
+        """
+        # Se recorre lo más corto: las filas de los candidatos o las de la selección
+        inicio_e = self.offsets_entidad[candidatos]
+        fin_e = self.offsets_entidad[candidatos + 1]
+        inicio_p = self.offsets[particiones]
+        fin_p = self.offsets[particiones + 1]
+        if (fin_e - inicio_e).sum() <= (fin_p - inicio_p).sum():
+            filas = self.por_entidad[rangos(inicio_e, fin_e)]
+            filas = filas[mascara[self.particion[filas]]]
+        else:
+            filas = self.por_particion[rangos(inicio_p, fin_p)]
+            filas = filas[posicion[self.entidad[filas]] >= 0]
+
+        indices = posicion[self.entidad[filas]]
+        return {m: np.bincount(indices, weights=v[filas], minlength=len(candidatos))
+                for m, v in self.valores.items()}
+
+
+class TopK:
+    """
+    Top-K exacto de una entidad por cantidad, ingresos o transacciones.
+
+    Se construye con TopK.desde_transacciones(df, 'Description') y se
+    combina con fusionar(), igual que CuboVentas.
+
+    Parámetros:
+    -----------
+    entidad : str
+        Columna de la entidad (nombre de la columna del resultado)
+    etiquetas : np.ndarray
+        Valor de cada código de entidad
+    niveles : dict
+        _Nivel de cada nivel de NIVELES
+    """
+
+    def __init__(self, entidad, etiquetas, niveles):
+        self.entidad = entidad
+        self.etiquetas = etiquetas
+        self.niveles = niveles
+        self._indice_etiquetas = None
+
+    @classmethod
+    def desde_tablas(cls, entidad, etiquetas, tablas):
+        """TopK a partir de las sumas parciales de _agregar_niveles."""
+        return cls(entidad, etiquetas,
+                   {nivel: _Nivel.desde_tabla(tabla, len(etiquetas)) for nivel, tabla in tablas.items()})
+
+    @classmethod
+    def desde_transacciones(cls, df, entidad):
+        """
+        Precalcula las sumas parciales de `entidad` en todos los niveles.
+
+        Parámetros:
+        -----------
+        df : pd.DataFrame
+            DataFrame limpio devuelto por load_data
+        entidad : str
+            Columna a rankear ('Description', 'CustomerID'...)
+        """
+        codigos, etiquetas = pd.factorize(df[entidad])
+        base = pd.DataFrame({
+            'Mes': df['MonthCode'].to_numpy(),
+            'Country': df['Country'],
+            'Entidad': codigos,
+            'Cantidad': df['Quantity'].to_numpy(dtype='int64'),
+            'Ingresos': df['TotalPrice'].to_numpy(),
+            'Filas': 1,
+        })
+        return cls.desde_tablas(entidad, np.asarray(etiquetas), _agregar_niveles(base))
+
+    def fusionar(self, otro):
+        """Nuevo TopK con las sumas parciales de ambos."""
+        codigos, etiquetas = pd.factorize(np.concatenate([self.etiquetas, otro.etiquetas]))
+        mapa_propio, mapa_otro = codigos[:len(self.etiquetas)], codigos[len(self.etiquetas):]
+
+        tablas = {}
+        for nivel in NIVELES:
+            propia, ajena = self.niveles[nivel].tabla().copy(), otro.niveles[nivel].tabla().copy()
+            propia['Entidad'] = mapa_propio[propia['Entidad'].to_numpy()]
+            ajena['Entidad'] = mapa_otro[ajena['Entidad'].to_numpy()]
+            if nivel[1]:
+                paises = pd.api.types.union_categoricals(
+                    [propia['Country'], ajena['Country']], ignore_order=True)
+                propia['Country'] = propia['Country'].cat.set_categories(paises.categories)
+                ajena['Country'] = ajena['Country'].cat.set_categories(paises.categories)
+            tablas[nivel] = pd.concat([propia, ajena], ignore_index=True)
+
+        return TopK.desde_tablas(self.entidad, np.asarray(etiquetas), _agregar_niveles(tablas))
+
+    def guardar(self, directorio):
+        """Guarda las etiquetas y cada nivel como archivos Arrow en `directorio`."""
+        directorio = Path(directorio)
+        directorio.mkdir(parents=True, exist_ok=True)
+        escribir_arrow(pd.DataFrame({'Etiqueta': self.etiquetas}), directorio / 'etiquetas.arrow')
+        archivos = {'etiquetas.arrow'}
+        for nivel in NIVELES:
+            archivos.add(_archivo_nivel(nivel))
+            escribir_arrow(self.niveles[nivel].datos, directorio / _archivo_nivel(nivel))
+        # Niveles que ya no se usan (los diarios de versiones anteriores)
+        for sobrante in directorio.glob('*.arrow'):
+            if sobrante.name not in archivos:
+                sobrante.unlink(missing_ok=True)
+
+    @classmethod
+    def cargar(cls, directorio, entidad):
+        """Abre un TopK guardado con guardar() (memory-map, sin recalcular)."""
+        directorio = Path(directorio)
+        etiquetas = leer_arrow(directorio / 'etiquetas.arrow')['Etiqueta'].to_numpy()
+        return cls(entidad, etiquetas,
+                   {nivel: _Nivel(leer_arrow(directorio / _archivo_nivel(nivel)), len(etiquetas))
+                    for nivel in NIVELES})
+
+    def consultar(self, pais, inicio, fin, medida, k=K_DEFECTO, transacciones=None):
+        """
+        Las k entidades con mayor `medida` en la selección.
+
+        Parámetros:
+        -----------
+        pais : str or None
+            País a filtrar (None = todos)
+        inicio, fin : pd.Timestamp
+            Rango de fechas [inicio, fin)
+        medida : str
+            'Cantidad', 'Ingresos' o 'Filas'
+        k : int
+            Número de entidades a devolver
+        transacciones : pd.DataFrame, opcional
+            Transacciones del mismo país y rango, ordenadas por fecha (las
+            de Consulta.transacciones). De ellas salen los días sueltos de
+            los extremos; solo pueden faltar si el rango son meses completos
+
+        Retorna:
+        --------
+        pd.DataFrame
+            Columnas [entidad, Cantidad, Ingresos, Filas], de mayor a menor
+        """
+        dia_inicio, dia_fin = limite_dia(inicio), limite_dia(fin)
+        seleccion, dias_meses = self._particiones(pais, dia_inicio, dia_fin)
+        if dias_meses != (dia_inicio, dia_fin):
+            if transacciones is None:
+                raise ValueError("El rango no son meses completos: hacen falta las transacciones "
+                                 "de la selección para los días de los extremos")
+            bordes = self._bordes(transacciones, dias_meses)
+            if bordes is not None:
+                seleccion.append((bordes, np.ones(1, dtype=bool), np.zeros(1, dtype=np.int64)))
+        if not seleccion:
+            return pd.DataFrame(columns=[self.entidad] + MEDIDAS)
+
+        n_filas = sum(nivel.filas(particiones) for nivel, _, particiones in seleccion)
+        candidatos = None
+        profundidad = k
+        while True:
+            # Si leer las listas hasta esta profundidad cuesta casi lo mismo
+            # que sumarlas enteras, se suman enteras
+            leidas = sum(nivel.filas(particiones, profundidad) for nivel, _, particiones in seleccion)
+            if 2 * leidas >= n_filas:
+                candidatos = np.arange(len(self.etiquetas))
+                totales = {m: np.zeros(len(candidatos)) for m in MEDIDAS}
+                for nivel, _, particiones in seleccion:
+                    for m, suma in nivel.sumas(particiones, len(candidatos)).items():
+                        totales[m] += suma
+                orden = np.argsort(-totales[medida], kind='stable')[:k]
+                orden = orden[totales['Filas'][orden] > 0]
+                break
+
+            vistos, cota, agotado = [], 0.0, True
+            for nivel, _, particiones in seleccion:
+                entidades, cota_nivel, agotado_nivel = nivel.acceso_ordenado(
+                    particiones, medida, profundidad)
+                vistos.append(entidades)
+                cota += cota_nivel
+                agotado &= agotado_nivel
+
+            candidatos = np.unique(np.concatenate(vistos))
+            posicion = np.full(len(self.etiquetas), -1, dtype=np.int64)
+            posicion[candidatos] = np.arange(len(candidatos))
+            totales = {m: np.zeros(len(candidatos)) for m in MEDIDAS}
+            for nivel, mascara, particiones in seleccion:
+                for m, suma in nivel.totales(mascara, particiones, candidatos, posicion).items():
+                    totales[m] += suma
+
+            orden = np.argsort(-totales[medida], kind='stable')[:k]
+            if agotado or (len(orden) == k and totales[medida][orden[-1]] >= cota):
+                break
+            profundidad *= 4
+
+        resultado = pd.DataFrame({self.entidad: self.etiquetas[candidatos[orden]]})
+        for m in MEDIDAS:
+            resultado[m] = totales[m][orden]
+        resultado['Cantidad'] = resultado['Cantidad'].astype('int64')
+        resultado['Filas'] = resultado['Filas'].astype('int64')
+        return resultado
+
+    def _particiones(self, pais, dia_inicio, dia_fin):
+        """
+        Particiones del nivel mensual con los meses completos de
+        [dia_inicio, dia_fin), y el rango de días que cubren esos meses.
+        """
+        mes_inicio = int(mes_de_dia(dia_inicio))
+        if primer_dia_mes(mes_inicio) < dia_inicio:
+            mes_inicio += 1
+        mes_fin = max(int(mes_de_dia(dia_fin)), mes_inicio)
+        dias_meses = (int(primer_dia_mes(mes_inicio)), int(primer_dia_mes(mes_fin)))
+
+        mensual = self.niveles[('Mes', pais is not None)]
+        mascara = mensual.mascara(mes_inicio, mes_fin, pais)
+        particiones = np.flatnonzero(mascara)
+        seleccion = [(mensual, mascara, particiones)] if len(particiones) else []
+        return seleccion, dias_meses
+
+    def _bordes(self, transacciones, dias_meses):
+        """
+        Sumas parciales de los días fuera de los meses completos, como un
+        _Nivel de una sola partición (o None si no hay transacciones).
+
+        Las transacciones están ordenadas por fecha: los días sueltos son
+        las filas antes y después de `dias_meses`.
+        """
+        dias = transacciones['DayCode'].to_numpy()
+        antes, despues = np.searchsorted(dias, dias_meses)
+        filas = np.concatenate([np.arange(antes), np.arange(despues, len(dias))])
+        if not len(filas):
+            return None
+
+        columna = transacciones[self.entidad].iloc[filas]
+        if self._indice_etiquetas is None:
+            self._indice_etiquetas = pd.Index(self.etiquetas)
+        if isinstance(columna.dtype, pd.CategoricalDtype):
+            codigos = self._indice_etiquetas.get_indexer(columna.cat.categories)[columna.cat.codes.to_numpy()]
+        else:
+            codigos = self._indice_etiquetas.get_indexer(columna.to_numpy())
+        if (codigos < 0).any():
+            raise ValueError(f"Las transacciones tienen valores de {self.entidad} que no están en el top-K")
+
+        entidades, posicion = np.unique(codigos, return_inverse=True)
+        tabla = pd.DataFrame({
+            'Periodo': 0,
+            'Entidad': entidades,
+            'Cantidad': np.bincount(posicion, weights=transacciones['Quantity'].to_numpy()[filas]),
+            'Ingresos': np.bincount(posicion, weights=transacciones['TotalPrice'].to_numpy()[filas]),
+            'Filas': np.bincount(posicion),
+        })
+        return _Nivel.desde_tabla(tabla, len(self.etiquetas))
+
+
+def _archivo_nivel(nivel):
+    periodo, por_pais = nivel
+    return f"{periodo}-pais.arrow" if por_pais else f"{periodo}.arrow"
+
+
+def cargar_topk(filepath, entidad, directorio=DIRECTORIO_CACHE, df=None):
+    """
+    TopK de `entidad` para el CSV, reutilizando el guardado si sigue vigente.
+
+    Los niveles se guardan junto al caché Arrow del CSV, en la carpeta
+    <nombre>.topk-<entidad>, y se invalidan con el mismo SHA-256 que el
+    caché de transacciones (almacen.cargar_derivado).
+
+    Parámetros:
+    -----------
+    filepath : str
+        Ruta al CSV de origen
+    entidad : str
+        Columna a rankear ('Description', 'CustomerID'...)
+    directorio : str
+        Carpeta del caché
+    df : pd.DataFrame, opcional
+        Transacciones ya cargadas con cargar_dataset(filepath, directorio)
+    """
+    if df is None:
+        df = cargar_dataset(filepath, directorio)
+    return cargar_derivado(filepath, f'topk-{entidad}', lambda: TopK.desde_transacciones(df, entidad),
+                           TopK.guardar, lambda ruta: TopK.cargar(ruta, entidad), directorio)
+
+
+def _agregar_niveles(base):
+    """
+    Suma las medidas por (periodo[, país], entidad) en cada nivel.
+
+    `base` es un DataFrame con columnas Mes, Country, Entidad y las
+    medidas, o un dict nivel -> tabla ya agregada (al fusionar).
+    """
+    tablas = {}
+    for nivel in NIVELES:
+        periodo, por_pais = nivel
+        claves = ['Periodo'] + (['Country'] if por_pais else []) + ['Entidad']
+        if isinstance(base, dict):
+            tabla = base[nivel]
+        else:
+            tabla = base.rename(columns={periodo: 'Periodo'})[claves + MEDIDAS]
+        tabla = tabla.astype({'Cantidad': 'int64', 'Filas': 'int64'})
+        tablas[nivel] = (tabla.groupby(claves, observed=True, sort=False)[MEDIDAS]
+                         .sum().reset_index())
+    return tablas
@@ -0,0 +1,269 @@
+"""
+═════════════════════════════════════════════════════════════════════════════
+    VALIDACIÓN DE PRONÓSTICOS - BACKTESTING CON ORIGEN MÓVIL
+
+    Mide cómo se comporta un pronóstico a 90 días fuera de la muestra:
+    • Cada pliegue entrena con la historia hasta un corte y pronostica los
+      `horizonte` días siguientes, que se comparan con lo real
+    • Los cortes retroceden `paso` días desde el final de la serie
+    • Los pares (modelo, pliegue) se evalúan en paralelo; la serie diaria
+      se envía una sola vez a cada proceso, y cada pliegue solo usa un
+      prefijo de ella
+    • El resultado de cada par se guarda con la huella de su historia y de
+      sus parámetros: al repetir la validación (o añadir un modelo o un
+      pliegue) solo se calcula lo nuevo
+    • Se reportan MAPE y RMSE por día de horizonte y el tiempo de ajuste
+      de cada modelo
+═════════════════════════════════════════════════════════════════════════════
+"""
+
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from almacen import DIRECTORIO_CACHE
+from pronosticos import HORIZONTE, PARAMETROS_PROPHET, huella_serie, modelo_prophet
+from proyeccion import ModeloFourier
+
+# Pliegues y separación entre cortes (en días)
+N_PLIEGUES = 5
+PASO = 30
+
+# Historia mínima con la que se entrena un pliegue
+MIN_ENTRENAMIENTO = 180
+
+# Subcarpeta del caché con el resultado de cada (modelo, pliegue)
+DIRECTORIO_VALIDACION = 'validacion'
+
+# Tramos de horizonte del resumen (días 1-7, 8-30, 31-60 y 61-90)
+TRAMOS = [7, 30, 60, 90]
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+# 1. MODELOS
+# ═════════════════════════════════════════════════════════════════════════════
+# Cada modelo recibe (fechas, valores, horizonte) de la historia y devuelve
+# el pronóstico de los `horizonte` días siguientes
+
+def pronostico_prophet(fechas, valores, horizonte):
+    """Prophet con los parámetros de pronosticos.py (sin intervalos: solo yhat)."""
+    modelo = modelo_prophet(fechas, valores, PARAMETROS_MODELOS['Prophet'])
+    futuro = modelo.make_future_dataframe(periods=horizonte, freq='D', include_history=False)
+    return modelo.predict(futuro)['yhat'].to_numpy()
+
+
+def pronostico_fourier(fechas, valores, horizonte):
+    """Tendencia + Fourier por mínimos cuadrados (proyeccion.py)."""
+    dias = fechas.values.astype('datetime64[D]').astype(np.int64)
+    futuro = np.arange(dias[-1] + 1, dias[-1] + 1 + horizonte)
+    return ModeloFourier().ajustar(dias, valores).predecir(futuro)[0]
+
+
+def pronostico_ingenuo(fechas, valores, horizonte):
+    """Referencia: repite la última semana."""
+    return np.resize(valores[-7:], horizonte)
+
+
+MODELOS = {
+    'Prophet': pronostico_prophet,
+    'Fourier': pronostico_fourier,
+    'Ingenuo semanal': pronostico_ingenuo,
+}
+
+# Se incluye en la huella: si cambia la configuración de un modelo, sus
+# resultados guardados dejan de valer
+PARAMETROS_MODELOS = {
+    'Prophet': {**PARAMETROS_PROPHET, 'uncertainty_samples': 0},
+    'Fourier': {'modelo': 'ModeloFourier'},
+    'Ingenuo semanal': {'estacion': 7},
+}
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+# 2. PLIEGUES (UN PROCESO POR PAR MODELO × CORTE)
+# ═════════════════════════════════════════════════════════════════════════════
+
+def cortes(n_dias, horizonte=HORIZONTE, n_pliegues=N_PLIEGUES, paso=PASO,
+           min_entrenamiento=MIN_ENTRENAMIENTO):
+    """
+    Posiciones de corte (número de días de entrenamiento) de cada pliegue.
+
+    El último corte deja exactamente `horizonte` días para comparar; los
+    anteriores retroceden `paso` días mientras quede historia suficiente.
+    """
+    ultimo = n_dias - horizonte
+    return sorted(c for c in range(ultimo, ultimo - n_pliegues * paso, -paso)
+                  if c >= min_entrenamiento)
+
+
+# Serie del proceso: se recibe una vez al crear el pool (initializer)
+_SERIE = None
+
+
+def _iniciar(serie):
+    global _SERIE
+    _SERIE = serie
+
+
+def _evaluar(nombre, corte, horizonte):
+    """Ajusta un modelo con los primeros `corte` días y mide su tiempo."""
+    historia = _SERIE.iloc[:corte]
+    inicio = time.perf_counter()
+    yhat = MODELOS[nombre](historia.index, historia.to_numpy(), horizonte)
+    return np.asarray(yhat, dtype=np.float64), time.perf_counter() - inicio
+
+
+class ResultadoValidacion:
+    """
+    Pronósticos de cada pliegue y costo de cada modelo.
+
+    Atributos:
+    ----------
+    predicciones : pd.DataFrame
+        Modelo, Corte (primer día pronosticado), Horizonte (1..h), ds, y e yhat
+    costos : pd.DataFrame
+        Por modelo: Pliegues, Segundos (suma de los ajustes), Segundos por
+        pliegue y Reutilizados (pliegues leídos del caché)
+    segundos : float
+        Tiempo total de la validación (reloj de pared)
+    """
+
+    def __init__(self, predicciones, costos, segundos):
+        self.predicciones = predicciones
+        self.costos = costos
+        self.segundos = segundos
+
+    def por_horizonte(self):
+        """
+        MAPE y RMSE por modelo y día de horizonte (promedio de los pliegues).
+
+        El MAPE ignora los días sin ventas (y = 0), donde no está definido.
+        """
+        p = self.predicciones
+        error = p['yhat'] - p['y']
+        con_ventas = p['y'] != 0
+        metricas = pd.DataFrame({
+            'Modelo': p['Modelo'],
+            'Horizonte': p['Horizonte'],
+            'APE': (error.abs() / p['y'].abs()).where(con_ventas),
+            'SE': error ** 2,
+        }).groupby(['Modelo', 'Horizonte'], sort=False).mean()
+        return pd.DataFrame({'MAPE': metricas['APE'] * 100, 'RMSE': np.sqrt(metricas['SE'])})
+
+    def resumen(self, tramos=TRAMOS):
+        """MAPE y RMSE por modelo y tramo de horizonte, con el costo de cada modelo."""
+        p = self.predicciones
+        limites = [0] + [t for t in tramos if t < p['Horizonte'].max()] + [p['Horizonte'].max()]
+        etiquetas = [f'{a + 1}-{b}' for a, b in zip(limites[:-1], limites[1:])]
+        tramo = pd.cut(p['Horizonte'], limites, labels=etiquetas)
+        error = p['yhat'] - p['y']
+        tabla = pd.DataFrame({
+            'Modelo': p['Modelo'],
+            'Tramo': tramo,
+            'APE': (error.abs() / p['y'].abs()).where(p['y'] != 0),
+            'SE': error ** 2,
+        }).groupby(['Modelo', 'Tramo'], sort=False, observed=True).mean()
+        tabla = pd.DataFrame({'MAPE': tabla['APE'] * 100, 'RMSE': np.sqrt(tabla['SE'])})
+        tabla = tabla.unstack('Tramo').reindex(self.costos['Modelo'])
+        tabla[('Segundos por pliegue', '')] = self.costos.set_index('Modelo')['Segundos por pliegue']
+        return tabla
+
+
+def validar(serie, modelos=None, horizonte=HORIZONTE, n_pliegues=N_PLIEGUES, paso=PASO,
+            procesos=None, directorio=Path(DIRECTORIO_CACHE) / DIRECTORIO_VALIDACION):
+    """
+    Backtesting con origen móvil de varios modelos sobre una serie diaria.
+
+    Parámetros:
+    -----------
+    serie : pd.Series
+        Serie diaria sin huecos (por ejemplo resample('D').sum() o una
+        columna de pronosticos.series_por_grupo)
+    modelos : list of str, opcional
+        Nombres de MODELOS a comparar (por defecto, todos)
+    horizonte : int
+        Días pronosticados en cada pliegue
+    n_pliegues, paso : int
+        Número de cortes y días entre cortes
+    procesos : int, opcional
+        Procesos en paralelo (por defecto, los núcleos disponibles)
+    directorio : str or None
+        Carpeta del caché de resultados (None para no guardar)
+
+    Retorna:
+    --------
+    ResultadoValidacion
+    """
+    inicio = time.perf_counter()
+    serie = serie.astype(np.float64)
+    modelos = list(MODELOS) if modelos is None else list(modelos)
+    posiciones = cortes(len(serie), horizonte, n_pliegues, paso)
+    if not posiciones:
+        raise ValueError(f"La serie tiene {len(serie)} días: no alcanza para un pliegue "
+                         f"de {MIN_ENTRENAMIENTO} días de entrenamiento y {horizonte} de horizonte")
+
+    # Resultados guardados: la huella cubre la historia del pliegue, el
+    # modelo y sus parámetros
+    directorio = None if directorio is None else Path(directorio)
+    resultados, pendientes = {}, {}
+    for nombre in modelos:
+        for corte in posiciones:
+            huella = huella_serie(serie.iloc[:corte],
+                                  {'modelo': nombre, **PARAMETROS_MODELOS[nombre]}, horizonte)
+            ruta = None if directorio is None else directorio / f'{huella}.json'
+            if ruta is not None and ruta.exists():
+                with open(ruta, encoding='utf-8') as f:
+                    guardado = json.load(f)
+                resultados[nombre, corte] = (np.array(guardado['yhat']), guardado['segundos'], True)
+            else:
+                pendientes[nombre, corte] = ruta
+
+    def guardar(clave, yhat, segundos):
+        resultados[clave] = (yhat, segundos, False)
+        ruta = pendientes[clave]
+        if ruta is not None:
+            ruta.parent.mkdir(parents=True, exist_ok=True)
+            with open(ruta, 'w', encoding='utf-8') as f:
+                json.dump({'yhat': yhat.tolist(), 'segundos': segundos}, f)
+
+    procesos = min(procesos or os.cpu_count() or 1, len(pendientes))
+    if procesos <= 1:
+        _iniciar(serie)
+        for nombre, corte in pendientes:
+            guardar((nombre, corte), *_evaluar(nombre, corte, horizonte))
+    else:
+        contexto = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=procesos, mp_context=contexto,
+                                 initializer=_iniciar, initargs=(serie,)) as pool:
+            futuros = {pool.submit(_evaluar, nombre, corte, horizonte): (nombre, corte)
+                       for nombre, corte in pendientes}
+            for futuro in as_completed(futuros):
+                guardar(futuros[futuro], *futuro.result())
+
+    filas, costos = [], []
+    pasos = np.arange(1, horizonte + 1)
+    for nombre in modelos:
+        for corte in posiciones:
+            yhat, _, _ = resultados[nombre, corte]
+            real = serie.iloc[corte:corte + horizonte]
+            filas.append(pd.DataFrame({
+                'Modelo': nombre, 'Corte': real.index[0], 'Horizonte': pasos,
+                'ds': real.index, 'y': real.to_numpy(), 'yhat': yhat,
+            }))
+        segundos = [resultados[nombre, corte][1] for corte in posiciones]
+        costos.append({
+            'Modelo': nombre,
+            'Pliegues': len(posiciones),
+            'Segundos': sum(segundos),
+            'Segundos por pliegue': np.mean(segundos),
+            'Reutilizados': sum(resultados[nombre, corte][2] for corte in posiciones),
+        })
+
+    return ResultadoValidacion(pd.concat(filas, ignore_index=True), pd.DataFrame(costos),
+                               time.perf_counter() - inicio)
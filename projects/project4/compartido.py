@@ -0,0 +1,32 @@
+"""
+═════════════════════════════════════════════════════════════════════════════
+    DATOS COMPARTIDOS CON PROJECT3 - CSV, CACHÉ Y MÓDULOS DEL ALMACÉN
+
+    El notebook reutiliza lo que prepara project3 para el dashboard: el
+    caché Arrow de transacciones limpias (almacen.py), la base SQLite
+    (basedatos.py) y las features RFM (rfm.py). Las rutas se resuelven a
+    partir de la ubicación de este archivo, no del directorio de trabajo,
+    y project3 se añade al final de sys.path: si un nombre de módulo
+    coincide, gana el de project4.
+
+    Uso:
+        from compartido import ARCHIVO_DATOS, DIRECTORIO_CACHE
+        from almacen import cargar_dataset
+
+        df = cargar_dataset(ARCHIVO_DATOS, DIRECTORIO_CACHE)
+═════════════════════════════════════════════════════════════════════════════
+"""
+
+import sys
+from pathlib import Path
+
+PROYECTOS = Path(__file__).resolve().parent.parent
+
+DIRECTORIO_PROJECT3 = PROYECTOS / 'project3'
+
+# CSV original y caché de project3 (el mismo que usa el dashboard)
+ARCHIVO_DATOS = str(PROYECTOS / 'project1' / 'data.csv')
+DIRECTORIO_CACHE = str(DIRECTORIO_PROJECT3 / '.cache')
+
+if str(DIRECTORIO_PROJECT3) not in sys.path:
+    sys.path.append(str(DIRECTORIO_PROJECT3))
@@ -0,0 +1,211 @@
+"""
+═════════════════════════════════════════════════════════════════════════════
+    EVALUACIÓN DE CLUSTERS - SILUETA POR BLOQUES Y BARRIDO DE K
+
+    Métricas de calidad para elegir el número de clusters sin la matriz
+    completa de distancias entre clientes (n² números):
+    • Silueta por bloques: las distancias se calculan para un bloque de
+      filas a la vez y se suman por cluster con un producto de matrices,
+      así que la memoria queda acotada por MEMORIA_BLOQUE
+    • Silueta sobre una muestra de clientes (el costo no crece con n²)
+    • Inercia y Davies–Bouldin (lineales en el número de clientes)
+    • Barrido de k en paralelo, un proceso por valor de k
+
+    perfil_clusters() resume cada cluster (medias RFM, tamaño y silueta
+    media) en la tabla que usa asignar_nombre_segmento en el notebook.
+═════════════════════════════════════════════════════════════════════════════
+"""
+
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from sklearn.cluster import MiniBatchKMeans
+from sklearn.metrics import davies_bouldin_score
+
+# Bytes como máximo de cada bloque de distancias
+MEMORIA_BLOQUE = 64 << 20
+
+# Clientes de la muestra para la silueta
+MUESTRA_SILUETA = 5_000
+
+SEMILLA = 42
+
+# Valores de k que se evalúan por defecto
+RANGO_K = range(2, 9)
+
+
+def valores_silueta(x, etiquetas, memoria_bloque=MEMORIA_BLOQUE):
+    """
+    Silueta de cada punto, calculada por bloques de filas.
+
+    Para un bloque de b filas se calculan sus distancias a los n puntos
+    (b × n) y se suman por cluster con un producto por la matriz
+    indicadora (n × k). Con esas sumas salen a (distancia media a su
+    cluster) y b (menor distancia media a otro cluster).
+
+    Parámetros:
+    -----------
+    x : np.ndarray
+        Puntos (n × d)
+    etiquetas : array-like
+        Cluster de cada punto
+    memoria_bloque : int
+        Bytes como máximo del bloque de distancias
+
+    Retorna:
+    --------
+    np.ndarray
+        Silueta de cada punto (0 en clusters de un solo punto, como sklearn)
+    """
+    x = np.asarray(x, dtype=np.float64)
+    n = len(x)
+    _, codigos = np.unique(np.asarray(etiquetas), return_inverse=True)
+    k = codigos.max() + 1
+    tamanos = np.bincount(codigos, minlength=k).astype(np.float64)
+    indicadora = np.zeros((n, k))
+    indicadora[np.arange(n), codigos] = 1.0
+    normas = np.einsum('ij,ij->i', x, x)
+
+    tamano_bloque = max(1, memoria_bloque // (8 * n))
+    silueta = np.empty(n)
+    for inicio in range(0, n, tamano_bloque):
+        fin = min(inicio + tamano_bloque, n)
+        filas = np.arange(fin - inicio)
+        distancias = normas[inicio:fin, None] + normas[None, :] - 2.0 * (x[inicio:fin] @ x.T)
+        np.sqrt(np.maximum(distancias, 0.0, out=distancias), out=distancias)
+        distancias[filas, inicio + filas] = 0.0
+
+        sumas = distancias @ indicadora
+        propio = codigos[inicio:fin]
+        vecinos = tamanos[propio] - 1
+        a = sumas[filas, propio] / np.maximum(vecinos, 1)
+        medias = sumas / tamanos
+        medias[filas, propio] = np.inf
+        b = medias.min(axis=1)
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            valores = np.nan_to_num((b - a) / np.maximum(a, b))
+        valores[vecinos == 0] = 0.0
+        silueta[inicio:fin] = valores
+    return silueta
+
+
+def muestra_indices(n, muestra=MUESTRA_SILUETA, semilla=SEMILLA):
+    """Índices (ordenados) de una muestra sin reemplazo, o todos si n <= muestra."""
+    if muestra is None or n <= muestra:
+        return np.arange(n)
+    return np.sort(np.random.default_rng(semilla).choice(n, muestra, replace=False))
+
+
+def silueta(x, etiquetas, muestra=MUESTRA_SILUETA, semilla=SEMILLA):
+    """
+    Silhouette Score sobre una muestra de puntos.
+
+    Igual que sklearn.metrics.silhouette_score(..., sample_size=muestra):
+    las distancias solo se miden entre puntos de la muestra.
+    """
+    indices = muestra_indices(len(x), muestra, semilla)
+    return float(valores_silueta(np.asarray(x)[indices], np.asarray(etiquetas)[indices]).mean())
+
+
+def evaluar_k(x, k, muestra=MUESTRA_SILUETA, semilla=SEMILLA):
+    """
+    Entrena MiniBatchKMeans con k clusters y mide su calidad.
+
+    Retorna:
+    --------
+    dict
+        k, Inercia, Silueta (muestra), DaviesBouldin (menor = mejor) y
+        TamanoMinimo (clientes del cluster más pequeño)
+    """
+    kmeans = MiniBatchKMeans(n_clusters=k, n_init=10, random_state=semilla).fit(x)
+    etiquetas = kmeans.labels_
+    return {
+        'k': k,
+        'Inercia': float(kmeans.inertia_),
+        'Silueta': silueta(x, etiquetas, muestra, semilla),
+        'DaviesBouldin': float(davies_bouldin_score(x, etiquetas)),
+        'TamanoMinimo': int(np.bincount(etiquetas, minlength=k).min()),
+    }
+
+
+def evaluar_rango(x, ks=RANGO_K, procesos=None, muestra=MUESTRA_SILUETA, semilla=SEMILLA):
+    """
+    Evalúa varios valores de k en paralelo (un proceso por k).
+
+    La memoria de cada proceso queda acotada por la matriz x, la muestra
+    de la silueta y MEMORIA_BLOQUE. Con un solo proceso se evalúa en el
+    proceso actual.
+
+    Parámetros:
+    -----------
+    x : np.ndarray
+        Features RFM transformadas y estandarizadas (clientes × 3)
+    ks : iterable of int
+        Valores de k a evaluar
+    procesos : int, opcional
+        Procesos en paralelo (por defecto, los núcleos disponibles)
+    muestra : int
+        Clientes de la muestra para la silueta
+
+    Retorna:
+    --------
+    pd.DataFrame
+        Una fila por k (ver evaluar_k), ordenada por k
+    """
+    x = np.ascontiguousarray(x, dtype=np.float64)
+    ks = list(ks)
+    procesos = min(procesos or os.cpu_count() or 1, len(ks))
+    if procesos <= 1:
+        resultados = [evaluar_k(x, k, muestra, semilla) for k in ks]
+    else:
+        contexto = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=procesos, mp_context=contexto) as pool:
+            resultados = list(pool.map(evaluar_k, [x] * len(ks), ks,
+                                       [muestra] * len(ks), [semilla] * len(ks)))
+    return pd.DataFrame(resultados).sort_values('k', ignore_index=True)
+
+
+def elegir_k(resultados):
+    """k con mayor silueta (en empate, el de menor Davies–Bouldin)."""
+    mejor = resultados.sort_values(['Silueta', 'DaviesBouldin'], ascending=[False, True])
+    return int(mejor['k'].iloc[0])
+
+
+def perfil_clusters(df_rfm, etiquetas, x, muestra=MUESTRA_SILUETA, semilla=SEMILLA):
+    """
+    Resumen de cada cluster para ponerle nombre.
+
+    Parámetros:
+    -----------
+    df_rfm : pd.DataFrame
+        Clientes con Recencia, Frecuencia, Monetario y CustomerID
+    etiquetas : array-like
+        Cluster de cada cliente
+    x : np.ndarray
+        Features estandarizadas con las que se entrenó el modelo
+
+    Retorna:
+    --------
+    pd.DataFrame
+        Índice = cluster. Recencia_Media, Frecuencia_Media, Monetario_Media,
+        Total_Clientes, % del Total y Silueta_Media (sobre la muestra; un
+        valor cercano a 0 o negativo indica un cluster poco separado)
+    """
+    etiquetas = np.asarray(etiquetas)
+    perfil = df_rfm.groupby(etiquetas).agg(
+        Recencia_Media=('Recencia', 'mean'),
+        Frecuencia_Media=('Frecuencia', 'mean'),
+        Monetario_Media=('Monetario', 'mean'),
+        Total_Clientes=('CustomerID', 'count'),
+    ).round(2)
+    perfil['% del Total'] = (perfil['Total_Clientes'] / perfil['Total_Clientes'].sum() * 100).round(1)
+
+    indices = muestra_indices(len(x), muestra, semilla)
+    valores = valores_silueta(np.asarray(x)[indices], etiquetas[indices])
+    perfil['Silueta_Media'] = pd.Series(valores).groupby(etiquetas[indices]).mean().round(3)
+    perfil.index.name = 'Segmento'
+    return perfil
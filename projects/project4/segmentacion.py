@@ -0,0 +1,238 @@
+"""
+═════════════════════════════════════════════════════════════════════════════
+    SEGMENTACIÓN K-MEANS - ENTRENAMIENTO POR LOTES Y MODELOS VERSIONADOS
+
+    Motor de segmentación de clientes sobre las features RFM:
+    • Transformación log1p vectorizada (una operación sobre la matriz)
+    • StandardScaler + MiniBatchKMeans: se entrena en memoria con fit() o
+      en streaming con partial_fit() sobre lotes de clientes
+    • Silhouette Score sobre una muestra, calculado por bloques (ver
+      evaluacion.py)
+    • Modelos guardados con versión (segmentacion_vNNN.joblib + .json con
+      sus metadatos) para asignar clientes nuevos sin reentrenar
+═════════════════════════════════════════════════════════════════════════════
+"""
+
+import json
+from datetime import datetime
+from pathlib import Path
+
+import joblib
+import numpy as np
+import sklearn
+from sklearn.cluster import MiniBatchKMeans
+from sklearn.preprocessing import StandardScaler
+
+from evaluacion import MUESTRA_SILUETA, silueta
+
+COLUMNAS_RFM = ['Recencia', 'Frecuencia', 'Monetario']
+
+N_CLUSTERS = 4
+
+# Clientes por lote de MiniBatchKMeans (y por trozo en streaming)
+TAMANO_LOTE = 1024
+
+SEMILLA = 42
+
+DIRECTORIO_MODELOS = 'modelos'
+
+PREFIJO_MODELO = 'segmentacion_v'
+
+
+def transformar(df_rfm):
+    """
+    log1p de Recencia, Frecuencia y Monetario.
+
+    Retorna:
+    --------
+    np.ndarray
+        Matriz (clientes × 3) en float64
+    """
+    return np.log1p(df_rfm[COLUMNAS_RFM].to_numpy(dtype=np.float64))
+
+
+def ajustar_escalador(df_rfm):
+    """StandardScaler ajustado sobre las features transformadas (ver transformar)."""
+    return StandardScaler().fit(transformar(df_rfm))
+
+
+def lotes(df, tamano=TAMANO_LOTE):
+    """Trozos consecutivos de df con `tamano` filas."""
+    for inicio in range(0, len(df), tamano):
+        yield df.iloc[inicio:inicio + tamano]
+
+
+class ModeloSegmentacion:
+    """
+    Escalador y K-Means ajustados sobre las features RFM transformadas.
+
+    Se entrena con ModeloSegmentacion.entrenar(df_rfm) (todos los clientes
+    en memoria) o con entrenar_por_lotes(obtener_lotes) (streaming). Se
+    guarda con guardar() y se recupera con cargar() para asignar clientes
+    nuevos con predecir().
+
+    Parámetros:
+    -----------
+    escalador : StandardScaler
+    kmeans : MiniBatchKMeans
+    nombres : dict, opcional
+        Nombre de cada cluster (por ejemplo {0: 'Campeones 🏆', ...})
+    metadatos : dict, opcional
+        Versión, fecha y métricas del modelo guardado
+    """
+
+    def __init__(self, escalador, kmeans, nombres=None, metadatos=None):
+        self.escalador = escalador
+        self.kmeans = kmeans
+        self.nombres = nombres
+        self.metadatos = metadatos or {}
+
+    @classmethod
+    def entrenar(cls, df_rfm, n_clusters=N_CLUSTERS, tamano_lote=TAMANO_LOTE,
+                 semilla=SEMILLA, n_init=10, escalador=None):
+        """
+        Ajusta escalador y MiniBatchKMeans con todos los clientes en memoria.
+
+        Cada iteración de MiniBatchKMeans usa un lote aleatorio de
+        `tamano_lote` clientes en lugar de recorrer la matriz completa. Si
+        ya se ajustó el escalador (ajustar_escalador, por ejemplo para
+        elegir k con evaluacion.evaluar_rango) se pasa en `escalador` y el
+        modelo usa ese mismo.
+        """
+        x = transformar(df_rfm)
+        if escalador is None:
+            escalador = StandardScaler().fit(x)
+        kmeans = MiniBatchKMeans(
+            n_clusters=n_clusters,
+            batch_size=tamano_lote,
+            n_init=n_init,
+            random_state=semilla,
+        ).fit(escalador.transform(x))
+        return cls(escalador, kmeans)
+
+    @classmethod
+    def entrenar_por_lotes(cls, obtener_lotes, n_clusters=N_CLUSTERS, semilla=SEMILLA, pasadas=3):
+        """
+        Ajusta escalador y K-Means en streaming, un lote de clientes a la vez.
+
+        Una primera pasada ajusta el escalador (media y varianza
+        acumuladas); las siguientes ajustan el K-Means con partial_fit. En
+        memoria solo vive el lote en curso.
+
+        Parámetros:
+        -----------
+        obtener_lotes : callable
+            Devuelve un iterable nuevo de DataFrames con COLUMNAS_RFM cada
+            vez que se llama (por ejemplo lambda: lotes(df_rfm) o una
+            consulta SQL con chunksize)
+        n_clusters : int
+            Número de clusters. El primer lote debe tener al menos tantos
+            clientes
+        semilla : int
+            Semilla de la inicialización
+        pasadas : int
+            Recorridos completos de los lotes para el K-Means
+        """
+        escalador = StandardScaler()
+        for lote in obtener_lotes():
+            escalador.partial_fit(transformar(lote))
+
+        kmeans = MiniBatchKMeans(n_clusters=n_clusters, random_state=semilla, n_init=3)
+        for _ in range(pasadas):
+            for lote in obtener_lotes():
+                kmeans.partial_fit(escalador.transform(transformar(lote)))
+        return cls(escalador, kmeans)
+
+    def actualizar(self, df_rfm):
+        """
+        Ajusta los centroides con clientes nuevos (partial_fit).
+
+        El escalador no cambia, así que las asignaciones previas siguen
+        siendo comparables.
+        """
+        for lote in lotes(df_rfm):
+            self.kmeans.partial_fit(self.escalar(lote))
+        return self
+
+    def escalar(self, df_rfm):
+        """Features RFM transformadas y estandarizadas."""
+        return self.escalador.transform(transformar(df_rfm))
+
+    def predecir(self, df_rfm):
+        """Cluster de cada cliente (np.ndarray de enteros)."""
+        return self.kmeans.predict(self.escalar(df_rfm))
+
+    def silueta(self, df_rfm, muestra=MUESTRA_SILUETA, semilla=SEMILLA):
+        """
+        Silhouette Score sobre una muestra de clientes (evaluacion.silueta).
+
+        El cálculo exacto crece con el cuadrado de los clientes; con una
+        muestra de `muestra` clientes el costo queda acotado.
+        """
+        x = self.escalar(df_rfm)
+        return silueta(x, self.kmeans.predict(x), muestra, semilla)
+
+    def guardar(self, directorio=DIRECTORIO_MODELOS, **metricas):
+        """
+        Guarda el modelo como nueva versión en el directorio.
+
+        Escribe segmentacion_vNNN.joblib (escalador y K-Means) y
+        segmentacion_vNNN.json (metadatos legibles: versión, fecha,
+        clusters, nombres, versión de scikit-learn y las métricas pasadas
+        como argumentos, por ejemplo silueta=0.41).
+
+        Retorna:
+        --------
+        Path
+            Ruta del archivo .joblib
+        """
+        directorio = Path(directorio)
+        directorio.mkdir(parents=True, exist_ok=True)
+        version = max(versiones(directorio), default=0) + 1
+        base = directorio / f'{PREFIJO_MODELO}{version:03d}'
+
+        self.metadatos = {
+            'version': version,
+            'creado': datetime.now().isoformat(timespec='seconds'),
+            'n_clusters': int(self.kmeans.n_clusters),
+            'columnas': COLUMNAS_RFM,
+            'transformacion': 'log1p + StandardScaler',
+            'nombres': None if self.nombres is None else {str(c): n for c, n in self.nombres.items()},
+            'sklearn': sklearn.__version__,
+            **metricas,
+        }
+        # El .joblib se escribe al final: si existe, sus metadatos también
+        with open(base.with_suffix('.json'), 'w', encoding='utf-8') as f:
+            json.dump(self.metadatos, f, ensure_ascii=False, indent=2)
+        joblib.dump({'escalador': self.escalador, 'kmeans': self.kmeans}, base.with_suffix('.joblib'))
+        return base.with_suffix('.joblib')
+
+    @classmethod
+    def cargar(cls, directorio=DIRECTORIO_MODELOS, version=None):
+        """
+        Carga una versión guardada (por defecto, la más reciente).
+
+        Lanza FileNotFoundError si no hay modelos guardados.
+        """
+        directorio = Path(directorio)
+        if version is None:
+            version = max(versiones(directorio), default=None)
+            if version is None:
+                raise FileNotFoundError(f"No hay modelos guardados en '{directorio}'")
+        base = directorio / f'{PREFIJO_MODELO}{version:03d}'
+        artefactos = joblib.load(base.with_suffix('.joblib'))
+        with open(base.with_suffix('.json'), encoding='utf-8') as f:
+            metadatos = json.load(f)
+        nombres = metadatos.get('nombres')
+        if nombres is not None:
+            nombres = {int(c): n for c, n in nombres.items()}
+        return cls(artefactos['escalador'], artefactos['kmeans'], nombres, metadatos)
+
+
+def versiones(directorio=DIRECTORIO_MODELOS):
+    """Números de versión de los modelos guardados en el directorio."""
+    return sorted(
+        int(ruta.stem[len(PREFIJO_MODELO):])
+        for ruta in Path(directorio).glob(f'{PREFIJO_MODELO}*.joblib')
+        if ruta.stem[len(PREFIJO_MODELO):].isdigit()
+    )
@@ -0,0 +1,44 @@
+"""
+═════════════════════════════════════════════════════════════════════════════
+    PRUEBAS DE LA EVALUACIÓN DE CLUSTERS
+
+    La silueta por bloques se compara con sklearn (matriz completa de
+    distancias) sobre puntos sintéticos pequeños.
+
+    Uso (desde projects/project4):
+        python -m pytest -q test_evaluacion.py
+═════════════════════════════════════════════════════════════════════════════
+"""
+
+import numpy as np
+import pytest
+from sklearn.metrics import silhouette_samples, silhouette_score
+
+from evaluacion import muestra_indices, silueta, valores_silueta
+
+
+@pytest.fixture
+def puntos():
+    rng = np.random.default_rng(0)
+    centros = np.array([[0, 0, 0], [5, 5, 0], [0, 5, 5], [5, 0, 5]])
+    x = np.vstack([rng.normal(c, 1.0, size=(150, 3)) for c in centros] + [[[20, 20, 20]]])
+    # El último punto forma un cluster de un solo punto (silueta 0)
+    etiquetas = np.append(np.repeat([3, 10, 20, 30], 150), 99)
+    return x, etiquetas
+
+
+@pytest.mark.parametrize('memoria_bloque', [8 * 601 * 7, 1 << 20, 64 << 20])
+def test_valores_silueta_igual_a_sklearn(puntos, memoria_bloque):
+    x, etiquetas = puntos
+    # Bloques de 7 filas, de 218 y uno solo con todas
+    assert np.allclose(valores_silueta(x, etiquetas, memoria_bloque), silhouette_samples(x, etiquetas))
+    assert valores_silueta(x, etiquetas, memoria_bloque)[-1] == 0.0
+
+
+def test_silueta_muestra_igual_a_sklearn(puntos):
+    x, etiquetas = puntos
+    indices = muestra_indices(len(x), muestra=200, semilla=1)
+    assert len(indices) == 200 and (np.diff(indices) > 0).all()
+    assert silueta(x, etiquetas, muestra=200, semilla=1) == pytest.approx(
+        silhouette_score(x[indices], etiquetas[indices]))
+    assert silueta(x, etiquetas, muestra=None) == pytest.approx(silhouette_score(x, etiquetas))